@@ -1,3 +1,8 @@
+import time
+
+# Launch time for the startup timings, taken before the heavy imports below
+STARTED_AT = time.perf_counter()
+
 import os
 import sys
 import argparse
@@ -28,16 +33,18 @@ if __name__ == "__main__":
         type=str,
         help="Specify the server IP address (overrides .env)."
     )
+    parser.add_argument(
+        "--startup-timing",
+        action="store_true",
+        help="Print time to first frame and to the first usable screen, then exit."
+    )
     args = parser.parse_args()
 
     # Run update_configuration with parsed arguments
     update_configuration(verbose=args.verbose, regenerate_cert=args.regenerate_cert, server_ip=args.server_ip)
 
     # Initialize and run the application
+    # The window appears at once; the login screen or main interface follows when the server answers
     root = ctk.CTk()
-    app = SkySyncApp(root)
-    if not app.load_session():
-        app.show_login_screen()
-    else:
-        app.show_main_interface()
+    app = SkySyncApp(root, started_at=STARTED_AT, exit_after_startup=args.startup_timing)
     root.mainloop()
@@ -0,0 +1,203 @@
+import os
+import logging
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# (connect, read) seconds; a slow server fails the request instead of hanging a worker forever
+DEFAULT_TIMEOUT = (5, 30)
+# Keep-alive connections kept per host, shared by page requests, uploads and downloads
+DEFAULT_POOL_SIZE = 16
+
+def default_api_workers():
+    """Number of threads running page requests, overridable with API_WORKERS."""
+    return max(1, int(os.getenv('API_WORKERS', '4')))
+
+class FingerprintRecordingConnection(HTTPSConnection):
+    """HTTPS connection that remembers the SHA-256 fingerprint of the certificate the server presented."""
+
+    peer_fingerprint = None
+
+    def connect(self):
+        super().connect()
+        der_cert = self.sock.getpeercert(binary_form=True)
+        self.peer_fingerprint = hashlib.sha256(der_cert).hexdigest() if der_cert else None
+
+class FingerprintRecordingPool(HTTPSConnectionPool):
+    ConnectionCls = FingerprintRecordingConnection
+
+def response_fingerprint(response):
+    """
+    SHA-256 fingerprint of the certificate behind a response sent through a PinnedCertAdapter,
+    so the first request to a server can both pin it and do its work over a single handshake.
+    The request must be sent with stream=True and the fingerprint read before the body, which
+    hands the connection back to the pool.
+    """
+    connection = getattr(response.raw, 'connection', None)
+    return getattr(connection, 'peer_fingerprint', None)
+
+class PinnedCertAdapter(HTTPAdapter):
+    """
+    HTTPS adapter that accepts the server only if its certificate matches the SHA-256
+    fingerprint pinned on first use, in place of CA validation (the server is self-signed).
+    With no fingerprint yet, any certificate is accepted and its fingerprint is recorded on
+    the connection (see response_fingerprint) for the caller to pin.
+    """
+
+    def __init__(self, fingerprint, ssl_context=None, **kwargs):
+        self.fingerprint = fingerprint
+        self.ssl_context = ssl_context
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['assert_fingerprint'] = self.fingerprint
+        if self.ssl_context is not None:
+            kwargs['ssl_context'] = self.ssl_context
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': HTTPConnectionPool, 'https': FingerprintRecordingPool}
+
+    def send(self, request, **kwargs):
+        # The pin replaces CA validation, whatever verify or REQUESTS_CA_BUNDLE say
+        kwargs['verify'] = False
+        return super().send(request, **kwargs)
+
+def create_api_session(fingerprint=None, ssl_context=None, pool_size=DEFAULT_POOL_SIZE):
+    """
+    requests.Session with a keep-alive pool of pool_size connections. With a fingerprint,
+    HTTPS connections are pinned to it; without one, certificates are not checked at all
+    but their fingerprints are recorded so the server can be pinned on first use.
+    """
+    session = requests.Session()
+    session.mount('https://', PinnedCertAdapter(fingerprint, ssl_context, pool_connections=pool_size, pool_maxsize=pool_size))
+    session.mount('http://', HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+    return session
+
+class ApiCall:
+    """Handle for a request submitted to the ApiClient; cancel() drops its callbacks."""
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.future = None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def result(self, timeout=None):
+        """Block for the response (raises the request's exception); for use off the Tk thread."""
+        return self.future.result(timeout)
+
+class ApiClient:
+    """
+    Runs the client's HTTP requests on a small background pool over one pinned, keep-alive
+    session. Callbacks are handed to `dispatch` (typically `lambda fn, *args: root.after(0, fn, *args)`)
+    so they run on the Tk thread, and are dropped if the call was cancelled in the meantime,
+    e.g. by cancel_scope("page") when the user navigates to another page.
+    """
+
+    def __init__(self, server_url, dispatch, fingerprint=None, ssl_context=None, max_workers=None,
+                 timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE):
+        self.server_url = server_url
+        self.dispatch = dispatch
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self.pool_size = pool_size
+        self.session = create_api_session(fingerprint, ssl_context, pool_size)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or default_api_workers(), thread_name_prefix="api")
+        self._lock = threading.Lock()
+        self._calls = {}  # scope -> set of pending ApiCalls
+
+    def url(self, path):
+        return f"{self.server_url}{path}"
+
+    @property
+    def fingerprint(self):
+        return getattr(self.session.get_adapter('https://'), 'fingerprint', None)
+
+    def pin(self, fingerprint):
+        """Pin HTTPS connections to fingerprint from now on; unpinned pooled connections are dropped."""
+        previous = self.session.get_adapter('https://')
+        self.session.mount('https://', PinnedCertAdapter(
+            fingerprint, self.ssl_context, pool_connections=self.pool_size, pool_maxsize=self.pool_size
+        ))
+        previous.close()
+
+    def request(self, method, path, token=None, on_success=None, on_error=None, scope="page", **kwargs):
+        """
+        Send a request in the background and return its ApiCall. on_success(response) receives
+        every HTTP response, whatever its status; on_error(exception) receives network errors
+        and timeouts. Both run through dispatch, never on the worker thread.
+        """
+        call = ApiCall(scope)
+        headers = dict(kwargs.pop('headers', None) or {})
+        if token:
+            headers['x-access-token'] = token
+        kwargs.setdefault('timeout', self.timeout)
+        # Trust comes from the pinned fingerprint (if any), not from a CA bundle
+        kwargs.setdefault('verify', False)
+        with self._lock:
+            self._calls.setdefault(scope, set()).add(call)
+
+        def run():
+            if call.cancelled:
+                raise CancelledError()
+            return self.session.request(method, self.url(path), headers=headers, **kwargs)
+
+        def done(future):
+            with self._lock:
+                self._calls.get(scope, set()).discard(call)
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is None:
+                self._deliver(call, on_success, future.result())
+            elif isinstance(error, CancelledError):
+                return
+            else:
+                logging.error(f"{method} {path} failed: {error}")
+                self._deliver(call, on_error, error)
+
+        call.future = self._executor.submit(run)
+        call.future.add_done_callback(done)
+        return call
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def _deliver(self, call, callback, value):
+        if callback is None or call.cancelled:
+            return
+
+        def deliver():
+            # Checked again on the Tk thread: the page may have changed while this was queued
+            if not call.cancelled:
+                callback(value)
+
+        self.dispatch(deliver)
+
+    def cancel_scope(self, scope="page"):
+        """Cancel every pending call in scope; requests already on the wire finish but report nothing."""
+        with self._lock:
+            calls = self._calls.pop(scope, set())
+        for call in calls:
+            call.cancel()
+        return len(calls)
+
+    def close(self):
+        for scope in list(self._calls):
+            self.cancel_scope(scope)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
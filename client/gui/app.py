@@ -6,6 +6,8 @@ import sys
 import os
 import logging
 import configparser
+import importlib
+import threading
 import urllib3
 import socket
 import ssl
@@ -16,7 +18,7 @@ from dotenv import load_dotenv
 
 from . import styles
 from . import utils
-from .pages import login, signup, main_interface, upload, home, profile, settings, inspection, team, drone_specs
+from .api_client import ApiClient, response_fingerprint
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -75,71 +77,66 @@ def save_pinned_fingerprint(path, fingerprint):
     with open(path, 'w') as f:
         f.write(fingerprint)
 
-def verify_or_set_fingerprint(host, port, pinned_fpr_file):
-    """
-    TOFU logic:
-      - if pinned fingerprint doesn't exist, trust and save current server cert
-      - if pinned fingerprint changes, warn user
-    """
-    actual_fpr = get_server_certificate_fingerprint(host, port)
-    pinned_fpr = load_pinned_fingerprint(pinned_fpr_file)
-
-    if pinned_fpr is None:
-        print("No pinned fingerprint found. Trusting current server cert (TOFU).")
-        save_pinned_fingerprint(pinned_fpr_file, actual_fpr)
-    else:
-        if pinned_fpr != actual_fpr:
-            print("WARNING: Server certificate fingerprint has CHANGED!")
-            print(f"Old pinned: {pinned_fpr}")
-            print(f"New actual: {actual_fpr}")
-            print("Possible MITM attack. Proceed with caution.")
-
-def wait_for_server_with_tofu(server_url, pinned_fpr_file, max_retries=50, delay=3):
+class CertificateChangedError(Exception):
+    """The server presented a certificate other than the pinned one."""
+
+def retry_after_seconds(response, default, limit=60):
+    """Seconds from a Retry-After header (delta-seconds form), bounded to [1, limit]."""
+    try:
+        return max(1, min(limit, int(response.headers.get('Retry-After', ''))))
+    except ValueError:
+        return default
+
+def check_server(api, pinned_fpr_file, timeout=4, default_delay=3):
     """
-    Repeatedly attempt to verify pinned-fingerprint, then GET /ping.
-    Returns True if the server is eventually up, False otherwise.
+    TOFU check and GET /health/ready over a single connection, which stays in the api session's pool:
+      - if no fingerprint is pinned yet, trust and save the certificate the request came over
+      - if the pinned fingerprint no longer matches, raise CertificateChangedError
+    Returns (ready, retry_after, reason): ready is True once the server answered 200; otherwise
+    retry_after is how long to wait before asking again (the server's Retry-After on a 503).
+    Raises requests.RequestException if the server is unreachable.
     """
-    parsed = urlparse(server_url)
-    host = parsed.hostname
-    port = parsed.port if parsed.port else 443
-
-    for attempt in range(1, max_retries + 1):
-        print(f"[Attempt {attempt}/{max_retries}] Checking server availability...")
-
-        # 1) Attempt pinned-fingerprint check
-        try:
-            verify_or_set_fingerprint(host, port, pinned_fpr_file)
-        except (ConnectionRefusedError, socket.timeout):
-            print("Server connection refused or timed out. Retrying...")
-            time.sleep(delay)
-            continue
-        except Exception as e:
-            print(f"Error verifying server cert: {e}. Retrying...")
-            time.sleep(delay)
-            continue
-
-        # 2) Attempt GET /ping
-        try:
-            # We skip normal CA validation, so 'verify=False'
-            resp = requests.get(f"{server_url}/ping", verify=False, timeout=4)
-            if resp.status_code == 200:
-                print("Server responded OK to /ping!")
-                return True
-            else:
-                print(f"/ping returned status {resp.status_code}. Retrying...")
-        except requests.RequestException as e:
-            print(f"Error on /ping: {e}")
-
-        time.sleep(delay)
-
-    return False
+    try:
+        response = api.session.get(api.url("/health/ready"), stream=True, verify=False, timeout=timeout)
+    except requests.exceptions.SSLError as e:
+        if api.fingerprint and "Fingerprints did not match" in str(e):
+            raise CertificateChangedError(str(e)) from e
+        raise
+    with response:
+        fingerprint = response_fingerprint(response) if api.fingerprint is None else None
+        # Reading the body hands the connection back to the pool for the next request
+        response.content
+    if fingerprint:
+        logging.info("No pinned fingerprint found. Trusting current server cert (TOFU).")
+        save_pinned_fingerprint(pinned_fpr_file, fingerprint)
+        api.pin(fingerprint)
+    if response.status_code == 200:
+        return True, 0, None
+    try:
+        reason = response.json().get('reason')
+    except ValueError:
+        reason = None
+    return False, retry_after_seconds(response, default_delay), reason or f"HTTP {response.status_code}"
+
+def trust_current_certificate(api, pinned_fpr_file):
+    """Pin whatever certificate the server presents now, after the user accepted a changed one."""
+    parsed = urlparse(api.server_url)
+    fingerprint = get_server_certificate_fingerprint(parsed.hostname, parsed.port or 443)
+    logging.warning(f"Replacing pinned server fingerprint {api.fingerprint} with {fingerprint}")
+    save_pinned_fingerprint(pinned_fpr_file, fingerprint)
+    api.pin(fingerprint)
 
 ########################################################################
 # MAIN SKYSYNCAPP CLASS
 ########################################################################
 
 class SkySyncApp:
-    def __init__(self, root):
+    def __init__(self, root, started_at=None, exit_after_startup=False):
+        # Startup timings are measured from started_at (time.perf_counter() at launch)
+        self.started_at = started_at if started_at is not None else time.perf_counter()
+        self.startup_timings = []
+        self.exit_after_startup = exit_after_startup
+
         self.root = root
         self.root.title("SkySync - Autonomous Drone System")
         self.root.geometry("1440x900")
@@ -168,13 +165,17 @@ class SkySyncApp:
             level=logging.INFO,
             format='%(asctime)s:%(levelname)s:%(message)s'
         )
-
-        # 4) Prepare pinned-fingerprint logic
-        pinned_fpr_file = os.path.join(self.CLIENT_PATH, 'conf', 'pinned_fingerprint.txt')
-        # Wait for server up with TOFU check; if server fails to come up, we can exit:
-        if not wait_for_server_with_tofu(self.SERVER_URL, pinned_fpr_file, max_retries=50, delay=3):
-            print("Server not found after repeated attempts. Exiting client.")
-            sys.exit(1)
+        self.mark_startup("app_init")
+
+        # 4) Shared background HTTP client over one keep-alive session pinned to the TOFU fingerprint
+        # (unpinned on first run until check_server pins the certificate it connected with)
+        self.pinned_fpr_file = os.path.join(self.CLIENT_PATH, 'conf', 'pinned_fingerprint.txt')
+        self.api = ApiClient(
+            self.SERVER_URL,
+            dispatch=lambda fn, *args: self.root.after(0, fn, *args),
+            fingerprint=load_pinned_fingerprint(self.pinned_fpr_file),
+            ssl_context=create_ssl_context()
+        )
 
         # 5) Initialize your styles
         styles.setup_styles(self)
@@ -195,41 +196,127 @@ class SkySyncApp:
         # 8) Create the main UI frame
         self.main_frame = utils.create_frame(self, self.root)
 
-        # 9) Show login screen initially
-        self.show_login_screen()
+        # 9) Show the window right away and wait for the server in the background;
+        # the login screen or main interface follows once it answers
+        self.connect_to_server()
+        self.root.after_idle(self.mark_startup, "first_frame")
+
+    ########################################################################
+    # Startup
+    ########################################################################
+    def connect_to_server(self, max_retries=50, delay=3, trust_new_certificate=False):
+        """Check the server off the Tk thread, retrying while it is down, then show the first screen."""
+        self.show_connecting_screen()
+
+        def status(text):
+            self.root.after(0, self._page('connecting').set_connecting_status, self, text)
+
+        def run():
+            if trust_new_certificate:
+                try:
+                    trust_current_certificate(self.api, self.pinned_fpr_file)
+                except (OSError, ssl.SSLError) as e:
+                    logging.error(f"Error fetching the server certificate: {e}")
+
+            for attempt in range(1, max_retries + 1):
+                status(f"Connecting to server (attempt {attempt}/{max_retries})...")
+                wait = delay
+                try:
+                    ready, wait, reason = check_server(self.api, self.pinned_fpr_file, default_delay=delay)
+                    if ready:
+                        logging.info("Server is ready.")
+                        self.root.after(0, self.on_server_ready)
+                        return
+                    # Reachable but its database or Redis is down: wait as long as the server asks
+                    logging.warning(f"Server not ready ({reason}). Retrying in {wait}s...")
+                    status(f"Server is starting up ({reason}), retrying in {wait}s (attempt {attempt}/{max_retries})...")
+                except CertificateChangedError as e:
+                    logging.error(f"Server certificate fingerprint has changed: {e}")
+                    self.root.after(0, self.on_certificate_changed, str(e))
+                    return
+                except requests.RequestException as e:
+                    logging.info(f"Server not reachable yet: {e}")
+                time.sleep(wait)
+
+            logging.error("Server not found after repeated attempts.")
+            self.root.after(0, self.on_server_unreachable)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def on_server_ready(self):
+        self.mark_startup("server_ready")
+        if self.load_session():
+            self.show_main_interface()
+        else:
+            self.show_login_screen()
+        self.mark_startup("initial_screen")
+        self.finish_startup()
+
+    def on_server_unreachable(self):
+        self._page('connecting').show_connection_failed(self)
+        self.finish_startup()
+
+    def on_certificate_changed(self, message):
+        self._page('connecting').show_certificate_changed(self, message)
+        self.finish_startup()
+
+    def mark_startup(self, name):
+        """Record how long after launch a startup milestone was reached."""
+        elapsed = time.perf_counter() - self.started_at
+        self.startup_timings.append((name, elapsed))
+        logging.info(f"Startup: {name} after {elapsed:.3f}s")
+
+    def finish_startup(self):
+        """In timing mode (client.py --startup-timing), report the milestones and quit."""
+        if not self.exit_after_startup:
+            return
+        # Let the screen just built draw before reading the clock
+        self.root.update_idletasks()
+        self.mark_startup("done")
+        print("Startup timings (seconds since launch):")
+        for name, elapsed in self.startup_timings:
+            print(f"  {name:<16}{elapsed:8.3f}")
+        self.root.after(0, self.root.destroy)
 
     ########################################################################
     # Screen management methods
     ########################################################################
+    def _page(self, name):
+        """Page module, imported on first navigation to keep it off the startup path."""
+        return importlib.import_module(f".pages.{name}", __package__)
+
+    def show_connecting_screen(self):
+        self._page('connecting').show_connecting_screen(self)
+
     def show_login_screen(self):
-        login.show_login_screen(self)
+        self._page('login').show_login_screen(self)
 
     def show_signup_screen(self):
-        signup.show_signup_screen(self)
+        self._page('signup').show_signup_screen(self)
 
     def show_main_interface(self):
-        main_interface.show_main_interface(self)
+        self._page('main_interface').show_main_interface(self)
 
     def show_upload_page(self):
-        upload.show_upload_page(self)
+        self._page('upload').show_upload_page(self)
 
     def show_drone_specs(self):
-        drone_specs.show_drone_specs(self)
+        self._page('drone_specs').show_drone_specs(self)
 
     def show_home_page(self):
-        home.show_home_page(self)
+        self._page('home').show_home_page(self)
 
     def show_profile_page(self):
-        profile.show_profile_page(self)
+        self._page('profile').show_profile_page(self)
 
     def show_settings_page(self):
-        settings.show_settings_page(self)
+        self._page('settings').show_settings_page(self)
 
     def show_inspection_page(self):
-        inspection.show_inspection_page(self)
+        self._page('inspection').show_inspection_page(self)
 
     def show_team_page(self):
-        team.show_team_page(self)
+        self._page('team').show_team_page(self)
 
     ########################################################################
     # Session management
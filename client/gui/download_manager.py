@@ -0,0 +1,228 @@
+import os
+import json
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+
+from .upload_engine import create_pooled_session
+
+def default_concurrency():
+    """Number of parallel photo downloads, overridable with DOWNLOAD_CONCURRENCY."""
+    return max(1, int(os.getenv('DOWNLOAD_CONCURRENCY', '8')))
+
+def save_json_atomic(path, data):
+    """Write JSON to a temporary file of its own and rename it over the target."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def content_range_total(value):
+    """Total size from a Content-Range header ("bytes */1234" or "bytes 0-99/1234"), or None."""
+    try:
+        total = value.rsplit("/", 1)[1]
+        return None if total == "*" else int(total)
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+class ETagStore:
+    """
+    ETags of downloaded files (and of partial .part files), keyed by path relative to `root`
+    and persisted as JSON there, so later syncs can revalidate and resume instead of re-fetching.
+    """
+
+    FILENAME = ".etags.json"
+
+    def __init__(self, root):
+        self.root = root
+        self.path = os.path.join(root, self.FILENAME)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r") as f:
+                self._etags = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            self._etags = {}
+        if not isinstance(self._etags, dict):
+            self._etags = {}
+
+    def key(self, local_path):
+        return os.path.relpath(local_path, self.root)
+
+    def get(self, local_path):
+        with self._lock:
+            return self._etags.get(self.key(local_path))
+
+    def set(self, local_path, etag):
+        with self._lock:
+            if etag:
+                self._etags[self.key(local_path)] = etag
+            else:
+                self._etags.pop(self.key(local_path), None)
+
+    def move(self, old_path, new_path):
+        """Carry a file's ETag along when the file is moved locally."""
+        with self._lock:
+            etag = self._etags.pop(self.key(old_path), None)
+            if etag:
+                self._etags[self.key(new_path)] = etag
+
+    def save(self):
+        with self._lock:
+            data = dict(self._etags)
+        try:
+            save_json_atomic(self.path, data)
+        except OSError as e:
+            logging.error(f"Error saving ETags to {self.path}: {e}")
+
+class DownloadManager:
+    """Fetches mission photos concurrently over one shared keep-alive session."""
+
+    def __init__(self, server_url, token, max_workers=None, verify=False, timeout=60, session=None):
+        self.server_url = server_url
+        self.token = token
+        self.max_workers = max_workers or default_concurrency()
+        self.verify = verify
+        self.timeout = timeout
+        # A caller-provided session (e.g. the app's shared pinned session) is left open by close()
+        self._own_session = session is None
+        self.session = session or create_pooled_session(self.max_workers)
+        self.cancelled = threading.Event()
+
+    def close(self):
+        if self._own_session:
+            self.session.close()
+
+    def cancel(self):
+        """Stop the downloads: none is started, and running ones stop before replacing a file."""
+        self.cancelled.set()
+
+    def download_one(self, mission_name, filename, local_path, size=None, etags=None, revalidate=False):
+        """
+        Download a single photo to local_path through a temporary file. Returns True on success.
+        With size, the server's size px thumbnail is fetched instead of the original.
+        With an ETagStore, an existing file is revalidated (If-None-Match, 304 keeps it) when
+        `revalidate` is set, and an interrupted download resumes from its .part file (Range + If-Range).
+        """
+        if self.cancelled.is_set():
+            return False
+        tmp_path = f"{local_path}.part"
+        headers = {"x-access-token": self.token}
+        if etags is not None:
+            etag = etags.get(local_path)
+            part_etag = etags.get(tmp_path)
+            if revalidate and etag and os.path.exists(local_path):
+                headers["If-None-Match"] = etag
+            elif part_etag and os.path.exists(tmp_path):
+                # If the photo changed since the partial download, the server sends it whole (200)
+                headers["Range"] = f"bytes={os.path.getsize(tmp_path)}-"
+                headers["If-Range"] = part_etag
+        elif os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        try:
+            with self.session.get(
+                f"{self.server_url}/missions/{mission_name}/photos/{filename}",
+                headers=headers,
+                params={"size": size} if size else None,
+                verify=self.verify,
+                timeout=self.timeout,
+                stream=True,
+            ) as response:
+                restart = False
+                if response.status_code == 304:
+                    logging.info(f"Photo {filename} unchanged at {local_path}")
+                    return True
+                if response.status_code == 416 and "Range" in headers:
+                    # If-Range matched, so the partial file is of the current version. If it already holds
+                    # every byte the previous transfer broke off just before the rename; otherwise it is
+                    # unusable and the photo is fetched whole.
+                    restart = content_range_total(response.headers.get("Content-Range")) != os.path.getsize(tmp_path)
+                    etag = headers["If-Range"]
+                elif response.status_code not in (200, 206):
+                    logging.error(f"Failed to download image {filename}: {response.status_code} - {response.text}")
+                    return False
+                else:
+                    etag = response.headers.get("ETag")
+                    if etags is not None:
+                        # Remember which version the partial file belongs to in case this transfer breaks
+                        etags.set(tmp_path, etag)
+                    with open(tmp_path, "ab" if response.status_code == 206 else "wb") as f:
+                        for chunk in response.iter_content(chunk_size=64 * 1024):
+                            if self.cancelled.is_set():
+                                break
+                            f.write(chunk)
+            if self.cancelled.is_set():
+                # The partial file is kept for the next sync to resume, as after a dropped connection
+                if etags is None and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return False
+            if restart:
+                logging.warning(f"Discarding unusable partial download of {filename}")
+                os.remove(tmp_path)
+                etags.set(tmp_path, None)
+                return self.download_one(mission_name, filename, local_path, size, etags, revalidate)
+            os.replace(tmp_path, local_path)
+            if etags is not None:
+                etags.set(tmp_path, None)
+                etags.set(local_path, etag)
+            logging.info(f"Downloaded photo: {filename} to {local_path}")
+            return True
+        except (requests.RequestException, OSError) as e:
+            logging.error(f"Error downloading image {filename}: {e}")
+            if etags is None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+    def download_all(self, mission_name, mission_dir, photos, progress_callback=None, size=None, revalidate=False):
+        """
+        Download (photo_type, filename) pairs into mission_dir/<photo_type>/ in parallel,
+        as size px thumbnails when size is given.
+        Files already on disk are skipped, or revalidated against their stored ETag when
+        `revalidate` is set. Returns the pairs that are now present locally; after cancel()
+        the stored ETags are left as they were.
+        """
+        etags = ETagStore(mission_dir)
+        present, pending = [], []
+        for photo_type, filename in photos:
+            photo_type_dir = os.path.join(mission_dir, photo_type)
+            os.makedirs(photo_type_dir, exist_ok=True)
+            local_path = os.path.join(photo_type_dir, filename)
+            if os.path.exists(local_path) and not revalidate:
+                present.append((photo_type, filename))
+            else:
+                pending.append((photo_type, filename, local_path))
+
+        total = len(pending)
+        if progress_callback:
+            progress_callback(0, total)
+        if not pending:
+            return present
+
+        done = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="download") as executor:
+                futures = {
+                    executor.submit(
+                        self.download_one, mission_name, filename, local_path, size, etags, revalidate
+                    ): (photo_type, filename)
+                    for photo_type, filename, local_path in pending
+                }
+                for future in as_completed(futures):
+                    done += 1
+                    if future.result():
+                        present.append(futures[future])
+                    if progress_callback:
+                        progress_callback(done, total)
+        finally:
+            if not self.cancelled.is_set():
+                etags.save()
+        return present
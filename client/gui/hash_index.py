@@ -0,0 +1,119 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Hashes sent to the server per lookup request (the server accepts up to 5000)
+LOOKUP_BATCH_SIZE = 1000
+
+def default_hash_workers():
+    """Number of file hashing threads, overridable with HASH_WORKERS."""
+    return max(1, int(os.getenv('HASH_WORKERS', '4')))
+
+def hash_file(path):
+    """Hex SHA-256 of a file, streamed in chunks (hashlib releases the GIL while hashing)."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class HashIndex:
+    """
+    Persistent path -> (mtime, size, SHA-256) index, so each local file is hashed once
+    until it changes. Safe to use from worker threads; call save() to persist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            with open(path, 'r') as f:
+                self._entries = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            self._entries = {}
+        if not isinstance(self._entries, dict):
+            self._entries = {}
+
+    def lookup(self, path, stat):
+        """Cached hash of path if its mtime and size still match, else None."""
+        with self._lock:
+            entry = self._entries.get(os.path.abspath(path))
+        if entry and entry.get('mtime_ns') == stat.st_mtime_ns and entry.get('size') == stat.st_size:
+            return entry.get('sha256')
+        return None
+
+    def hash(self, path):
+        """Return the SHA-256 of path, hashing the file only if it is new or changed."""
+        stat = os.stat(path)
+        digest = self.lookup(path, stat)
+        if digest:
+            return digest
+        digest = hash_file(path)
+        with self._lock:
+            self._entries[os.path.abspath(path)] = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "sha256": digest
+            }
+            self._dirty = True
+        return digest
+
+    def hash_many(self, paths, max_workers=None):
+        """Hash files in a thread pool. Returns {path: digest}; unreadable files are left out."""
+        def safe_hash(path):
+            try:
+                return self.hash(path)
+            except OSError as e:
+                logging.error(f"Error hashing {path}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=max_workers or default_hash_workers(), thread_name_prefix="hash") as executor:
+            digests = dict(zip(paths, executor.map(safe_hash, paths)))
+        return {path: digest for path, digest in digests.items() if digest}
+
+    def prune(self):
+        """Forget files that no longer exist."""
+        with self._lock:
+            missing = [path for path in self._entries if not os.path.exists(path)]
+            for path in missing:
+                del self._entries[path]
+            self._dirty = self._dirty or bool(missing)
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = dict(self._entries)
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.error(f"Error saving hash index to {self.path}: {e}")
+
+def fetch_present_hashes(session, server_url, token, mission_name, hashes, verify=False, timeout=30):
+    """
+    Ask the server which content hashes the mission already has, in batches.
+    Returns the set of present hashes; raises requests.RequestException on failure.
+    """
+    hashes = list(dict.fromkeys(hashes))
+    present = set()
+    for start in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+        response = session.post(
+            f"{server_url}/missions/{mission_name}/hashes",
+            headers={'x-access-token': token},
+            json={"hashes": hashes[start:start + LOOKUP_BATCH_SIZE]},
+            verify=verify,
+            timeout=timeout
+        )
+        response.raise_for_status()
+        present.update(response.json().get('present', []))
+    return present
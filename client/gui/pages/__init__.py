@@ -1,23 +1,24 @@
-from .login import show_login_screen
-from .signup import show_signup_screen
-from .main_interface import show_main_interface
-from .upload import show_upload_page
-from .home import show_home_page
-from .profile import show_profile_page
-from .settings import show_settings_page
-from .inspection import show_inspection_page
-from .team import show_team_page
-from .drone_specs import show_drone_specs
+import importlib
 
-__all__ = [
-    'show_login_screen',
-    'show_signup_screen',
-    'show_main_interface',
-    'show_upload_page',
-    'show_home_page',
-    'show_profile_page',
-    'show_settings_page',
-    'show_inspection_page',
-    'show_team_page',
-    'show_drone_specs'
-]
+# Page function -> module; modules are imported on first navigation so the window can
+# appear before the pages (and PIL) are loaded
+_PAGES = {
+    'show_connecting_screen': 'connecting',
+    'show_login_screen': 'login',
+    'show_signup_screen': 'signup',
+    'show_main_interface': 'main_interface',
+    'show_upload_page': 'upload',
+    'show_home_page': 'home',
+    'show_profile_page': 'profile',
+    'show_settings_page': 'settings',
+    'show_inspection_page': 'inspection',
+    'show_team_page': 'team',
+    'show_drone_specs': 'drone_specs'
+}
+
+__all__ = list(_PAGES)
+
+def __getattr__(name):
+    if name in _PAGES:
+        return getattr(importlib.import_module(f".{_PAGES[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,41 @@
+import customtkinter as ctk
+
+from .. import utils
+
+def show_connecting_screen(app, status="Connecting to server..."):
+    """Placeholder shown while the server check runs in the background; kept free of images so it draws at once."""
+    utils.clear_frame(app)
+
+    center_frame = ctk.CTkFrame(app.main_frame, fg_color=app.bg_color)
+    center_frame.place(relx=0.5, rely=0.5, anchor='center')
+
+    utils.create_label(app, center_frame, "SkySync - Autonomous Drone System", font=app.header_font, text_color=app.light_accent, pady=(30, 10))
+    utils.create_label(app, center_frame, "—" * 50, font=app.body_font, text_color=app.accent_color, pady=10)
+    app.connecting_status_label = utils.create_label(app, center_frame, status, font=app.subheader_font, pady=(40, 10))
+    app.connecting_buttons_frame = ctk.CTkFrame(center_frame, fg_color=app.bg_color)
+    app.connecting_buttons_frame.pack(pady=20)
+
+def set_connecting_status(app, status, text_color=None):
+    label = getattr(app, 'connecting_status_label', None)
+    if label is not None and label.winfo_exists():
+        label.configure(text=status, text_color=text_color or app.text_color)
+
+def show_connection_failed(app):
+    """The server never answered; let the user try again instead of exiting."""
+    set_connecting_status(app, "Server not found after repeated attempts.", app.error_color)
+    utils.create_button(app, app.connecting_buttons_frame, "Retry", app.connect_to_server, width=200, height=40)
+
+def show_certificate_changed(app, message):
+    """The server's certificate no longer matches the pinned one: possible MITM, so ask before trusting it."""
+    set_connecting_status(
+        app,
+        "WARNING: Server certificate fingerprint has CHANGED!\nPossible MITM attack. Proceed with caution.",
+        app.warning_color
+    )
+    utils.create_label(app, app.connecting_buttons_frame, message, font=("Helvetica Neue", 12), wraplength=700)
+    utils.create_button(app, app.connecting_buttons_frame, "Retry", app.connect_to_server, width=200, height=40)
+    utils.create_button(
+        app, app.connecting_buttons_frame, "Trust new certificate",
+        lambda: app.connect_to_server(trust_new_certificate=True),
+        fg_color=app.warning_color, width=200, height=40
+    )
@@ -1,4 +1,3 @@
-import requests  
 import customtkinter as ctk
 
 from .. import utils
@@ -63,30 +62,20 @@ def show_home_page(app):
 
 def create_mission(app):
     """
-    Sends a POST request to the server to create a new mission.
+    Sends a POST request to the server to create a new mission, in the background.
     """
-    try:
-        # Get mission name from the entry field
-        mission_name = app.mission_name_entry.get().strip()
-        if not mission_name:
-            show_home_error_message(app, "Mission name cannot be empty.")
-            return
-
-        # API request details
-        url = f"{app.SERVER_URL}/missions/create_mission"
-        headers = {
-            'x-access-token': app.token,
-            'Content-Type': 'application/json'
-        }
-        data = {'mission_name': mission_name}
-
-        # Make the POST request
-        response = requests.post(url, json=data, headers=headers, verify=False) #app.CERT_PATH)
+    # Get mission name from the entry field
+    mission_name = app.mission_name_entry.get().strip()
+    if not mission_name:
+        show_home_error_message(app, "Mission name cannot be empty.")
+        return
 
+    def on_response(response):
         if response.status_code == 200:
             # Mission creation succeeded
             show_home_info_message(app, "Mission created successfully.")
-            app.mission_name_entry.delete(0, 'end')  
+            if app.mission_name_entry.winfo_exists():
+                app.mission_name_entry.delete(0, 'end')
         else:
             # Handle server errors
             try:
@@ -95,12 +84,14 @@ def create_mission(app):
                 error_message = response.text or "Unknown error occurred."
             show_home_error_message(app, f"Error: {error_message}")
 
-    except requests.exceptions.RequestException as e:
-        # Handle network errors
-        show_home_error_message(app, f"Network error: {str(e)}")
-    except Exception as e:
-        # Handle unexpected errors
-        show_home_error_message(app, f"Unexpected error: {str(e)}")
+    # Network errors are reported the same way
+    app.api.post(
+        "/missions/create_mission",
+        json={'mission_name': mission_name},
+        token=app.token,
+        on_success=on_response,
+        on_error=lambda e: show_home_error_message(app, f"Network error: {str(e)}")
+    )
 
 def show_home_info_message(app, message):
     """
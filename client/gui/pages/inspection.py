@@ -1,14 +1,31 @@
 import customtkinter as ctk
-from tkinter import messagebox, ttk
+from tkinter import messagebox
 import tkinter as tk
 import requests
 import sys
 import os
 import logging
 import json
+import time
+import threading
 from PIL import Image, ImageTk
 
 from .. import utils
+from ..download_manager import DownloadManager, ETagStore, save_json_atomic
+from ..photo_grid import VirtualPhotoGrid
+from ..thumbnail_cache import ThumbnailCache
+
+# Grid thumbnails are fetched at this size; originals are downloaded only when opened
+THUMBNAIL_SIZE = 200
+FULL_VIEW_SIZE = 1000
+
+# One sync per mission folder at a time; a superseded sync stops before the next one starts
+_sync_locks = {}
+_sync_locks_lock = threading.Lock()
+
+def get_sync_lock(mission_dir):
+    with _sync_locks_lock:
+        return _sync_locks.setdefault(mission_dir, threading.Lock())
 
 def show_inspection_page(app):
     """Displays the inspection page with mission selection, photo type options, and photo display."""
@@ -19,26 +36,16 @@ def show_inspection_page(app):
 
     # Mission Selection
     utils.create_label(app, app.display_frame, "Select Mission:", font=app.body_font, text_color=app.text_color)
-    app.mission_var = tk.StringVar()
-    missions = get_missions(app)
-    if missions:
-        app.mission_dropdown = ctk.CTkOptionMenu(
-            app.display_frame,
-            variable=app.mission_var,
-            values=missions,
-            command=lambda mission_name: on_mission_select(app, mission_name),
-            fg_color=app.accent_color
-        )
-        app.mission_dropdown.pack(pady=10)
-    else:
-        utils.create_label(
-            app,
-            app.display_frame,
-            "No missions available. Please create a mission first.",
-            font=app.body_font,
-            text_color=app.text_color
-        )
-        return
+    app.mission_var = tk.StringVar(value="")
+    # Filled in by populate_missions once the list arrives from the server
+    app.mission_dropdown = ctk.CTkOptionMenu(
+        app.display_frame,
+        variable=app.mission_var,
+        values=["Loading missions..."],
+        state="disabled",
+        fg_color=app.accent_color
+    )
+    app.mission_dropdown.pack(pady=10)
 
     # Photo Type Selection
     utils.create_label(app, app.display_frame, "Select Photo Type:", font=app.body_font, text_color=app.text_color)
@@ -64,10 +71,36 @@ def show_inspection_page(app):
         pady=10
     )
 
+    # Analysis progress, filled in while a job is running
+    app.analysis_status_label = utils.create_label(
+        app,
+        app.display_frame,
+        "",
+        font=app.body_font,
+        text_color=app.text_color,
+        pady=5
+    )
+
     # Initialize Photos Frame after clearing display_frame
     app.photos_frame = ctk.CTkFrame(app.display_frame, fg_color=app.bg_color)
     app.photos_frame.pack(fill='both', expand=True, padx=50, pady=10)
 
+    get_missions(app, lambda missions: populate_missions(app, missions))
+
+def populate_missions(app, missions):
+    """Fill the mission dropdown and restore the previous selection (runs on the Tk thread)."""
+    if not hasattr(app, 'mission_dropdown') or not app.mission_dropdown.winfo_exists():
+        return
+    if not missions:
+        app.mission_dropdown.configure(values=["No missions available"], state="disabled")
+        app.mission_var.set("No missions available. Please create a mission first.")
+        return
+    app.mission_dropdown.configure(
+        values=missions,
+        state="normal",
+        command=lambda mission_name: on_mission_select(app, mission_name)
+    )
+
     # Restore previously selected mission and photo type if available
     if hasattr(app, 'selected_mission') and app.selected_mission in missions:
         app.mission_var.set(app.selected_mission)
@@ -90,6 +123,7 @@ def on_mission_select(app, mission_name):
         return
 
     # Update the selected mission and reset dependent attributes
+    app.selected_mission = mission_name
     app.mission_name = mission_name
     app.photo_type = None  
     app.photo_type_var.set("")  
@@ -98,61 +132,115 @@ def on_mission_select(app, mission_name):
     app.photo_type_dropdown.configure(values=["All", "Crack", "Spall", "Corrosion"], state="normal")
 
     # Clear any displayed photos
+    close_photo_grid(app)
     if hasattr(app, 'photos_frame') and app.photos_frame.winfo_exists():
         utils.clear_frame(app, app.photos_frame)
-    app.photo_images = []
 
-def sync_photos(app, mission_name, photo_type):
-    """Sync photos between server and client."""
+def sync_photos(app, mission_name, manager, progress_callback=None):
+    """
+    Sync photos between server and client through the mission's change feed. Runs on a background thread.
+    Only photos changed since the stored cursor are fetched; the cache manifest and cursor are written
+    after every page, so an interrupted sync resumes where it stopped. Once the manager is cancelled
+    nothing more is written and the page in progress is fetched again by the next sync.
+    Returns an error message, or None on success or cancellation.
+    """
     mission_dir = os.path.join(app.cache_dir, app.username, mission_name)
     os.makedirs(mission_dir, exist_ok=True)
 
-    # Path for {mission_name}_cache.json
+    # Path for {mission_name}_cache.json and the change feed cursor
     cache_file = os.path.join(mission_dir, f"{mission_name}_cache.json")
-    try:
-        if os.path.exists(cache_file):
-            with open(cache_file, "r") as f:
-                cached_photos = json.load(f)
-        else:
-            cached_photos = {}
-    except (json.JSONDecodeError, IOError) as e:
-        logging.error(f"Error reading cache file {cache_file}: {e}")
-        utils.show_error_message_box(app, f"Error reading cache file: {e}")
-        cached_photos = {}
-
-    # Ensure cached_photos is structured as a dict
-    if not isinstance(cached_photos, dict):
-        logging.warning(f"Invalid cache structure in {cache_file}. Resetting to empty dict.")
-        cached_photos = {}
+    state_file = os.path.join(mission_dir, f"{mission_name}_sync.json")
+    cached_photos = load_cache(cache_file)
+    cursor = load_cache(state_file).get("cursor")
 
-    # Prepare request data
     headers = {"x-access-token": app.token}
-    data = {"cached_photos": cached_photos}
+    while not manager.cancelled.is_set():
+        try:
+            response = manager.session.get(
+                f"{app.SERVER_URL}/missions/{mission_name}/changes",
+                headers=headers,
+                params={"since": cursor} if cursor else None,
+                # verify=app.CERT_PATH,
+                verify=False,
+                timeout=manager.timeout,
+            )
+        except requests.RequestException as e:
+            logging.error(f"Error syncing photos: {e}")
+            return "Failed to sync photos with the server."
+
+        if response.status_code != 200:
+            logging.error(f"Failed to sync photos: {response.status_code} - {response.text}")
+            return "Failed to sync photos with the server."
 
-    # Send cached data to the server and fetch new photos
-    try:
-        response = requests.post(
-            f"{app.SERVER_URL}/missions/{mission_name}/photos",
-            headers=headers,
-            json=data,
-            # verify=app.CERT_PATH,
-            verify=False,
+        feed = response.json()
+        # Without a cursor this is a first sync, so files already cached under the same type are kept
+        complete = apply_photo_changes(
+            manager, mission_name, mission_dir, cached_photos, feed["changes"],
+            replace=cursor is not None, progress_callback=progress_callback
         )
-        if response.status_code == 200:
-            new_photos = response.json()
-            for pt, photos in new_photos.items():
-                photo_type_dir = os.path.join(mission_dir, pt)
-                os.makedirs(photo_type_dir, exist_ok=True)
-                download_new_photos(app, mission_name, pt, photos)
-                cached_photos.setdefault(pt, []).extend(photos)
-            # Save all cached photos into {mission_name}_cache.json
-            with open(cache_file, "w") as f:
-                json.dump(cached_photos, f)
-        else:
-            logging.error(f"Failed to sync photos: {response.status_code} - {response.text}")
-            utils.show_error_message_box(app, "Failed to sync photos with the server.")
-    except requests.RequestException as e:
-        logging.error(f"Error syncing photos: {e}")
+        if manager.cancelled.is_set():
+            return None
+        try:
+            save_json_atomic(cache_file, cached_photos)
+            if complete:
+                # Only move past a page once every photo in it is on disk
+                cursor = feed["cursor"]
+                save_json_atomic(state_file, {"cursor": cursor})
+        except IOError as e:
+            logging.error(f"Error updating cache file {cache_file}: {e}")
+            return f"Error writing cache file: {e}"
+        if not complete:
+            return "Some photos could not be downloaded."
+        if not feed["has_more"]:
+            return None
+
+def apply_photo_changes(manager, mission_name, mission_dir, cached_photos, changes, replace=True,
+                        progress_callback=None):
+    """
+    Apply one page of change feed entries to the local cache: drop deleted photos, move
+    reclassified ones into their new type folder, then fetch new thumbnails and revalidate
+    changed ones by ETag (a 304 keeps the local copy). Returns True if every download succeeded.
+    """
+    if manager.cancelled.is_set():
+        return False
+    etags = ETagStore(mission_dir)
+    to_download = []
+    for change in changes:
+        filename, photo_type = change["filename"], change["photo_type"]
+        for pt, files in cached_photos.items():
+            if filename not in files or (pt == photo_type and not change["deleted"]):
+                continue
+            files.remove(filename)
+            local_path = os.path.join(mission_dir, pt, filename)
+            full_path = os.path.join(mission_dir, pt, "full", filename)
+            if os.path.exists(full_path):
+                os.remove(full_path)
+            if not os.path.exists(local_path):
+                continue
+            if change["deleted"]:
+                os.remove(local_path)
+                etags.set(local_path, None)
+            else:
+                # The thumbnail is the same image under a new type; keep it and let the server confirm
+                new_path = os.path.join(mission_dir, photo_type, filename)
+                os.makedirs(os.path.dirname(new_path), exist_ok=True)
+                os.replace(local_path, new_path)
+                etags.move(local_path, new_path)
+        if not change["deleted"]:
+            to_download.append((photo_type, filename))
+    etags.save()
+
+    # Without a cursor (first sync) files already on disk are trusted; afterwards they are revalidated
+    downloaded = manager.download_all(
+        mission_name, mission_dir, to_download, progress_callback, size=THUMBNAIL_SIZE, revalidate=replace
+    )
+
+    # Only record photos that actually made it to disk
+    for pt, filename in downloaded:
+        files = cached_photos.setdefault(pt, [])
+        if filename not in files:
+            files.append(filename)
+    return len(downloaded) == len(to_download)
 
 def load_cache(cache_file):
     """Load cached photos from {mission_name}_cache.json."""
@@ -170,61 +258,72 @@ def load_cache(cache_file):
         cached_photos = {}
     return cached_photos
 
-def download_new_photos(app, mission_name, photo_type, new_photos):
-    """Download new photos from the server and update the cache."""
-    mission_dir = os.path.join(app.cache_dir, app.username, mission_name)
-    photo_type_dir = os.path.join(mission_dir, photo_type)
-    os.makedirs(photo_type_dir, exist_ok=True)
+def load_photos(app, photo_type):
+    """Sync photos in the background, then display them from cache."""
+    if not hasattr(app, 'selected_mission') or not app.selected_mission or not photo_type:
+        return
 
-    cache_file = os.path.join(mission_dir, f"{mission_name}_cache.json")
+    app.photo_type = photo_type
+    mission_name = app.selected_mission
 
-    for photo in new_photos:
-        local_path = os.path.join(photo_type_dir, photo)
-        if not os.path.exists(local_path):
-            try:
-                response = requests.get(
-                    f"{app.SERVER_URL}/missions/{mission_name}/photos/{photo}",
-                    headers={"x-access-token": app.token},
-                    # verify=app.CERT_PATH,
-                    verify=False,
-                    stream=True,
-                )
-                if response.status_code == 200:
-                    with open(local_path, "wb") as f:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            f.write(chunk)
-                    logging.info(f"Downloaded photo: {photo} to {local_path}")
-                else:
-                    logging.error(f"Failed to download image {photo}: {response.status_code} - {response.text}")
-            except requests.RequestException as e:
-                logging.error(f"Error downloading image {photo}: {e}")
+    # A newer selection supersedes any sync that is still running
+    if getattr(app, 'photo_sync', None) is not None:
+        app.photo_sync.cancel()
+    app.photo_sync_generation = getattr(app, 'photo_sync_generation', 0) + 1
+    generation = app.photo_sync_generation
 
-    # Update {mission_name}_cache.json
-    try:
-        if os.path.exists(cache_file):
-            with open(cache_file, "r") as f:
-                cached_photos = json.load(f)
-        else:
-            cached_photos = {}
+    manager = DownloadManager(app.SERVER_URL, app.token, verify=False, session=app.api.session)
+    app.photo_sync = manager
+    show_sync_status(app, "Syncing photos...")
 
-        if not isinstance(cached_photos, dict):
-            cached_photos = {}
+    def progress(done, total):
+        if total:
+            app.root.after(0, show_sync_status, app, f"Downloading photos: {done}/{total}", generation)
 
-        cached_photos.setdefault(photo_type, []).extend(new_photos)
-        with open(cache_file, "w") as f:
-            json.dump(cached_photos, f)
-    except IOError as e:
-        logging.error(f"Error updating cache.json: {e}")
+    def worker():
+        try:
+            # Waits for a superseded sync of this mission to stop
+            with get_sync_lock(os.path.join(app.cache_dir, app.username, mission_name)):
+                error = sync_photos(app, mission_name, manager, progress)
+        except Exception as e:
+            logging.error(f"Unexpected error syncing photos: {e}")
+            error = "Failed to sync photos with the server."
+        finally:
+            manager.close()
+        app.root.after(0, on_sync_finished, app, generation, mission_name, photo_type, error)
 
-def load_photos(app, photo_type):
-    """Load and display photos from cache."""
-    if not hasattr(app, 'selected_mission') or not app.selected_mission or not photo_type:
+    threading.Thread(target=worker, daemon=True).start()
+
+def show_sync_status(app, message, generation=None):
+    """Show sync progress in the photos frame (runs on the Tk thread)."""
+    if generation is not None and generation != getattr(app, 'photo_sync_generation', None):
         return
+    if not hasattr(app, 'photos_frame') or not app.photos_frame.winfo_exists():
+        return
+    label = getattr(app, 'sync_status_label', None)
+    if label is None or not label.winfo_exists():
+        utils.clear_frame(app, app.photos_frame)
+        app.sync_status_label = utils.create_label(
+            app,
+            app.photos_frame,
+            message,
+            font=app.body_font,
+            text_color=app.text_color
+        )
+    else:
+        label.configure(text=message)
 
-    app.photo_type = photo_type
-    sync_photos(app, app.selected_mission, photo_type)
+def on_sync_finished(app, generation, mission_name, photo_type, error):
+    """Display cached photos once a background sync completes (runs on the Tk thread)."""
+    if generation != getattr(app, 'photo_sync_generation', None):
+        return
+    app.photo_sync = None
+    if not hasattr(app, 'photos_frame') or not app.photos_frame.winfo_exists():
+        return
+    if error:
+        utils.show_error_message_box(app, error)
 
-    cache_file = os.path.join(app.cache_dir, app.username, app.selected_mission, f"{app.selected_mission}_cache.json")
+    cache_file = os.path.join(app.cache_dir, app.username, mission_name, f"{mission_name}_cache.json")
     cached_photos = load_cache(cache_file)
 
     if photo_type == "All":
@@ -238,31 +337,9 @@ def load_photos(app, photo_type):
 
     display_cached_photos(app, photos)
 
-def get_cached_image(app, photo):
-    """Get the local path to a cached image."""
-    filename = photo.get("filename")
-    if not filename:
-        logging.error("Photo does not have a valid filename.")
-        return None
-
-    mission_dir = os.path.join(app.cache_dir, app.username, app.selected_mission)
-    photo_type = photo.get("photo_type", "Unprocessed")
-    photo_type_dir = os.path.join(mission_dir, photo_type)
-    local_image_path = os.path.join(photo_type_dir, filename)
-
-    if not os.path.exists(local_image_path):
-        logging.error(f"Image file {local_image_path} does not exist.")
-        return None
-    return local_image_path
-
-def get_missions(app):
-    """Fetch the list of missions for the current user."""
-    try:
-        return utils.fetch_missions(app)
-    except Exception as e:
-        logging.error(f"Error fetching missions: {e}")
-        utils.show_error_message_box(app, "Failed to fetch missions.")
-        return []
+def get_missions(app, callback):
+    """Fetch the list of missions for the current user in the background."""
+    return utils.fetch_missions(app, callback)
 
 def analyze_inspection(app):
     """Trigger analysis for the selected mission."""
@@ -272,239 +349,193 @@ def analyze_inspection(app):
         app.root.focus_force()
         return
 
-    headers = {'x-access-token': app.token}
-    try:
-        response = requests.post(
-            f'{app.SERVER_URL}/analyze',
-            json={'mission_name': app.selected_mission},
-            headers=headers,
-            # verify=app.CERT_PATH
-            verify=False
-        )
+    mission_name = app.selected_mission
+
+    def on_response(response):
         if response.status_code == 200:
+            job_id = response.json().get('job_id')
             messagebox.showinfo("Success", response.json().get('message'))
             app.root.focus_force()
-            # Update photo type dropdown after analysis
-            app.photo_type_dropdown.configure(values=["All", "Crack", "Spall", "Corrosion"])
-            app.photo_type_var.set("All")
-            load_photos(app, "All")
+            if job_id:
+                # Results are loaded once the job reports completion
+                track_analysis_job(app, mission_name, job_id)
         else:
             messagebox.showerror("Error", f"Failed to start analysis: {response.text}")
             app.root.focus_force()
-    except requests.exceptions.RequestException as e:
+
+    def on_error(e):
         messagebox.showerror("Error", f"Server connection issue: {e}")
         logging.error(f"Error during analysis: {e}")
         app.root.focus_force()
 
-def get_photos(app, mission_name, photo_type):
-    """Fetch photos from the server."""
-    try:
-        headers = {'x-access-token': app.token}
-        params = {}
-        if photo_type != "All":
-            params['photo_type'] = photo_type
-
-        response = requests.get(
-            f"{app.SERVER_URL}/missions/{mission_name}/photos",
-            headers=headers,
-            params=params,
-            # verify=app.CERT_PATH
-            verify=False
+    app.api.post(
+        '/analyze',
+        json={'mission_name': mission_name},
+        token=app.token,
+        on_success=on_response,
+        on_error=on_error
+    )
+
+def track_analysis_job(app, mission_name, job_id, wait=25):
+    """Long-poll an analysis job on a background thread and report progress through root.after."""
+    app.analysis_job_id = job_id
+
+    def worker():
+        since = -1
+        failures = 0
+        # Long-polls share the app's pinned keep-alive session
+        session = app.api.session
+        while getattr(app, 'analysis_job_id', None) == job_id:
+            try:
+                response = session.get(
+                    f"{app.SERVER_URL}/analyze/{job_id}",
+                    params={'wait': wait, 'since': since},
+                    headers={'x-access-token': app.token},
+                    # verify=app.CERT_PATH,
+                    verify=False,
+                    timeout=wait + 10
+                )
+            except requests.RequestException as e:
+                failures += 1
+                logging.error(f"Error polling analysis job {job_id}: {e}")
+                if failures >= 5:
+                    app.root.after(0, on_analysis_status, app, mission_name, job_id, None)
+                    return
+                time.sleep(2 * failures)
+                continue
+            if response.status_code != 200:
+                logging.error(f"Failed to poll analysis job {job_id}: {response.status_code} - {response.text}")
+                app.root.after(0, on_analysis_status, app, mission_name, job_id, None)
+                return
+            failures = 0
+            status = response.json()
+            since = status.get('photos_done', since)
+            app.root.after(0, on_analysis_status, app, mission_name, job_id, status)
+            if status.get('state') in ("SUCCESS", "FAILURE"):
+                return
+
+    threading.Thread(target=worker, daemon=True).start()
+
+def on_analysis_status(app, mission_name, job_id, status):
+    """Show analysis progress and refresh photos when the job finishes (runs on the Tk thread)."""
+    if getattr(app, 'analysis_job_id', None) != job_id:
+        return
+    label = getattr(app, 'analysis_status_label', None)
+    has_label = label is not None and label.winfo_exists()
+
+    if status is None:
+        app.analysis_job_id = None
+        if has_label:
+            label.configure(text="Lost track of the analysis job.")
+        return
+
+    state = status.get('state')
+    if state == "SUCCESS":
+        app.analysis_job_id = None
+        if has_label:
+            label.configure(text=f"Analysis complete: {status['photos_done']}/{status['photos_total']} photos.")
+        if getattr(app, 'selected_mission', None) == mission_name and hasattr(app, 'photo_type_dropdown') \
+                and app.photo_type_dropdown.winfo_exists():
+            app.photo_type_dropdown.configure(values=["All", "Crack", "Spall", "Corrosion"])
+            app.photo_type_var.set("All")
+            load_photos(app, "All")
+    elif state == "FAILURE":
+        app.analysis_job_id = None
+        if has_label:
+            label.configure(text="Analysis failed. Photos that were not analyzed can be retried.")
+    elif has_label:
+        eta = f", about {int(status['eta'])}s left" if status.get('eta') is not None else ""
+        label.configure(
+            text=f"Analyzing: {status['photos_done']}/{status['photos_total']} photos "
+                 f"({status['throughput']:.1f}/s{eta})"
         )
-        if response.status_code == 200:
-            photos = response.json()
-            logging.info(f"Fetched photos: {photos}")
-            if not photos:
-                logging.warning("No photos retrieved for the mission.")
-            return photos
-        else:
-            logging.error(f"Failed to fetch photos: {response.status_code} - {response.text}")
-            return []
-    except Exception as e:
-        logging.error(f"Error fetching photos: {e}")
-        return []
-
-def get_cached_image(app, photo):
-    """Get the local path to a cached image."""
-    filename = photo.get("filename")
-    if not filename:
-        logging.error("Photo does not have a valid filename.")
-        return None
-
-    mission_dir = os.path.join(app.cache_dir, app.username, app.mission_name)
-    photo_type = photo.get("photo_type", "Unprocessed")
-    photo_type_dir = os.path.join(mission_dir, photo_type)
-    local_image_path = os.path.join(photo_type_dir, filename)
-
-    if not os.path.exists(local_image_path):
-        logging.error(f"Image file {local_image_path} does not exist.")
-        return None
-    else:
-        logging.info(f"Using cached image: {local_image_path}")
-    return local_image_path
 
 def display_cached_photos(app, photos):
-    """Display cached photos from the local directories."""
+    """Display cached photos in a virtualized grid that decodes thumbnails in the background."""
+    close_photo_grid(app)
     utils.clear_frame(app, app.photos_frame)
-    app.photo_images = []  # Prevent garbage collection
+    photos = [p for p in photos if p.get("filename") and p.get("photo_type")]
     if not photos:
         display_no_photos(app)
         return
 
-    # Create a scrollable canvas for the photo display
-    canvas = tk.Canvas(app.photos_frame, highlightthickness=0, bd=0)
-    scrollbar = ttk.Scrollbar(app.photos_frame, orient="vertical", command=canvas.yview)
-    canvas.configure(yscrollcommand=scrollbar.set)
-    canvas.pack(side="left", fill="both", expand=True)
-    scrollbar.pack(side="right", fill="y")
-
-    # Create an inner frame for the content inside the canvas
-    photo_inner_frame = ttk.Frame(canvas)
-    canvas.create_window((0, 0), window=photo_inner_frame, anchor="nw")
-
-    # Update the scrollable region when the inner frame's size changes
-    photo_inner_frame.bind(
-        "<Configure>",
-        lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-    )
-
-    # Keep track of loaded images
-    columns, thumbnail_size, pady = 5, 200, 10
-    row, col = 0, 0
-
-    for photo in photos:
-        photo_type = photo.get("photo_type")
-        filename = photo.get("filename")
-        if not filename or not photo_type:
-            continue
-
-        # Construct the full path to the photo
-        mission_dir = os.path.join(app.cache_dir, app.username, app.selected_mission)
-        photo_type_dir = os.path.join(mission_dir, photo_type)
-        local_image_path = os.path.join(photo_type_dir, filename)
+    mission_dir = os.path.join(app.cache_dir, app.username, app.selected_mission)
 
+    def resolve_path(photo):
+        local_image_path = os.path.join(mission_dir, photo["photo_type"], photo["filename"])
         if not os.path.exists(local_image_path):
             logging.warning(f"Image file {local_image_path} does not exist. Skipping.")
-            continue
-
-        try:
-            # Load and resize the photo
-            image = Image.open(local_image_path)
-            image.thumbnail((thumbnail_size, thumbnail_size))
-            photo_image = ImageTk.PhotoImage(image)
-            app.photo_images.append(photo_image)  # Prevent garbage collection
-
-            # Determine padding
-            if col == 0:
-                padx = (0, 5)
-            elif col == columns - 1:
-                padx = (5, 0)
-            else:
-                padx = (5, 5)
-
-            # Add image label
-            image_label = tk.Label(photo_inner_frame, image=photo_image)
-            image_label.grid(row=row, column=col, padx=padx, pady=pady)
-
-            # Add a status label if applicable
-            if photo_type in ["Crack", "Spall", "Corrosion"]:
-                status_label = tk.Label(
-                    photo_inner_frame,
-                    text=f"Type: {photo_type}",
-                    font=("Helvetica", 10),
-                    fg="blue"
-                )
-                status_label.grid(row=row + 1, column=col, padx=padx, pady=2)
+            return None
+        return local_image_path
 
-            # Handle column wrapping
-            col += 1
-            if col >= columns:
-                col = 0
-                row += 2
-
-        except Exception as e:
-            logging.error(f"Error displaying image {local_image_path}: {e}")
-
-    # If no photos were displayed, show "No photos found"
-    if not app.photo_images:
-        display_no_photos(app)
-
-def display_photos(app, photos):
-    """Display photos in a grid layout."""
-    utils.clear_frame(app, app.photos_frame)
-
-    canvas = tk.Canvas(app.photos_frame, highlightthickness=0, bd=0)
-    scrollbar = ttk.Scrollbar(app.photos_frame, orient="vertical", command=canvas.yview)
-    canvas.configure(yscrollcommand=scrollbar.set)
-    canvas.pack(side="left", fill="both", expand=True)
-    scrollbar.pack(side="right", fill="y")
-
-    # Style the scrollbar to make it visually seamless
-    style = ttk.Style()
-    style.configure("TScrollbar", background=app.bg_color, troughcolor=app.bg_color, bordercolor=app.bg_color, arrowcolor=app.bg_color)
-
-    # Create an inner frame for the content inside the canvas
-    photo_inner_frame = ttk.Frame(canvas)
-    canvas.create_window((0, 0), window=photo_inner_frame, anchor="nw")
-
-    # Update scrollable region when the inner frame's size changes
-    photo_inner_frame.bind(
-        "<Configure>",
-        lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+    app.photo_grid = VirtualPhotoGrid(
+        app.photos_frame,
+        photos,
+        resolve_path,
+        dispatch=lambda fn, *args: app.root.after(0, fn, *args),
+        on_click=lambda photo: open_full_photo(app, photo),
+        columns=5,
+        cell_size=THUMBNAIL_SIZE,
+        thumbnail_cache=get_thumbnail_cache(app)
     )
 
-    # Keep a list of photo images to prevent garbage collection
-    app.photo_images = []
-    columns, thumbnail_size, pady = 5, 200, 10
-    row, col = 0, 0
-
-    total_photos = len(photos)
-    for idx, photo in enumerate(photos):
-        local_image_path = get_cached_image(app, photo)
-        if not local_image_path or not os.path.exists(local_image_path):
-            continue
+def get_thumbnail_cache(app):
+    """Return the app-wide thumbnail cache, shared across missions and photo type switches."""
+    cache = getattr(app, 'thumbnail_cache', None)
+    if cache is None:
+        cache = ThumbnailCache(app.cache_dir, THUMBNAIL_SIZE)
+        app.thumbnail_cache = cache
+    return cache
+
+def close_photo_grid(app):
+    """Stop the current grid's background decoding before its widgets go away."""
+    if getattr(app, 'photo_grid', None) is not None:
+        app.photo_grid.close()
+        app.photo_grid = None
+
+def open_full_photo(app, photo):
+    """Show a photo at full resolution, downloading the original in the background if needed."""
+    mission_name = app.selected_mission
+    photo_type, filename = photo["photo_type"], photo["filename"]
+    full_dir = os.path.join(app.cache_dir, app.username, mission_name, photo_type, "full")
+    local_path = os.path.join(full_dir, filename)
+    if os.path.exists(local_path):
+        show_full_photo(app, filename, local_path)
+        return
 
+    def worker():
+        os.makedirs(full_dir, exist_ok=True)
+        manager = DownloadManager(app.SERVER_URL, app.token, max_workers=1, verify=False, session=app.api.session)
+        # An earlier, interrupted download of this original resumes where it stopped
+        etags = ETagStore(full_dir)
         try:
-            # Load and resize the photo
-            image = Image.open(local_image_path)
-            image.thumbnail((thumbnail_size, thumbnail_size))
-            photo_image = ImageTk.PhotoImage(image)
-            app.photo_images.append(photo_image)  
-
-            # Determine padx for first and last columns
-            if col == 0:
-                padx = (0, 5)
-            elif col == columns - 1 or idx == total_photos - 1:
-                padx = (5, 0)
-            else:
-                padx = (5, 5)
-
-            image_label = tk.Label(photo_inner_frame, image=photo_image)
-            image_label.grid(row=row, column=col, padx=padx, pady=pady)
-
-            # Add a status label if applicable
-            if photo.get('photo_type') in ["Crack", "Spall", "Corrosion"]:
-                status_label = tk.Label(
-                    photo_inner_frame,
-                    text=f"Type: {photo['photo_type']}",
-                    font=("Helvetica", 10),
-                    fg="blue"
-                )
-                status_label.grid(row=row + 1, column=col, padx=padx, pady=2)
-
-            # Increment column and handle wrapping to the next row
-            col += 1
-            if col >= columns:
-                col = 0
-                row += 2  
-
-        except Exception as e:
-            logging.error(f"Error displaying image {local_image_path}: {e}")
+            ok = manager.download_one(mission_name, filename, local_path, etags=etags)
+        finally:
+            etags.save()
+            manager.close()
+        app.root.after(0, show_full_photo, app, filename, local_path if ok else None)
+
+    threading.Thread(target=worker, daemon=True).start()
+
+def show_full_photo(app, filename, local_path):
+    """Open a window with the full-resolution photo (runs on the Tk thread)."""
+    if local_path is None:
+        utils.show_error_message_box(app, f"Failed to download {filename}.")
+        return
+    try:
+        image = Image.open(local_path)
+        image.thumbnail((FULL_VIEW_SIZE, FULL_VIEW_SIZE))
+    except Exception as e:
+        logging.error(f"Error opening image {local_path}: {e}")
+        utils.show_error_message_box(app, f"Failed to open {filename}.")
+        return
 
-    # If no photos were displayed, show "No photos found"
-    if not app.photo_images:
-        logging.info("No photos to display.")
-        display_no_photos(app)
+    viewer = ctk.CTkToplevel(app.root)
+    viewer.title(filename)
+    photo_image = ImageTk.PhotoImage(image)
+    label = tk.Label(viewer, image=photo_image)
+    label.image = photo_image  # Prevent garbage collection
+    label.pack(padx=10, pady=10)
 
 def display_no_photos(app):
     """Display a message when no photos are found."""
@@ -1,7 +1,6 @@
 import customtkinter as ctk
 import tkinter as tk
 from PIL import Image, ImageTk
-import requests
 import logging
 
 from .. import utils
@@ -95,29 +94,32 @@ def verify_login(app):
     process_login(app, username, password)
 
 def process_login(app, username, password):
-    """Process login request."""
-    try:
-        response = requests.post(
-            f'{app.SERVER_URL}/login',
-            json={'username': username, 'password': password},
-            # verify=app.CERT_PATH,
-            verify=False,
-            timeout=10
-        )
-    except requests.exceptions.RequestException as e:
+    """Process login request in the background."""
+    def on_response(response):
+        if response.status_code == 200:
+            app.is_logged_in = True
+            app.username = username
+            app.token = response.json().get('token')
+            app.save_session()
+            app.show_main_interface()
+        elif response.status_code == 401:
+            utils.show_error_message(app, "Invalid credentials.")
+            app.root.focus_force()
+        elif response.status_code == 503:
+            utils.show_error_message(app, "Server is busy, please try again in a moment.")
+            app.root.focus_force()
+        else:
+            utils.show_error_message(app, f"Unexpected error: {response.status_code}")
+            app.root.focus_force()
+
+    def on_error(e):
         utils.show_error_message_box(app, f"Server connection issue: {e}")
         app.root.focus_force()
-        return
 
-    if response.status_code == 200:
-        app.is_logged_in = True
-        app.username = username
-        app.token = response.json().get('token')
-        app.save_session()
-        app.show_main_interface()
-    elif response.status_code == 401:
-        utils.show_error_message(app, "Invalid credentials.")
-        app.root.focus_force()
-    else:
-        utils.show_error_message(app, f"Unexpected error: {response.status_code}")
-        app.root.focus_force()
+    app.api.post(
+        '/login',
+        json={'username': username, 'password': password},
+        on_success=on_response,
+        on_error=on_error,
+        scope="login"
+    )
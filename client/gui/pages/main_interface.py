@@ -70,6 +70,8 @@ def create_sidebar_buttons(app):
 
 def handle_logout(app):
     """Handles the logout process."""
+    # Revoke the token server-side; the local session is cleared whatever the outcome
+    app.api.post("/logout", token=app.token, scope="logout")
     app.remove_session()
     app.is_logged_in = False
     app.token = None
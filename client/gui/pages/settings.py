@@ -1,6 +1,5 @@
 from .. import utils
 import customtkinter as ctk
-import requests
 
 def show_settings_page(app):
     """
@@ -140,32 +139,39 @@ def submit_password_change(app, old_password_entry, new_password_entry, confirm_
         dialog.after(100, dialog.focus_force)
         return
 
-    # Send change password request to server
-    try:
-        headers = {
-            "x-access-token": app.token,  
-            "Content-Type": "application/json"
-        }
-        payload = {"old_password": old_password, "new_password": new_password}
-
-        response = requests.post(
-            f"{app.SERVER_URL}/change_password",
-            json=payload,
-            headers=headers,
-            # verify=app.CERT_PATH,
-            verify=False,
-        )
+    # Send change password request to server in the background
+    def on_response(response):
         if response.status_code == 200:
+            # Tokens issued before the change no longer work; carry on with the fresh one
+            token = response.json().get('token')
+            if token:
+                app.token = token
+                app.save_session()
             show_settings_info_message(app, "Password changed successfully!")
-            close_dialog(dialog, app)
-        else:
-            utils.show_error_message_box(
-                app, f"Failed to change password: {response.status_code} {response.json().get('error', 'Unknown error')}"
-            )
+            if dialog.winfo_exists():
+                close_dialog(dialog, app)
+            return
+        try:
+            error = response.json().get('error', 'Unknown error')
+        except ValueError:
+            error = 'Unknown error'
+        utils.show_error_message_box(app, f"Failed to change password: {response.status_code} {error}")
+        if dialog.winfo_exists():
             dialog.after(100, dialog.focus_force)
-    except requests.exceptions.RequestException as e:
+
+    def on_error(e):
         utils.show_error_message_box(app, f"Server connection issue: {e}")
-        dialog.after(100, dialog.focus_force)
+        if dialog.winfo_exists():
+            dialog.after(100, dialog.focus_force)
+
+    app.api.post(
+        "/change_password",
+        json={"old_password": old_password, "new_password": new_password},
+        token=app.token,
+        on_success=on_response,
+        on_error=on_error,
+        scope="settings"
+    )
 
 def show_settings_info_message(app, message):
     """Displays an info message in the settings page."""
@@ -2,7 +2,6 @@ import customtkinter as ctk
 from tkinter import messagebox
 import tkinter as tk
 from PIL import Image, ImageTk
-import requests
 import logging
 import re
 
@@ -134,14 +133,7 @@ def submit_signup(app):
         app.root.focus_force()
         return
 
-    try:
-        # Send signup request to the server
-        response = requests.post(
-            f'{app.SERVER_URL}/register',
-            json={'username': username, 'password': password},
-            # verify=app.CERT_PATH
-            verify=False
-        )
+    def on_response(response):
         if response.status_code == 201:
             # Success: Account created
             messagebox.showinfo("Success", "Account created successfully! Please log in.")
@@ -155,12 +147,22 @@ def submit_signup(app):
             # Other errors
             messagebox.showerror("Error", "Registration failed.")
             app.root.focus_force()
-    except requests.exceptions.RequestException as e:
+
+    def on_error(e):
         # Handle server connection issues
         logging.error(f"Error in submit_signup: {e}")
         messagebox.showerror("Error", "Server connection issue.")
         app.root.focus_force()
 
+    # Send signup request to the server in the background
+    app.api.post(
+        '/register',
+        json={'username': username, 'password': password},
+        on_success=on_response,
+        on_error=on_error,
+        scope="signup"
+    )
+
 def is_username_valid(username):
     """Check if the username meets the minimum length requirement."""
     if len(username) < 5:
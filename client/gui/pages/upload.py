@@ -1,11 +1,12 @@
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import filedialog
-import requests
 import os
 import logging
 
 from .. import utils
+from ..upload_engine import UploadEngine
+from ..hash_index import HashIndex
 
 def show_upload_page(app):
     """Displays the Upload Images page."""
@@ -25,31 +26,17 @@ def show_upload_page(app):
         text_color=app.text_color
     )
 
-    app.mission_var = tk.StringVar()
-    missions = get_missions(app)
-
-    if missions:
-        app.mission_dropdown = ctk.CTkOptionMenu(
-            app.display_frame,
-            variable=app.mission_var,
-            values=missions,
-            command=lambda mission: on_mission_select(app, mission),
-            fg_color=app.accent_color
-        )
-    else:
-        app.mission_dropdown = ctk.CTkOptionMenu(
-            app.display_frame,
-            variable=app.mission_var,
-            values=["Please create a mission first"],
-            state="disabled",
-            fg_color=app.accent_color
-        )
+    app.mission_var = tk.StringVar(value="")
+    # Filled in by populate_missions once the list arrives from the server
+    app.mission_dropdown = ctk.CTkOptionMenu(
+        app.display_frame,
+        variable=app.mission_var,
+        values=["Loading missions..."],
+        state="disabled",
+        fg_color=app.accent_color
+    )
     app.mission_dropdown.pack(pady=10)
-
-    if missions and hasattr(app, 'selected_mission') and app.selected_mission in missions:
-        app.mission_var.set(app.selected_mission)
-    else:
-        app.mission_var.set("" if missions else "Please create a mission first")
+    get_missions(app, lambda missions: populate_missions(app, missions))
 
     # Initialize image tracking attributes if not already set
     if not hasattr(app, 'selected_images'):
@@ -165,9 +152,27 @@ def show_upload_page(app):
 
     canvas.bind_all("<MouseWheel>", utils.enable_mouse_wheel_scrolling(app))
 
-def get_missions(app):
-    """Fetch the list of missions for the current user."""
-    return utils.fetch_missions(app)
+def get_missions(app, callback):
+    """Fetch the list of missions for the current user in the background."""
+    return utils.fetch_missions(app, callback)
+
+def populate_missions(app, missions):
+    """Fill the mission dropdown once the missions have loaded (runs on the Tk thread)."""
+    if not hasattr(app, 'mission_dropdown') or not app.mission_dropdown.winfo_exists():
+        return
+    if missions:
+        app.mission_dropdown.configure(
+            values=missions,
+            state="normal",
+            command=lambda mission: on_mission_select(app, mission)
+        )
+    else:
+        app.mission_dropdown.configure(values=["Please create a mission first"], state="disabled")
+
+    if missions and hasattr(app, 'selected_mission') and app.selected_mission in missions:
+        app.mission_var.set(app.selected_mission)
+    else:
+        app.mission_var.set("" if missions else "Please create a mission first")
 
 def on_mission_select(app, mission):
     """Handle mission selection."""
@@ -218,6 +223,8 @@ def update_selected_images_display(app):
     app.check_all_button.pack(anchor="w", pady=5, padx=10)
 
     app.check_vars = []
+    app.upload_status_labels = {}
+    upload_progress = getattr(app, 'upload_progress', {})
     for idx, image in enumerate(app.selected_images, start=1):
         imagename = os.path.basename(image)
 
@@ -254,6 +261,16 @@ def update_selected_images_display(app):
             )
             checkbox.pack(side="left", padx=5)
 
+            if image in upload_progress:
+                status_label = ctk.CTkLabel(
+                    image_frame,
+                    text=upload_progress[image],
+                    font=("Helvetica", 12),
+                    text_color="white"
+                )
+                status_label.pack(side="right", padx=10)
+                app.upload_status_labels[image] = status_label
+
 def toggle_check_all(app):
     """Toggle the state of all checkboxes."""
     new_state = not app.check_all_var.get()
@@ -346,56 +363,89 @@ def process_upload(app):
         show_upload_error_message(app, "Please select a valid mission before uploading.")
         return
 
-    headers = {'x-access-token': app.token}
-    images_to_upload = []
-    images_uploaded = []
-
-    for image_path, check_var in app.check_vars:
-        if check_var.get():
-            try:
-                image_obj = open(image_path, 'rb')
-                images_to_upload.append(('images', (os.path.basename(image_path), image_obj)))
-                images_uploaded.append(image_path)
-            except FileNotFoundError:
-                logging.error(f"Images not found: {image_path}")
-                show_upload_error_message(app, f"Images not found: {image_path}")
-                continue
+    if getattr(app, 'upload_engine', None) is not None:
+        show_upload_error_message(app, "An upload is already in progress.")
+        return
 
+    images_to_upload = [image_path for image_path, check_var in app.check_vars if check_var.get()]
     if not images_to_upload:
         show_upload_error_message(app, "No images selected for upload.")
         return
 
-    # Updated URL to include the mission_name
-    url = f'{app.SERVER_URL}/missions/{selected_mission}/upload_images'
-    data = {'mission_name': selected_mission}  
-
-    try:
-        response = requests.post(
-            url,
-            headers=headers,
-            files=images_to_upload,
-            data=data,
-            # verify=app.CERT_PATH
-            verify=False
-        )
+    # Files are sent by a background worker pool; results come back through root.after
+    app.upload_progress = {image_path: "Queued" for image_path in images_to_upload}
+    app.upload_engine = UploadEngine(
+        app.SERVER_URL,
+        app.token,
+        selected_mission,
+        dispatch=lambda fn, *args: app.root.after(0, fn, *args),
+        state_file=os.path.join(app.CLIENT_PATH, 'conf', 'upload_state.json'),
+        # verify=app.CERT_PATH
+        verify=False,
+        hash_index=get_hash_index(app),
+        session=app.api.session
+    )
+    update_selected_images_display(app)
+    show_upload_info_message(app, f"Uploading {len(images_to_upload)} images...")
+    app.upload_engine.start(
+        images_to_upload,
+        on_progress=lambda image_path, done, total, stats: on_upload_progress(app, image_path, done, total, stats),
+        on_file_done=lambda image_path, ok, error: on_upload_file_done(app, image_path, ok, error),
+        on_finished=lambda stats: on_upload_finished(app, stats)
+    )
 
-        for _, (_, image_obj) in images_to_upload:
-            image_obj.close()
+def get_hash_index(app):
+    """Persistent index of local file hashes, so re-selected folders are not hashed again."""
+    if getattr(app, 'hash_index', None) is None:
+        app.hash_index = HashIndex(os.path.join(app.CLIENT_PATH, 'conf', 'hash_index.json'))
+    return app.hash_index
+
+def format_throughput(stats):
+    """Human readable overall upload progress."""
+    return (
+        f"{stats['files_done']}/{stats['files_total']} files, "
+        f"{stats['throughput'] / (1024 * 1024):.1f} MB/s"
+    )
 
-        if response.status_code == 200:
-            show_upload_info_message(app, "Images uploaded successfully.")
-            for image_path in images_uploaded:
-                app.uploaded_images[image_path] = True
-            update_selected_images_display(app)
-        else:
-            show_upload_error_message(app, f"Failed to upload images: {response.text}")
-
-    except requests.exceptions.SSLError as ssl_error:
-        logging.error(f"SSL Error: {ssl_error}")
-        show_upload_error_message(app, "SSL Error: Please check the server certificate.")
-    except requests.exceptions.RequestException as req_error:
-        logging.error(f"Request Error: {req_error}")
-        show_upload_error_message(app, "Request Error: Unable to connect to the server.")
+def on_upload_progress(app, image_path, done, total, stats):
+    """Update one file's status label and the overall throughput (runs on the Tk thread)."""
+    percent = int(done * 100 / total) if total else 100
+    set_upload_status(app, image_path, f"{percent}%")
+    if hasattr(app, 'message_label') and app.message_label.winfo_exists():
+        app.message_label.configure(text=f"Uploading: {format_throughput(stats)}", text_color="green")
+
+def on_upload_file_done(app, image_path, ok, error):
+    """Record a finished file (runs on the Tk thread)."""
+    if ok:
+        app.uploaded_images[image_path] = True
+        set_upload_status(app, image_path, "Uploaded", "green")
+    else:
+        logging.error(f"Failed to upload {image_path}: {error}")
+        set_upload_status(app, image_path, "Failed", "red")
+
+def on_upload_finished(app, stats):
+    """Refresh the list once the whole upload has finished (runs on the Tk thread)."""
+    app.upload_engine = None
+    app.upload_progress = {}
+    if hasattr(app, 'checkboxes_frame') and app.checkboxes_frame.winfo_exists():
+        update_selected_images_display(app)
+    if stats['files_failed']:
+        show_upload_error_message(app, f"{stats['files_failed']} of {stats['files_total']} images failed to upload.")
+    elif stats['files_skipped']:
+        show_upload_info_message(
+            app,
+            f"Images uploaded successfully ({format_throughput(stats)}); "
+            f"{stats['files_skipped']} already on the server were skipped."
+        )
+    else:
+        show_upload_info_message(app, f"Images uploaded successfully ({format_throughput(stats)}).")
+
+def set_upload_status(app, image_path, text, color="white"):
+    """Update the status label shown next to an image, if it is on screen."""
+    app.upload_progress[image_path] = text
+    label = getattr(app, 'upload_status_labels', {}).get(image_path)
+    if label is not None and label.winfo_exists():
+        label.configure(text=text, text_color=color)
 
 def show_upload_info_message(app, message):
     """Displays an info message in the upload page and clears it after a delay."""
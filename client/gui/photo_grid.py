@@ -0,0 +1,194 @@
+import os
+import logging
+import tkinter as tk
+from tkinter import ttk
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageTk
+
+def default_decode_workers():
+    """Number of thumbnail decode threads, overridable with THUMBNAIL_DECODE_WORKERS."""
+    return max(1, int(os.getenv('THUMBNAIL_DECODE_WORKERS', '4')))
+
+def decode_thumbnail(path, size):
+    """Decode an image and shrink it to fit size x size. Safe to call off the Tk thread."""
+    with Image.open(path) as image:
+        image.draft("RGB", (size, size))
+        image.thumbnail((size, size))
+        return image.copy()
+
+class PhotoCell:
+    """One reusable grid slot: an image label and a caption, placed on the canvas."""
+
+    def __init__(self, grid):
+        self.frame = tk.Frame(grid.canvas, bg=grid.bg_color)
+        self.image_label = tk.Label(self.frame, cursor="hand2", bg=grid.bg_color)
+        self.image_label.pack()
+        self.caption = tk.Label(self.frame, font=("Helvetica", 10), fg="blue", bg=grid.bg_color)
+        self.caption.pack(pady=2)
+        self.window = grid.canvas.create_window(0, 0, window=self.frame, anchor="nw", state="hidden")
+        for widget in (self.frame, self.image_label, self.caption):
+            widget.bind("<MouseWheel>", grid._on_mousewheel)
+        self.index = None
+        self.photo_image = None
+
+class VirtualPhotoGrid:
+    """
+    Scrollable photo grid that only builds widgets for the rows in (or just around) the
+    viewport and recycles them as the user scrolls. Thumbnails are decoded on a worker pool
+    and attached on the Tk thread as they finish, so memory and render time depend on the
+    window size rather than on the number of photos in the mission.
+    """
+
+    def __init__(self, parent, photos, resolve_path, dispatch, on_click=None, columns=5, cell_size=200,
+                 caption_height=30, padding=10, overscan_rows=2, max_workers=None, bg_color=None,
+                 thumbnail_cache=None):
+        self.photos = photos
+        self.thumbnail_cache = thumbnail_cache
+        self.resolve_path = resolve_path
+        self.dispatch = dispatch
+        self.on_click = on_click
+        self.columns = columns
+        self.cell_size = cell_size
+        self.padding = padding
+        self.row_height = cell_size + caption_height + padding
+        self.col_width = cell_size + padding
+        self.overscan_rows = overscan_rows
+        self.bg_color = bg_color
+
+        self.canvas = tk.Canvas(parent, highlightthickness=0, bd=0, bg=bg_color)
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_scroll)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        rows = (len(photos) + columns - 1) // columns
+        self.canvas.configure(scrollregion=(0, 0, columns * self.col_width, rows * self.row_height))
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or default_decode_workers(),
+                                            thread_name_prefix="thumbnail")
+        self._cells = {}  # photo index -> PhotoCell currently showing it
+        self._free = []  # hidden cells ready for reuse
+        self._pending = {}  # photo index -> decode future
+        self._closed = False
+        self._refresh_scheduled = False
+
+        self.canvas.bind("<Configure>", lambda e: self._schedule_refresh())
+        self.canvas.bind("<Destroy>", lambda e: self.close())
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self._schedule_refresh()
+
+    def close(self):
+        """Stop decoding; widgets are destroyed with the parent frame."""
+        if self._closed:
+            return
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._pending.clear()
+        self._cells.clear()
+        self._free.clear()
+
+    def live_cells(self):
+        """Number of widget cells currently built (visible or recycled)."""
+        return len(self._cells) + len(self._free)
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self._schedule_refresh()
+
+    def _on_mousewheel(self, event):
+        self.canvas.yview_scroll(int(-event.delta / 120) or (-1 if event.delta > 0 else 1), "units")
+
+    def _schedule_refresh(self):
+        # Coalesce bursts of scroll events into one layout pass
+        if not self._closed and not self._refresh_scheduled:
+            self._refresh_scheduled = True
+            self.canvas.after_idle(self._refresh)
+
+    def _visible_range(self):
+        """Photo indices that should have a cell: the viewport plus overscan_rows above and below."""
+        top = self.canvas.canvasy(0)
+        height = max(self.canvas.winfo_height(), 1)
+        first_row = max(int(top // self.row_height) - self.overscan_rows, 0)
+        last_row = int((top + height) // self.row_height) + self.overscan_rows
+        return range(first_row * self.columns, min((last_row + 1) * self.columns, len(self.photos)))
+
+    def _refresh(self):
+        self._refresh_scheduled = False
+        if self._closed or not self.canvas.winfo_exists():
+            return
+        wanted = self._visible_range()
+
+        # Recycle cells that scrolled out of range and drop their pending decodes
+        for index in [i for i in self._cells if i not in wanted]:
+            cell = self._cells.pop(index)
+            self._release(cell)
+        for index in [i for i in self._pending if i not in wanted]:
+            self._pending.pop(index).cancel()
+
+        for index in wanted:
+            if index not in self._cells:
+                self._bind(self._free.pop() if self._free else PhotoCell(self), index)
+
+    def _release(self, cell):
+        cell.index = None
+        cell.photo_image = None
+        cell.image_label.configure(image="", text="")
+        self.canvas.itemconfigure(cell.window, state="hidden")
+        self._free.append(cell)
+
+    def _bind(self, cell, index):
+        """Show photo `index` in `cell` and start decoding its thumbnail."""
+        photo = self.photos[index]
+        row, col = divmod(index, self.columns)
+        cell.index = index
+        cell.photo_image = None
+        cell.image_label.configure(image="", text="Loading...")
+        photo_type = photo.get("photo_type")
+        cell.caption.configure(text=f"Type: {photo_type}" if photo_type in ["Crack", "Spall", "Corrosion"] else "")
+        cell.image_label.bind("<Button-1>", lambda e, p=photo: self.on_click(p) if self.on_click else None)
+        self.canvas.coords(cell.window, col * self.col_width, row * self.row_height)
+        self.canvas.itemconfigure(cell.window, state="normal")
+        self._cells[index] = cell
+
+        path = self.resolve_path(photo)
+        if not path:
+            cell.image_label.configure(text="Missing")
+            return
+        if self.thumbnail_cache is not None:
+            # Thumbnails already decoded in memory are shown without a round trip through the pool
+            image = self.thumbnail_cache.peek(path)
+            if image is not None:
+                cell.photo_image = ImageTk.PhotoImage(image)
+                cell.image_label.configure(image=cell.photo_image, text="")
+                return
+            future = self._executor.submit(self.thumbnail_cache.get, path)
+        else:
+            future = self._executor.submit(decode_thumbnail, path, self.cell_size)
+        self._pending[index] = future
+        future.add_done_callback(lambda f, i=index: self._decoded(i, f))
+
+    def _decoded(self, index, future):
+        """Worker-side: hand the decoded image to the Tk thread."""
+        if self._closed or future.cancelled():
+            return
+        try:
+            image = future.result()
+        except Exception as e:
+            logging.error(f"Error decoding thumbnail for {self.photos[index].get('filename')}: {e}")
+            image = None
+        self.dispatch(self._attach, index, future, image)
+
+    def _attach(self, index, future, image):
+        """Tk-side: show the thumbnail if its cell still displays the same photo."""
+        if self._closed or self._pending.get(index) is not future:
+            return
+        del self._pending[index]
+        cell = self._cells.get(index)
+        if cell is None:
+            return
+        if image is None:
+            cell.image_label.configure(text="Unreadable")
+            return
+        # PhotoImage must be created on the Tk thread; the cell owns the only reference
+        cell.photo_image = ImageTk.PhotoImage(image)
+        cell.image_label.configure(image=cell.photo_image, text="")
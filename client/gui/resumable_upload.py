@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+import requests
+
+# Files at or above this size go through the resumable chunked protocol
+RESUMABLE_THRESHOLD = 8 * 1024 * 1024
+CHUNK_SIZE = 4 * 1024 * 1024
+# How often, and for how long, to poll the server while it stores a completed upload
+COMPLETION_POLL_INTERVAL = 1.0
+COMPLETION_TIMEOUT = 600
+
+_state_lock = threading.Lock()
+
+class ResumableUploadError(Exception):
+    """Raised when a resumable upload cannot be completed."""
+
+def load_upload_state(state_file):
+    """Load the map of local file keys to in-progress upload ids."""
+    if not state_file or not os.path.exists(state_file):
+        return {}
+    try:
+        with open(state_file, 'r') as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except (json.JSONDecodeError, IOError) as e:
+        logging.error(f"Error reading upload state {state_file}: {e}")
+        return {}
+
+def update_upload_state(state_file, key, upload_id):
+    """Record (or clear, when upload_id is None) the upload session for a local file."""
+    if not state_file:
+        return
+    with _state_lock:
+        state = load_upload_state(state_file)
+        if upload_id is None:
+            state.pop(key, None)
+        else:
+            state[key] = upload_id
+        tmp_path = f"{state_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_file)
+
+def upload_file_resumable(session, server_url, token, mission_name, file_path,
+                          chunk_size=CHUNK_SIZE, state_file=None, max_retries=5,
+                          backoff=1.0, timeout=30, verify=False, progress_callback=None,
+                          poll_interval=COMPLETION_POLL_INTERVAL, completion_timeout=COMPLETION_TIMEOUT):
+    """
+    Upload one file in fixed-size chunks, resuming from the server's recorded offset
+    after connection drops. If state_file is given the upload id is persisted so an
+    interrupted upload can also be resumed after the client restarts. Once every chunk
+    is in, waits while the server stores the file, then discards the finished session.
+    Returns the server-side filename.
+    """
+    stat = os.stat(file_path)
+    size = stat.st_size
+    key = f"{os.path.abspath(file_path)}|{size}|{int(stat.st_mtime)}"
+    base_url = f"{server_url}/missions/{mission_name}/uploads"
+    headers = {'x-access-token': token}
+
+    def call(method, url, **kwargs):
+        """Issue a request, retrying connection errors and server errors with backoff."""
+        request_headers = {**headers, **kwargs.pop('headers', {})}
+        for attempt in range(max_retries + 1):
+            try:
+                response = session.request(method, url, headers=request_headers,
+                                           timeout=timeout, verify=verify, **kwargs)
+                if response.status_code < 500:
+                    return response
+                logging.warning(f"{method} {url} returned {response.status_code}, retrying")
+            except requests.RequestException as e:
+                logging.warning(f"{method} {url} failed ({e}), retrying")
+            if attempt < max_retries:
+                time.sleep(backoff * (2 ** attempt))
+        raise ResumableUploadError(f"Giving up on {method} {url} after {max_retries} retries")
+
+    # Resume an existing session if one was recorded for this exact file version
+    status = None
+    upload_id = load_upload_state(state_file).get(key)
+    if upload_id:
+        response = call('GET', f"{base_url}/{upload_id}")
+        if response.status_code == 200 and response.json().get('state') != 'failed':
+            status = response.json()
+        else:
+            update_upload_state(state_file, key, None)
+
+    if status is None:
+        response = call('POST', base_url, json={
+            'filename': os.path.basename(file_path),
+            'size': size,
+            'chunk_size': chunk_size
+        })
+        if response.status_code != 201:
+            raise ResumableUploadError(f"Failed to create upload session: {response.text}")
+        status = response.json()
+        upload_id = status['upload_id']
+        update_upload_state(state_file, key, upload_id)
+
+    chunk_size = status['chunk_size']
+    with open(file_path, 'rb') as f:
+        for _ in range(max_retries + 1):
+            missing = status['missing_chunks']
+            done = size - sum(min(chunk_size, size - i * chunk_size) for i in missing)
+            if progress_callback:
+                progress_callback(done, size)
+
+            for index in missing:
+                f.seek(index * chunk_size)
+                chunk = f.read(chunk_size)
+                response = call('PUT', f"{base_url}/{upload_id}/chunks/{index}", data=chunk,
+                                headers={'X-Chunk-SHA256': hashlib.sha256(chunk).hexdigest(),
+                                         'Content-Type': 'application/octet-stream'})
+                if response.status_code != 200:
+                    # Checksum or length rejected; the refreshed status will list it as missing again
+                    logging.warning(f"Chunk {index} of {file_path} rejected: {response.text}")
+                    continue
+                done += len(chunk)
+                if progress_callback:
+                    progress_callback(done, size)
+
+            if status.get('state', 'receiving') == 'receiving':
+                response = call('POST', f"{base_url}/{upload_id}/complete")
+                if response.status_code == 409:
+                    status = response.json()
+                    continue
+                if response.status_code not in (200, 202):
+                    raise ResumableUploadError(f"Failed to complete upload: {response.text}")
+                status = response.json()
+
+            # The server hashes and stores the assembled file in the background
+            deadline = time.monotonic() + completion_timeout
+            while status.get('state') == 'completing' and time.monotonic() < deadline:
+                time.sleep(poll_interval)
+                response = call('GET', f"{base_url}/{upload_id}")
+                if response.status_code != 200:
+                    raise ResumableUploadError(f"Lost track of upload {upload_id}: {response.text}")
+                status = response.json()
+
+            if status.get('state') == 'completing':
+                # Kept in the upload state, so the next attempt picks up waiting where this one stopped
+                raise ResumableUploadError(f"Server still storing {file_path} after {completion_timeout}s")
+            update_upload_state(state_file, key, None)
+            # Only the session's status is left on the server; discarding it is best effort
+            call('DELETE', f"{base_url}/{upload_id}")
+            if status.get('state') != 'complete':
+                raise ResumableUploadError(f"Failed to complete upload: {status.get('error', response.text)}")
+            return status.get('filename')
+
+    raise ResumableUploadError(f"Upload of {file_path} did not complete after {max_retries} passes")
@@ -0,0 +1,165 @@
+import os
+import logging
+import hashlib
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+from .photo_grid import decode_thumbnail
+
+def default_memory_bytes():
+    """In-memory thumbnail budget, overridable with THUMBNAIL_MEMORY_MB."""
+    return int(float(os.getenv('THUMBNAIL_MEMORY_MB', '64')) * 1024 * 1024)
+
+def default_disk_bytes():
+    """On-disk thumbnail budget, overridable with THUMBNAIL_DISK_MB."""
+    return int(float(os.getenv('THUMBNAIL_DISK_MB', '256')) * 1024 * 1024)
+
+def image_nbytes(image):
+    return image.width * image.height * len(image.getbands())
+
+class ThumbnailCache:
+    """
+    Two-tier thumbnail cache: an LRU of decoded PIL images capped by bytes, backed by
+    pre-shrunk JPEGs on disk keyed by source path, size and mtime. Safe to use from
+    worker threads; PhotoImages are still created by the caller on the Tk thread.
+    """
+
+    def __init__(self, cache_dir, size, memory_bytes=None, disk_bytes=None):
+        self.size = size
+        self.directory = os.path.join(cache_dir, ".thumbnails", str(size))
+        self.memory_bytes = default_memory_bytes() if memory_bytes is None else memory_bytes
+        self.disk_bytes = default_disk_bytes() if disk_bytes is None else disk_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> PIL image, least recently used first
+        self._memory_used = 0
+        self._disk_used = sum(entry.stat().st_size for entry in os.scandir(self.directory) if entry.name.endswith(".jpg"))
+        self.hits = {"memory": 0, "disk": 0, "miss": 0}
+
+    def key(self, path):
+        """Cache key for the current version of path, or None if it does not exist."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return hashlib.sha1(f"{os.path.abspath(path)}|{self.size}|{stat.st_mtime_ns}".encode()).hexdigest()
+
+    def peek(self, path):
+        """Return the thumbnail only if it is already decoded in memory (cheap, Tk-thread safe)."""
+        key = self.key(path)
+        with self._lock:
+            image = self._memory.get(key)
+            if image is not None:
+                self._memory.move_to_end(key)
+                self.hits["memory"] += 1
+            return image
+
+    def get(self, path):
+        """Return the thumbnail for path, decoding and caching it as needed."""
+        key = self.key(path)
+        if key is None:
+            raise FileNotFoundError(path)
+        with self._lock:
+            image = self._memory.get(key)
+            if image is not None:
+                self._memory.move_to_end(key)
+                self.hits["memory"] += 1
+                return image
+
+        disk_path = os.path.join(self.directory, f"{key}.jpg")
+        image = self._read_disk(disk_path)
+        if image is not None:
+            self.hits["disk"] += 1
+        else:
+            self.hits["miss"] += 1
+            with Image.open(path) as source:
+                already_small = max(source.size) <= self.size
+            image = decode_thumbnail(path, self.size)
+            # Files that are already thumbnail-sized decode as fast as a cached copy would
+            if not already_small:
+                self._write_disk(disk_path, image)
+        self._remember(key, image)
+        return image
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+
+    def _remember(self, key, image):
+        with self._lock:
+            if key in self._memory:
+                return
+            self._memory[key] = image
+            self._memory_used += image_nbytes(image)
+            while self._memory_used > self.memory_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_used -= image_nbytes(evicted)
+
+    def _read_disk(self, disk_path):
+        try:
+            with Image.open(disk_path) as cached:
+                cached.load()
+                image = cached.copy()
+            # Touch the file so eviction treats it as recently used
+            os.utime(disk_path)
+            return image
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logging.warning(f"Discarding unreadable cached thumbnail {disk_path}: {e}")
+            self._remove_disk(disk_path)
+            return None
+
+    def _write_disk(self, disk_path, image):
+        tmp_path = f"{disk_path}.{threading.get_ident()}.tmp"
+        try:
+            out = image if image.mode in ("RGB", "L") else image.convert("RGB")
+            out.save(tmp_path, format="JPEG", quality=85)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, disk_path)
+        except OSError as e:
+            logging.warning(f"Failed to cache thumbnail {disk_path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        with self._lock:
+            self._disk_used += size
+            over = self._disk_used > self.disk_bytes
+        if over:
+            self._evict_disk()
+
+    def _remove_disk(self, disk_path):
+        try:
+            size = os.path.getsize(disk_path)
+            os.remove(disk_path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_used -= size
+
+    def _evict_disk(self):
+        """Delete least recently used files until the disk tier is back under 90% of its budget."""
+        try:
+            entries = sorted(
+                (entry for entry in os.scandir(self.directory) if entry.name.endswith(".jpg")),
+                key=lambda entry: entry.stat().st_mtime
+            )
+        except OSError as e:
+            logging.warning(f"Failed to scan thumbnail cache {self.directory}: {e}")
+            return
+        target = int(self.disk_bytes * 0.9)
+        used = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if used <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                used -= size
+            except OSError:
+                continue
+        with self._lock:
+            self._disk_used = used
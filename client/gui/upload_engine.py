@@ -0,0 +1,267 @@
+import os
+import time
+import logging
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor, wait
+import requests
+from requests.adapters import HTTPAdapter
+from werkzeug.utils import secure_filename
+
+from .resumable_upload import RESUMABLE_THRESHOLD, ResumableUploadError, upload_file_resumable
+from .hash_index import fetch_present_hashes
+
+# Small files are grouped into multipart requests up to these limits
+BATCH_MAX_BYTES = 8 * 1024 * 1024
+BATCH_MAX_FILES = 25
+
+def default_concurrency():
+    """Number of parallel upload requests, overridable with UPLOAD_CONCURRENCY."""
+    return max(1, int(os.getenv('UPLOAD_CONCURRENCY', '4')))
+
+def create_pooled_session(pool_size):
+    """requests.Session whose keep-alive pool can hold one connection per worker."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def plan_upload_jobs(image_paths, batch_max_bytes=BATCH_MAX_BYTES, batch_max_files=BATCH_MAX_FILES,
+                     large_threshold=RESUMABLE_THRESHOLD):
+    """
+    Split files into jobs: large files are uploaded alone, small ones are batched.
+    Returns a list of ("single", [path], size) and ("batch", [paths], size) tuples.
+    """
+    jobs = []
+    batch, batch_size = [], 0
+    for path in image_paths:
+        size = os.path.getsize(path)
+        if size >= large_threshold:
+            jobs.append(("single", [path], size))
+            continue
+        if batch and (batch_size + size > batch_max_bytes or len(batch) >= batch_max_files):
+            jobs.append(("batch", batch, batch_size))
+            batch, batch_size = [], 0
+        batch.append(path)
+        batch_size += size
+    if batch:
+        jobs.append(("batch", batch, batch_size))
+    return jobs
+
+class UploadEngine:
+    """
+    Uploads images on a bounded worker pool over one keep-alive session.
+    Callbacks are never invoked directly from worker threads; they are handed to
+    `dispatch` (typically `lambda fn, *args: root.after(0, fn, *args)`) so the Tk
+    event loop stays responsive and only the main thread touches widgets.
+    """
+
+    def __init__(self, server_url, token, mission_name, dispatch, max_workers=None,
+                 state_file=None, verify=False, timeout=120, hash_index=None, session=None):
+        self.server_url = server_url
+        self.token = token
+        self.mission_name = mission_name
+        self.dispatch = dispatch
+        self.max_workers = max_workers or default_concurrency()
+        self.state_file = state_file
+        self.verify = verify
+        self.timeout = timeout
+        # With a HashIndex, files whose content the mission already has are skipped
+        self.hash_index = hash_index
+        # A caller-provided session (e.g. the app's shared pinned session) is not closed here
+        self._own_session = session is None
+
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._session = session
+        self._started_at = None
+        self._bytes_total = 0
+        self._bytes_done = 0
+        self._files_total = 0
+        self._files_done = 0
+        self._files_failed = 0
+        self._files_skipped = 0
+
+    def start(self, image_paths, on_progress=None, on_file_done=None, on_finished=None):
+        """Plan and start the upload in the background; returns immediately."""
+        self._on_progress = on_progress
+        self._on_file_done = on_file_done
+        self._on_finished = on_finished
+        threading.Thread(target=self._run, args=(list(image_paths),), daemon=True).start()
+
+    def cancel(self):
+        """Stop scheduling new jobs; requests already in flight are allowed to finish."""
+        self._cancelled.set()
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        """Snapshot of overall progress and throughput (bytes/s)."""
+        with self._lock:
+            elapsed = max(time.monotonic() - (self._started_at or time.monotonic()), 1e-6)
+            return {
+                "files_total": self._files_total,
+                "files_done": self._files_done,
+                "files_failed": self._files_failed,
+                "files_skipped": self._files_skipped,
+                "bytes_total": self._bytes_total,
+                "bytes_done": self._bytes_done,
+                "elapsed": elapsed,
+                "throughput": self._bytes_done / elapsed
+            }
+
+    def _run(self, image_paths):
+        """Worker-side driver: build jobs, fan them out, report completion."""
+        with self._lock:
+            self._files_total = len(image_paths)
+        if self._own_session:
+            self._session = create_pooled_session(self.max_workers)
+        try:
+            existing = []
+            for path in image_paths:
+                if os.path.isfile(path):
+                    existing.append(path)
+                else:
+                    logging.error(f"Image not found: {path}")
+                    self._file_done(path, False, "File not found")
+            if self.hash_index is not None:
+                existing = self._skip_present(existing)
+            jobs = plan_upload_jobs(existing)
+        except OSError as e:
+            logging.error(f"Error planning upload: {e}")
+            jobs = []
+
+        with self._lock:
+            self._started_at = time.monotonic()
+            self._bytes_total = sum(size for _, _, size in jobs)
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="upload")
+        try:
+            futures = [
+                self._executor.submit(self._upload_single if kind == "single" else self._upload_batch, paths)
+                for kind, paths, _ in jobs
+            ]
+            wait(futures)
+        except RuntimeError:
+            # Executor was shut down by cancel() while jobs were being submitted
+            pass
+        finally:
+            self._executor.shutdown(wait=True)
+            if self._own_session:
+                self._session.close()
+
+        if self._on_finished:
+            self.dispatch(self._on_finished, self.stats())
+
+    def _skip_present(self, paths):
+        """
+        Hash the files (cached in the index) and ask the server which contents the mission
+        already has. Returns the paths still to upload: one per content the server lacks.
+        If the lookup fails everything is uploaded, as without an index.
+        """
+        digests = self.hash_index.hash_many(paths, self.max_workers)
+        self.hash_index.save()
+        try:
+            present = fetch_present_hashes(
+                self._session, self.server_url, self.token, self.mission_name,
+                digests.values(), verify=self.verify, timeout=self.timeout
+            )
+        except (requests.RequestException, ValueError) as e:
+            logging.error(f"Could not check which images the server already has: {e}")
+            return paths
+
+        to_upload, queued = [], set()
+        for path in paths:
+            digest = digests.get(path)
+            if digest is None:
+                to_upload.append(path)
+            elif digest in present or digest in queued:
+                with self._lock:
+                    self._files_skipped += 1
+                self._file_done(path, True)
+            else:
+                queued.add(digest)
+                to_upload.append(path)
+        return to_upload
+
+    def _add_bytes(self, count):
+        with self._lock:
+            self._bytes_done += count
+
+    def _progress(self, path, done, total):
+        if self._on_progress:
+            self.dispatch(self._on_progress, path, done, total, self.stats())
+
+    def _file_done(self, path, ok, error=None):
+        with self._lock:
+            self._files_done += 1
+            if not ok:
+                self._files_failed += 1
+        if self._on_file_done:
+            self.dispatch(self._on_file_done, path, ok, error)
+
+    def _upload_single(self, paths):
+        """Send one large file through the resumable chunked protocol."""
+        path = paths[0]
+        if self._cancelled.is_set():
+            return
+        last = [0]
+
+        def progress(done, total):
+            self._add_bytes(done - last[0])
+            last[0] = done
+            self._progress(path, done, total)
+
+        try:
+            upload_file_resumable(
+                self._session, self.server_url, self.token, self.mission_name, path,
+                state_file=self.state_file, timeout=self.timeout, verify=self.verify,
+                progress_callback=progress
+            )
+            self._file_done(path, True)
+        except (ResumableUploadError, OSError) as e:
+            logging.error(f"Resumable upload failed for {path}: {e}")
+            self._file_done(path, False, str(e))
+
+    def _upload_batch(self, paths):
+        """Send a group of small files in one multipart request to the streaming endpoint."""
+        if self._cancelled.is_set():
+            return
+        url = f"{self.server_url}/missions/{self.mission_name}/upload_images/stream"
+        sizes = {path: os.path.getsize(path) for path in paths}
+        try:
+            with contextlib.ExitStack() as stack:
+                files = [
+                    ('images', (os.path.basename(path), stack.enter_context(open(path, 'rb'))))
+                    for path in paths
+                ]
+                response = self._session.post(
+                    url,
+                    headers={'x-access-token': self.token},
+                    files=files,
+                    data={'mission_name': self.mission_name},
+                    verify=self.verify,
+                    timeout=self.timeout
+                )
+        except (requests.RequestException, OSError) as e:
+            logging.error(f"Batch upload failed: {e}")
+            for path in paths:
+                self._file_done(path, False, str(e))
+            return
+
+        if response.status_code in (200, 207):
+            results = {r['filename']: r for r in response.json().get('results', [])}
+        else:
+            logging.error(f"Batch upload rejected: {response.status_code} {response.text}")
+            results = {}
+
+        for path in paths:
+            result = results.get(secure_filename(os.path.basename(path)), {})
+            if result.get('status') == 'uploaded':
+                self._add_bytes(sizes[path])
+                self._progress(path, sizes[path], sizes[path])
+                self._file_done(path, True)
+            else:
+                self._file_done(path, False, result.get('error', f"HTTP {response.status_code}"))
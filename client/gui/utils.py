@@ -1,27 +1,30 @@
 import customtkinter as ctk
 import logging
-import requests
 from tkinter import messagebox
 
-def fetch_missions(app):
-    """Fetch missions for the current user."""
-    try:
-        headers = {'x-access-token': app.token}
-        response = requests.get(
-            f"{app.SERVER_URL}/missions/get_missions",
-            headers=headers,
-            # verify=app.CERT_PATH
-            verify=False
-        )
-        if response.status_code == 200:
-            missions = response.json()
-            return missions if missions else []
-        else:
+def fetch_missions(app, callback):
+    """
+    Fetch missions for the current user in the background and pass the list (empty on
+    failure) to callback on the Tk thread. Returns the ApiCall so it can be cancelled.
+    """
+    def on_success(response):
+        if response.status_code != 200:
             logging.error(f"Failed to fetch missions: {response.text}")
-            return []
-    except Exception as e:
-        logging.error(f"Error fetching missions: {e}")
-        return []
+            callback([])
+            return
+        try:
+            missions = response.json()
+        except ValueError as e:
+            logging.error(f"Error fetching missions: {e}")
+            missions = []
+        callback(missions if missions else [])
+
+    return app.api.get(
+        "/missions/get_missions",
+        token=app.token,
+        on_success=on_success,
+        on_error=lambda e: callback([])
+    )
 
 def show_error_message(app, message):
     """Displays an error message and clears it after a delay."""
@@ -141,7 +144,9 @@ def clear_frame(app, frame=None):
         logging.warning(f"Attempted to clear a frame that does not exist or is invalid: {frame}")
 
 def clear_display_frame(app):
-    """Clears all widgets from the display frame."""
+    """Clears all widgets from the display frame and cancels requests made for the previous page."""
+    if getattr(app, 'api', None) is not None:
+        app.api.cancel_scope("page")
     if hasattr(app, 'display_frame') and app.display_frame.winfo_exists():
         for widget in app.display_frame.winfo_children():
             widget.destroy()
@@ -1,26 +1,51 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from auth import token_required
-from celery import Celery
+from celery import Celery, chord
+from celery.signals import worker_process_init, task_postrun
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine
 import os
-import shutil
-import random
+import io
+import json
+import time
+import uuid
 import logging
 from models import Photo, Mission
+import jobs
+from inference import annotate_image, save_detections
+from thumbnails import generate_thumbnails, save_thumbnails, thumbnail_path, is_stale
+from pipeline import AnalysisPipeline
+from changefeed import next_revision
+from storage import storage_key
+from blobstore import add_references, release_references
+from PIL import Image
 
 analysis_blueprint = Blueprint('analysis', __name__)
 
-# Configure Celery with result backend
+# Job status polling: store poll interval and the longest a long-poll request may block
+JOB_POLL_INTERVAL = 1.0
+MAX_LONG_POLL_SECONDS = 30
+# An event stream is closed after this long and the client reconnects; kept below the
+# gunicorn worker timeout (WEB_TIMEOUT, 60 s by default) so a stream is never killed mid-write
+MAX_EVENT_STREAM_SECONDS = 45
+# Reconnection delay sent to EventSource clients, in milliseconds
+EVENT_STREAM_RETRY_MS = 1000
+TERMINAL_STATES = ("SUCCESS", "FAILURE")
+
+# Configure Celery with result backend; ServerManager points both at its REDIS_URL
 celery = Celery(
     __name__,
-    broker="redis://localhost:6379/0",
-    backend="redis://localhost:6379/0"
+    broker=jobs.DEFAULT_REDIS_URL,
+    backend=jobs.DEFAULT_REDIS_URL
 )
 celery.conf.update(
     broker_connection_retry_on_startup=True
 )
 
+def configure_celery(redis_url):
+    """Use redis_url as broker and result backend; must run before the first task is sent."""
+    celery.conf.update(broker_url=redis_url, result_backend=redis_url)
+
 def get_server_manager():
     """Retrieve the server manager instance attached to the blueprint."""
     server_manager = getattr(analysis_blueprint, 'server_manager', None)
@@ -34,6 +59,22 @@ def get_database_session():
     Session = server_manager.get_database_session()
     return Session()
 
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """Attach a ServerManager to each Celery worker process so tasks share one engine."""
+    if getattr(analysis_blueprint, 'server_manager', None) is None:
+        from server_manager import ServerManager
+        analysis_blueprint.server_manager = ServerManager()
+    # Engine is created lazily on first use in this (forked) process
+    analysis_blueprint.server_manager.get_engine()
+
+@task_postrun.connect
+def release_task_session(**kwargs):
+    """Return the task's session to the pool once it finishes."""
+    server_manager = getattr(analysis_blueprint, 'server_manager', None)
+    if server_manager:
+        server_manager.remove_database_session()
+
 @analysis_blueprint.route('/analyze', methods=['POST'])
 @token_required
 def analyze_photos(current_user):
@@ -44,59 +85,278 @@ def analyze_photos(current_user):
     if not mission_name:
         return jsonify({"error": "Mission name is required"}), 400
 
-    run_analysis.delay(current_user.username, mission_name)
-    return jsonify({"message": "Analysis started"}), 200
+    session = get_database_session()
+    try:
+        mission = session.query(Mission).filter_by(username=current_user, mission_name=mission_name).first()
+        if not mission:
+            return jsonify({"error": "Mission not found"}), 404
+        job_id, shards = start_analysis(session, current_user, mission)
+    except Exception as e:
+        logging.error(f"Error starting analysis for mission {mission_name}: {e}")
+        return jsonify({"error": "Failed to start analysis"}), 500
+    finally:
+        session.close()
+
+    if not job_id:
+        return jsonify({"message": "No new photos to analyze"}), 200
+    return jsonify({"message": "Analysis started", "job_id": job_id, "shards": shards}), 200
+
+def get_job_status(current_user, job_id):
+    """Return the status payload for a job owned by current_user, or None."""
+    job = jobs.get_job(job_id)
+    if not job or job.get("username") != current_user:
+        return None
+    return jobs.describe_job(job_id, job, celery.AsyncResult(job_id).state)
+
+@analysis_blueprint.route('/analyze/<job_id>', methods=['GET'])
+@token_required
+def get_analysis_job(current_user, job_id):
+    """
+    Report an analysis job's state, progress, throughput and ETA.
+    With ?wait=N&since=M the request long-polls for up to N seconds until more than M
+    photos are done or the job finishes.
+    """
+    status = get_job_status(current_user, job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    wait = min(request.args.get('wait', 0, type=float), MAX_LONG_POLL_SECONDS)
+    since = request.args.get('since', -1, type=int)
+    deadline = time.monotonic() + wait
+    while (status["state"] not in TERMINAL_STATES and status["photos_done"] <= since
+           and time.monotonic() < deadline):
+        time.sleep(JOB_POLL_INTERVAL)
+        status = get_job_status(current_user, job_id)
+    return jsonify(status), 200
+
+@analysis_blueprint.route('/analyze/<job_id>/events', methods=['GET'])
+@token_required
+def stream_analysis_job(current_user, job_id):
+    """
+    Push job status updates as server-sent events until the job finishes, or for at most
+    MAX_EVENT_STREAM_SECONDS; the client then reconnects (EventSource does so by itself
+    after the advertised retry delay) and gets the current status first.
+    """
+    status = get_job_status(current_user, job_id)
+    if status is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def events(status):
+        deadline = time.monotonic() + MAX_EVENT_STREAM_SECONDS
+        yield f"retry: {EVENT_STREAM_RETRY_MS}\n\n"
+        last = None
+        while True:
+            snapshot = (status["state"], status["photos_done"])
+            if snapshot != last:
+                yield f"data: {json.dumps(status)}\n\n"
+                last = snapshot
+            if status["state"] in TERMINAL_STATES or time.monotonic() >= deadline:
+                return
+            time.sleep(JOB_POLL_INTERVAL)
+            status = get_job_status(current_user, job_id)
+
+    return Response(stream_with_context(events(status)), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def start_analysis(session, username, mission):
+    """
+    Split a mission's new photos into shards, one Celery subtask each, with a chord callback
+    that marks the mission processed once every shard has finished.
+    Returns (job_id, number of shards); job_id is None when there is nothing to analyze.
+    """
+    mission_name = mission.mission_name
+    photo_ids = [
+        photo_id for (photo_id,) in session.query(Photo.id).filter_by(
+            mission_id=mission.id,
+            is_new_image=True
+        ).order_by(Photo.id)
+    ]
+    if not photo_ids:
+        return None, 0
+
+    shard_size = max(1, get_server_manager().ANALYSIS_SHARD_SIZE)
+    shards = [photo_ids[i:i + shard_size] for i in range(0, len(photo_ids), shard_size)]
+
+    # The chord callback's task id doubles as the job id
+    job_id = uuid.uuid4().hex
+    jobs.create_job(job_id, username, mission_name, len(photo_ids), len(shards))
+    chord(
+        (analyze_shard.s(username, mission_name, shard, job_id=job_id) for shard in shards),
+        finalize_analysis.s(username, mission_name, job_id=job_id)
+    ).apply_async(task_id=job_id)
+    logging.info(f"Queued analysis job {job_id}: {len(photo_ids)} photos in {len(shards)} shards for {username}/{mission_name}")
+    return job_id, len(shards)
 
 @celery.task
 def run_analysis(username, mission_name):
-    """Background task to analyze photos."""
+    """Background task to analyze a whole mission by fanning it out into shards."""
     session = get_database_session()
     try:
         mission = session.query(Mission).filter_by(username=username, mission_name=mission_name).first()
         if not mission:
             logging.error(f"Mission {mission_name} not found for user {username}")
-            session.close()
-            return
+            return None
+        job_id, _ = start_analysis(session, username, mission)
+        return job_id
+    finally:
+        session.close()
 
-        photos = session.query(Photo).filter_by(
-            mission_id=mission.id,
-            is_new_image=True
+@celery.task(autoretry_for=(Exception,), retry_backoff=True, retry_backoff_max=300, max_retries=3)
+def analyze_shard(username, mission_name, photo_ids, job_id=None):
+    """
+    Analyze one shard of a mission's photos. An exception retries only this shard.
+    Returns the number of photos analyzed.
+    """
+    session = get_database_session()
+    try:
+        mission = session.query(Mission).filter_by(username=username, mission_name=mission_name).first()
+        if not mission:
+            logging.error(f"Mission {mission_name} not found for user {username}")
+            return 0
+
+        # Skip photos another run already finished (e.g. when this shard is retried)
+        photos = session.query(Photo).filter(
+            Photo.mission_id == mission.id,
+            Photo.id.in_(photo_ids),
+            Photo.is_new_image.is_(True)
         ).all()
 
         if not photos:
-            return
-
-        for photo in photos:
-            server_manager = get_server_manager()
-            user_upload_folder = os.path.join(server_manager.UPLOADED_IMAGES_PATH, username, mission_name)
-            user_processed_folder = os.path.join(server_manager.PROCESSED_IMAGES_PATH, username, mission_name)
-            os.makedirs(user_processed_folder, exist_ok=True)
+            jobs.add_shard_done(job_id)
+            return 0
 
-            original_path = os.path.join(user_upload_folder, photo.filename)
-            processed_path = os.path.join(user_processed_folder, photo.filename)
+        server_manager = get_server_manager()
+        user_upload_folder = os.path.join(server_manager.UPLOADED_IMAGES_PATH, username, mission_name)
+        user_processed_folder = os.path.join(server_manager.PROCESSED_IMAGES_PATH, username, mission_name)
+        detections_folder = os.path.join(user_processed_folder, "detections")
+        os.makedirs(detections_folder, exist_ok=True)
 
-            # Run YOLOv11 inference
-            photo_type = run_yolov11_inference(original_path, processed_path)
+        # Decode, inference, image writes and DB updates run as overlapping pipeline stages
+        pipeline = AnalysisPipeline(
+            server_manager.get_inference_engine(),
+            readers=server_manager.ANALYSIS_READERS,
+            writers=server_manager.ANALYSIS_WRITERS,
+            queue_size=server_manager.ANALYSIS_QUEUE_SIZE,
+            db_batch_size=server_manager.ANALYSIS_DB_BATCH_SIZE
+        )
+        items = [(photo.id, os.path.join(user_upload_folder, photo.filename)) for photo in photos]
+        filenames = {photo.id: photo.filename for photo in photos}
+        previous_hashes = {photo.id: photo.processed_hash for photo in photos}
+        blob_store = server_manager.get_blob_store()
+        blob_sizes = {}
 
-            # Organize the processed image into the type folder
+        def write_result(photo_id, result):
+            """Write the annotated image into its type folder and return the photo's DB update."""
+            filename = filenames[photo_id]
+            photo_type = result.photo_type
             type_folder = os.path.join(user_processed_folder, photo_type)
             os.makedirs(type_folder, exist_ok=True)
-            shutil.move(processed_path, os.path.join(type_folder, photo.filename))
+            annotated = annotate_image(result.image, result.detections)
+            # Encoded once in memory, stored by content and linked into the type folder
+            buffer = io.BytesIO()
+            annotated.save(buffer, format=Image.registered_extensions().get(os.path.splitext(filename)[1].lower(), "PNG"))
+            data = buffer.getvalue()
+            digest = blob_store.put_bytes(data)
+            blob_sizes[digest] = len(data)
+            blob_store.place(digest, os.path.join(type_folder, filename))
+            # Thumbnails come from the annotated image still in memory, not from a re-read
+            save_thumbnails(annotated, type_folder, filename, server_manager.THUMBNAIL_SIZES)
+            save_detections(os.path.join(detections_folder, f"{filename}.json"), result)
+            return {
+                "id": photo_id,
+                "photo_type": photo_type,
+                "is_new_image": False,
+                "processed_path": storage_key(username, mission_name, photo_type, filename),
+                "processed_hash": digest
+            }
 
-            # Update the database
-            photo.photo_type = photo_type
-            photo.is_new_image = False
+        mission_id = mission.id
+
+        def commit_updates(updates):
+            # Reclassified photos show up in the mission's change feed
+            revision = next_revision(session, mission_id)
+            for update in updates:
+                update["revision"] = revision
+            session.bulk_update_mappings(Photo, updates)
+            release_references(session, [previous_hashes[update["id"]] for update in updates])
+            add_references(session, [(update["processed_hash"], blob_sizes[update["processed_hash"]]) for update in updates])
+            session.commit()
+            jobs.add_progress(job_id, len(updates))
+
+        # Photos that fail to decode or write stay marked as new so the next run retries them
+        stats = pipeline.run(items, write_result, commit_updates)
+        logging.info(f"Analysis shard of {len(photo_ids)} photos for {username}/{mission_name} finished: {stats}")
+        jobs.add_shard_done(job_id)
+        return stats["commit"]["items"]
+    except Exception as e:
+        logging.error(f"Error during analysis shard for mission {mission_name}: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
 
+@celery.task
+def finalize_analysis(shard_results, username, mission_name, job_id=None):
+    """Chord callback: mark the mission processed once all shards have finished."""
+    session = get_database_session()
+    try:
+        mission = session.query(Mission).filter_by(username=username, mission_name=mission_name).first()
+        if not mission:
+            return
+        remaining = session.query(Photo.id).filter_by(mission_id=mission.id, is_new_image=True).count()
+        mission.processed = remaining == 0
         session.commit()
+        jobs.mark_finished(job_id, remaining)
+        logging.info(f"Analysis of {username}/{mission_name} complete: {sum(shard_results)} photos analyzed, {remaining} remaining")
     except Exception as e:
-        logging.error(f"Error during analysis for mission {mission_name}: {e}")
+        logging.error(f"Error finalizing analysis for mission {mission_name}: {e}")
+        session.rollback()
     finally:
         session.close()
 
-def run_yolov11_inference(input_path, output_path):
-    """Placeholder function to run YOLOv11 inference."""
-    # Simulate processing by copying the file and assigning a random type
-    shutil.copy(input_path, output_path)
-    photo_type = f"type_{random.randint(1,3)}"
-    return photo_type
+def queue_thumbnails(username, mission_name, filenames):
+    """Generate thumbnails for freshly uploaded photos in the background."""
+    if not filenames:
+        return
+    try:
+        generate_upload_thumbnails.delay(username, mission_name, list(filenames))
+    except Exception as e:
+        # Thumbnails are also generated on first request, so a missing broker is not fatal
+        logging.error(f"Failed to queue thumbnails for {username}/{mission_name}: {e}")
 
+@celery.task
+def generate_upload_thumbnails(username, mission_name, filenames):
+    """
+    Write the thumbnail pyramid for uploaded originals and record the sizes on their rows.
+    Returns the number of photos done.
+    """
+    server_manager = get_server_manager()
+    sizes = server_manager.THUMBNAIL_SIZES
+    user_upload_folder = os.path.join(server_manager.UPLOADED_IMAGES_PATH, username, mission_name)
+    done = []
+    for filename in filenames:
+        source_path = os.path.join(user_upload_folder, filename)
+        try:
+            generate_thumbnails(source_path, sizes)
+            # A re-upload that landed meanwhile makes these thumbnails stale; leave it unrecorded
+            if not any(is_stale(source_path, thumbnail_path(user_upload_folder, filename, size)) for size in sizes):
+                done.append(filename)
+        except Exception as e:
+            logging.error(f"Failed to generate thumbnails for {username}/{mission_name}/{filename}: {e}")
+
+    if done:
+        session = get_database_session()
+        try:
+            mission = session.query(Mission).filter_by(username=username, mission_name=mission_name).first()
+            if mission:
+                session.query(Photo).filter(
+                    Photo.mission_id == mission.id,
+                    Photo.filename.in_(done)
+                ).update({Photo.thumbnail_sizes: ",".join(str(size) for size in sizes)}, synchronize_session=False)
+                session.commit()
+        except Exception as e:
+            logging.error(f"Failed to record thumbnails for {username}/{mission_name}: {e}")
+            session.rollback()
+        finally:
+            session.close()
+    return len(done)
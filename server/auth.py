@@ -1,13 +1,17 @@
 from flask import Blueprint, request, jsonify, current_app
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine
-import bcrypt
 import os
 import jwt
+import time
 import datetime
 import logging
+import uuid
 from functools import wraps
+import redis
 from models import User
+from authcache import get_auth_cache
+from passwords import HasherBusy, get_password_hasher
 
 auth_blueprint = Blueprint('auth', __name__)
 
@@ -24,20 +28,78 @@ def get_database_session():
     Session = server_manager.get_database_session()
     return Session()
 
+def verify_token(token):
+    """
+    Return the claims of a valid token, decoding it only if this worker has not seen it yet.
+    Raises jwt.InvalidTokenError (or jwt.ExpiredSignatureError) otherwise.
+    """
+    auth_cache = get_auth_cache(get_server_manager())
+    claims = auth_cache.get_claims(token)
+    if claims is None:
+        claims = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+        if 'username' not in claims:
+            raise jwt.InvalidTokenError("Token has no username")
+        auth_cache.put_claims(token, claims)
+    return claims
+
+def issue_token(username):
+    """Sign a 24 hour token for username."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return jwt.encode({
+        'username': username,
+        'jti': uuid.uuid4().hex,
+        # Fractional, so a token issued right after a password change is never older than it
+        'iat': now.timestamp(),
+        'exp': now + datetime.timedelta(hours=24)
+    }, current_app.config['SECRET_KEY'], algorithm="HS256")
+
+def busy_response():
+    """503 for requests turned away because password hashing is saturated."""
+    response = jsonify({"error": "Server is busy, please try again shortly."})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def load_user(username):
+    """Return {"id", "username", "profile", "password_changed_at"} for an existing user, or None; cached per worker."""
+    auth_cache = get_auth_cache(get_server_manager())
+    user = auth_cache.get_user(username)
+    if user is None:
+        session = get_database_session()
+        try:
+            row = session.query(User.id, User.username, User.profile, User.password_changed_at).filter_by(username=username).first()
+        finally:
+            session.close()
+        if row is None:
+            return None
+        user = {"id": row.id, "username": row.username, "profile": row.profile,
+                "password_changed_at": row.password_changed_at}
+        auth_cache.put_user(username, user)
+    return user
+
 def token_required(f):
-    """Decorator to check for a valid JWT token."""
+    """
+    Decorator to check for a valid, unrevoked JWT token belonging to an existing user,
+    issued after the user's last password change.
+    """
     @wraps(f)
     def decorated(*args, **kwargs):
         token = request.headers.get('x-access-token')
         if not token:
             return jsonify({'error': 'Token is missing!'}), 401
         try:
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user = data['username']
+            claims = verify_token(token)
         except jwt.ExpiredSignatureError:
             return jsonify({'error': 'Token has expired!'}), 401
         except jwt.InvalidTokenError:
             return jsonify({'error': 'Invalid token!'}), 401
+        if get_auth_cache(get_server_manager()).is_revoked(token, claims):
+            return jsonify({'error': 'Token has been revoked!'}), 401
+        current_user = claims['username']
+        user = load_user(current_user)
+        if user is None:
+            return jsonify({'error': 'User no longer exists!'}), 401
+        if user['password_changed_at'] and claims.get('iat', 0) < user['password_changed_at']:
+            return jsonify({'error': 'Password has changed, please log in again!'}), 401
         return f(current_user, *args, **kwargs)
     return decorated
 
@@ -59,11 +121,13 @@ def register_user():
         if session.query(User).filter_by(username=username).first():
             return jsonify({"error": "Username already exists"}), 409
 
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-        new_user = User(username=username, password_hash=password_hash.decode('utf-8'))
+        password_hash = get_password_hasher(get_server_manager()).hash(password)
+        new_user = User(username=username, password_hash=password_hash)
         session.add(new_user)
         session.commit()
         return jsonify({"message": "User registered successfully"}), 201
+    except HasherBusy:
+        return busy_response()
     except Exception as e:
         logging.error(f"Registration error: {e}")
         session.rollback()
@@ -84,27 +148,55 @@ def login_user():
     session = get_database_session()
     try:
         user = session.query(User).filter_by(username=username).first()
-        if user and bcrypt.checkpw(password.encode('utf-8'), user.password_hash.encode('utf-8')):
-            token = jwt.encode({
-                'username': username,
-                'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
-            }, current_app.config['SECRET_KEY'], algorithm="HS256")
-            return jsonify({"message": "Login successful", "token": token}), 200
+        hasher = get_password_hasher(get_server_manager())
+        if user and hasher.verify(password, user.password_hash):
+            if hasher.needs_rehash(user.password_hash):
+                upgrade_password_hash(session, user, password)
+            return jsonify({"message": "Login successful", "token": issue_token(username)}), 200
         else:
             logging.warning(f"Invalid login attempt for user: {username}")
             return jsonify({"error": "Invalid credentials"}), 401
+    except HasherBusy:
+        return busy_response()
     except Exception as e:
         logging.error(f"Login error: {e}")
         return jsonify({"error": "An error occurred during login"}), 500
     finally:
         session.close()
 
+def upgrade_password_hash(session, user, password):
+    """
+    Re-hash a just-verified password at the configured bcrypt cost. Best effort: if hashing
+    is saturated or the update fails, the old hash stays valid and is upgraded at a later login.
+    """
+    try:
+        user.password_hash = get_password_hasher(get_server_manager()).hash(password)
+        session.commit()
+    except HasherBusy:
+        logging.info(f"Skipped re-hashing the password of {user.username}: hashing is busy")
+    except Exception as e:
+        logging.error(f"Error re-hashing the password of {user.username}: {e}")
+        session.rollback()
+
+@auth_blueprint.route('/logout', methods=['POST'])
+@token_required
+def logout_user(current_user):
+    """Endpoint to revoke the caller's token before it expires."""
+    token = request.headers.get('x-access-token')
+    try:
+        get_auth_cache(get_server_manager()).revoke(token, verify_token(token))
+        return jsonify({"message": "Logged out"}), 200
+    except redis.RedisError as e:
+        logging.error(f"Logout error for user {current_user}: {e}")
+        return jsonify({"error": "An error occurred during logout"}), 500
+
 @auth_blueprint.route('/change_password', methods=['POST'])
 @token_required
 def change_password(current_user):
     """
     Endpoint to handle changing the password for a user.
-    Requires a valid JWT token.
+    Requires a valid JWT token. Every token issued before the change stops working,
+    so the response carries a fresh one for the caller.
     """
     data = request.get_json()
     old_password = data.get('old_password', '').strip()
@@ -125,16 +217,21 @@ def change_password(current_user):
             return jsonify({"error": "User not found."}), 404
 
         # Verify the old password
-        if not bcrypt.checkpw(old_password.encode('utf-8'), user.password_hash.encode('utf-8')):
+        hasher = get_password_hasher(get_server_manager())
+        if not hasher.verify(old_password, user.password_hash):
             return jsonify({"error": "Old password is incorrect."}), 401
 
         # Hash the new password
-        new_password_hash = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
-        user.password_hash = new_password_hash.decode('utf-8')
+        user.password_hash = hasher.hash(new_password)
+        user.password_changed_at = time.time()
 
         # Commit changes
         session.commit()
-        return jsonify({"message": "Password changed successfully."}), 200
+        get_auth_cache(get_server_manager()).invalidate_user(current_user)
+        return jsonify({"message": "Password changed successfully.", "token": issue_token(current_user)}), 200
+    except HasherBusy:
+        session.rollback()
+        return busy_response()
     except Exception as e:
         logging.error(f"Change password error for user {current_user}: {e}")
         session.rollback()
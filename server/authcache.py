@@ -0,0 +1,172 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import redis
+from jobs import get_redis
+
+# Sorted sets in Redis: revoked token ids scored by token expiry, changed usernames scored by change time
+REVOKED_TOKENS_KEY = "auth:revoked_tokens"
+USER_CHANGES_KEY = "auth:user_changes"
+USER_CHANGES_RETENTION = 24 * 3600
+
+class TTLCache:
+    """Thread-safe LRU mapping whose entries each carry their own expiry time."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, now=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= (now or time.time()):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_where(self, predicate):
+        """Drop every entry whose value satisfies predicate."""
+        with self._lock:
+            for key in [key for key, (value, _) in self._entries.items() if predicate(value)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+def token_id(token, claims):
+    """Identifier a token is revoked by: its jti, or a hash of the token for tokens issued without one."""
+    return claims.get('jti') or hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+class AuthCache:
+    """
+    Per-worker cache behind token_required: verified token -> claims (never past the token's
+    expiry), username -> user record, and a local copy of the Redis revocation list. Changes
+    made in this worker apply at once; those made elsewhere are pulled from Redis at most
+    every sync_interval seconds, so a warm request costs a few dictionary lookups.
+    """
+
+    def __init__(self, token_cache_size=4096, token_ttl=300, user_cache_size=1024, user_ttl=60, sync_interval=5.0):
+        self.tokens = TTLCache(token_cache_size)
+        self.users = TTLCache(user_cache_size)
+        self.token_ttl = token_ttl
+        self.user_ttl = user_ttl
+        self.sync_interval = sync_interval
+        self._revoked = set()
+        self._synced_at = 0.0
+        self._sync_lock = threading.Lock()
+
+    # Verified tokens
+
+    def get_claims(self, token):
+        return self.tokens.get(token)
+
+    def put_claims(self, token, claims):
+        expires_at = time.time() + self.token_ttl
+        if 'exp' in claims:
+            expires_at = min(expires_at, float(claims['exp']))
+        self.tokens.put(token, claims, expires_at)
+
+    # Users
+
+    def get_user(self, username):
+        return self.users.get(username)
+
+    def put_user(self, username, user):
+        self.users.put(username, user, time.time() + self.user_ttl)
+
+    def forget_user(self, username):
+        """Drop a user's cached record and every cached token of theirs."""
+        self.users.discard(username)
+        self.tokens.discard_where(lambda claims: claims.get('username') == username)
+
+    def invalidate_user(self, username):
+        """Forget a user here and, through Redis, in every other worker."""
+        self.forget_user(username)
+        try:
+            client = get_redis()
+            now = time.time()
+            client.zadd(USER_CHANGES_KEY, {username: now})
+            client.zremrangebyscore(USER_CHANGES_KEY, '-inf', now - USER_CHANGES_RETENTION)
+        except redis.RedisError as e:
+            logging.error(f"Could not publish user change for {username}: {e}")
+
+    # Revocation
+
+    def revoke(self, token, claims):
+        """Add a token to the revocation list until it would have expired anyway."""
+        jti = token_id(token, claims)
+        expires_at = float(claims.get('exp', time.time() + self.token_ttl))
+        # Held so a sync running meanwhile cannot replace the local list with one read before this
+        with self._sync_lock:
+            self._revoked.add(jti)
+            self.tokens.discard(token)
+            client = get_redis()
+            client.zadd(REVOKED_TOKENS_KEY, {jti: expires_at})
+            client.zremrangebyscore(REVOKED_TOKENS_KEY, '-inf', time.time())
+
+    def is_revoked(self, token, claims):
+        self.sync()
+        return token_id(token, claims) in self._revoked
+
+    def sync(self, force=False):
+        """Pull the revocation list and recent user changes from Redis if the local copy is stale."""
+        now = time.time()
+        if not force and now - self._synced_at < self.sync_interval:
+            return
+        if not self._sync_lock.acquire(blocking=False):
+            # Another thread is already syncing; the current copy is good enough meanwhile
+            return
+        try:
+            since = self._synced_at
+            client = get_redis()
+            pipe = client.pipeline()
+            pipe.zrangebyscore(REVOKED_TOKENS_KEY, now, '+inf')
+            # Overlap the previous sync a little so a change written just before it is not missed
+            pipe.zrangebyscore(USER_CHANGES_KEY, since - self.sync_interval, '+inf')
+            revoked, changed_users = pipe.execute()
+            self._revoked = set(revoked)
+            for username in changed_users:
+                self.forget_user(username)
+            self._synced_at = now
+        except redis.RedisError as e:
+            # Keep serving with the last known list; retried after the next interval
+            logging.error(f"Could not refresh the token revocation list: {e}")
+            self._synced_at = now
+        finally:
+            self._sync_lock.release()
+
+_auth_cache = None
+_auth_cache_pid = None
+
+def get_auth_cache(server_manager):
+    """Return this worker's AuthCache, creating a fresh one after fork."""
+    global _auth_cache, _auth_cache_pid
+    if _auth_cache is None or _auth_cache_pid != os.getpid():
+        _auth_cache = AuthCache(server_manager.TOKEN_CACHE_SIZE, server_manager.TOKEN_CACHE_TTL,
+                                server_manager.USER_CACHE_SIZE, server_manager.USER_CACHE_TTL,
+                                server_manager.AUTH_SYNC_INTERVAL)
+        _auth_cache_pid = os.getpid()
+    return _auth_cache
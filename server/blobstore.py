@@ -0,0 +1,277 @@
+import os
+import time
+import stat
+import uuid
+import shutil
+import fcntl
+import tempfile
+import hashlib
+import logging
+import argparse
+from abc import ABC, abstractmethod
+from collections import Counter
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from models import Blob
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Linux FICLONE ioctl: share extents copy-on-write (btrfs, XFS) instead of copying bytes
+FICLONE = 0x40049409
+# Blobs whose last reference went away (or that were never committed) are kept this long
+DEFAULT_GC_GRACE_SECONDS = 3600
+
+def sha256_file(path):
+    """Hex SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def valid_digest(digest):
+    return isinstance(digest, str) and len(digest) == 64 and all(c in '0123456789abcdef' for c in digest)
+
+class BlobStore(ABC):
+    """
+    Content-addressed storage: immutable blobs keyed by their SHA-256.
+    Subclasses implement the byte storage; callers only ever deal in digests.
+    """
+
+    @abstractmethod
+    def put_file(self, path, digest=None):
+        """Ingest the file at path (which is consumed) and return its digest."""
+
+    @abstractmethod
+    def put_bytes(self, data):
+        """Store data and return its digest."""
+
+    @abstractmethod
+    def exists(self, digest):
+        """Whether a blob with this digest is stored."""
+
+    @abstractmethod
+    def size(self, digest):
+        """Size of the blob in bytes."""
+
+    @abstractmethod
+    def open(self, digest):
+        """Return a readable binary file object for the blob."""
+
+    @abstractmethod
+    def delete(self, digest):
+        """Remove the blob; a blob that is already gone is not an error."""
+
+    @abstractmethod
+    def iter_digests(self):
+        """Yield (digest, modified time) for every stored blob."""
+
+    def place(self, digest, dest_path):
+        """Make the blob's bytes available at dest_path (copied by default)."""
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest_path), prefix=f".{os.path.basename(dest_path)}.", suffix=".place")
+        try:
+            with self.open(digest) as src, os.fdopen(fd, 'wb') as dst:
+                shutil.copyfileobj(src, dst, HASH_CHUNK_SIZE)
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            remove_quietly(tmp_path)
+            raise
+
+class LocalBlobStore(BlobStore):
+    """
+    Blobs on the local filesystem under root/ab/cd/<digest>, read-only once written.
+    Placements are hard links where possible, then reflinks, then plain copies.
+    on_reuse(digest, size) is called when stored content arrives again; every placement shares
+    the blob's inode, so its mtime is left alone (it is what ETags and thumbnails go by) and
+    recency for garbage collection is recorded elsewhere, in the blob's row (see record_reuse).
+    """
+
+    def __init__(self, root, on_reuse=None):
+        self.root = root
+        self.on_reuse = on_reuse
+        os.makedirs(root, exist_ok=True)
+
+    def blob_path(self, digest):
+        if not valid_digest(digest):
+            raise ValueError(f"Invalid blob digest: {digest!r}")
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def put_file(self, path, digest=None):
+        digest = digest or sha256_file(path)
+        blob_path = self.blob_path(digest)
+        if os.path.exists(blob_path):
+            # Same content is already stored: keep one copy
+            os.remove(path)
+            self.reused(digest, blob_path)
+            return digest
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        try:
+            os.replace(path, blob_path)
+        except OSError:
+            # Staging area on another filesystem
+            shutil.move(path, blob_path)
+        os.chmod(blob_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        return digest
+
+    def put_bytes(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = self.blob_path(digest)
+        if os.path.exists(blob_path):
+            self.reused(digest, blob_path)
+            return digest
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        # Unique per call: threads of one process may store the same content at once
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(blob_path), prefix=f".{digest}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            return self.put_file(tmp_path, digest)
+        except BaseException:
+            remove_quietly(tmp_path)
+            raise
+
+    def reused(self, digest, blob_path):
+        if self.on_reuse is not None:
+            self.on_reuse(digest, os.path.getsize(blob_path))
+
+    def exists(self, digest):
+        return os.path.exists(self.blob_path(digest))
+
+    def size(self, digest):
+        return os.path.getsize(self.blob_path(digest))
+
+    def open(self, digest):
+        return open(self.blob_path(digest), 'rb')
+
+    def delete(self, digest):
+        remove_quietly(self.blob_path(digest))
+
+    def iter_digests(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if valid_digest(filename):
+                    yield filename, os.path.getmtime(os.path.join(dirpath, filename))
+
+    def place(self, digest, dest_path):
+        blob_path = self.blob_path(digest)
+        try:
+            if os.path.samefile(blob_path, dest_path):
+                return
+        except OSError:
+            pass
+        # Unique per call so concurrent placements at the same destination cannot collide;
+        # the last os.replace wins, and both leave a complete file
+        tmp_path = os.path.join(os.path.dirname(dest_path), f".{os.path.basename(dest_path)}.{uuid.uuid4().hex}.place")
+        try:
+            try:
+                os.link(blob_path, tmp_path)
+            except OSError:
+                # Different filesystem or no hard link support: try a copy-on-write clone, then a copy
+                with open(blob_path, 'rb') as src, open(tmp_path, 'xb') as dst:
+                    try:
+                        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                    except OSError:
+                        shutil.copyfileobj(src, dst, HASH_CHUNK_SIZE)
+            os.replace(tmp_path, dest_path)
+        except BaseException:
+            remove_quietly(tmp_path)
+            raise
+
+def create_blob_store(backend, root=None, on_reuse=None):
+    """Build a BlobStore by name; only 'local' ships today."""
+    if backend == 'local':
+        return LocalBlobStore(root, on_reuse)
+    raise ValueError(f"Unknown blob store backend: {backend}")
+
+# --- Reference counts, kept in the blobs table in the same transaction as the rows using them ---
+
+def add_references(session, refs):
+    """Count one reference per (digest, size) pair in refs, creating blob rows as needed."""
+    now = time.time()
+    for (digest, size), count in Counter(r for r in refs if r[0]).items():
+        change_refcount(session, digest, size, count, now)
+
+def change_refcount(session, digest, size, count, now):
+    """Add count to a blob's refcount and stamp updated_at, creating its row if there is none."""
+    updated = session.query(Blob).filter(Blob.digest == digest).update(
+        {Blob.refcount: Blob.refcount + count, Blob.updated_at: now}, synchronize_session=False
+    )
+    if updated:
+        return
+    try:
+        with session.begin_nested():
+            session.add(Blob(digest=digest, size=size, refcount=count, updated_at=now))
+    except IntegrityError:
+        # Another transaction created the row first
+        session.query(Blob).filter(Blob.digest == digest).update(
+            {Blob.refcount: Blob.refcount + count, Blob.updated_at: now}, synchronize_session=False
+        )
+
+def record_reuse(engine, digest, size):
+    """
+    Stamp a blob's row (creating one without references if needed) in a transaction of its own,
+    so collect_garbage keeps the blob for its grace period while the caller's transaction,
+    still open, adds the new reference.
+    """
+    session = Session(bind=engine)
+    try:
+        change_refcount(session, digest, size, 0, time.time())
+        session.commit()
+    except SQLAlchemyError as e:
+        logging.error(f"Could not record reuse of blob {digest}: {e}")
+        session.rollback()
+    finally:
+        session.close()
+
+def release_references(session, digests):
+    """Drop one reference per digest; blobs reaching zero are left for collect_garbage."""
+    now = time.time()
+    for digest, count in Counter(d for d in digests if d).items():
+        session.query(Blob).filter(Blob.digest == digest).update(
+            {Blob.refcount: Blob.refcount - count, Blob.updated_at: now}, synchronize_session=False
+        )
+
+def collect_garbage(session, store, grace_seconds=DEFAULT_GC_GRACE_SECONDS):
+    """
+    Delete unreferenced blobs: rows whose refcount dropped to zero more than grace_seconds ago,
+    and stored blobs that never got a row (an upload that failed before committing).
+    Returns the number of blobs deleted.
+    """
+    cutoff = time.time() - grace_seconds
+    deleted = 0
+    for (digest,) in session.query(Blob.digest).filter(Blob.refcount <= 0, Blob.updated_at < cutoff).all():
+        # Re-check in the DELETE itself in case the blob was referenced again meanwhile
+        if session.query(Blob).filter(Blob.digest == digest, Blob.refcount <= 0).delete(synchronize_session=False):
+            session.commit()
+            store.delete(digest)
+            deleted += 1
+        else:
+            session.rollback()
+
+    known = {digest for (digest,) in session.query(Blob.digest)}
+    for digest, modified in store.iter_digests():
+        if digest not in known and modified < cutoff:
+            store.delete(digest)
+            deleted += 1
+    return deleted
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Blob store maintenance")
+    parser.add_argument("command", choices=["gc"])
+    parser.add_argument("--grace", type=int, default=DEFAULT_GC_GRACE_SECONDS, help="Seconds an unreferenced blob is kept")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from server_manager import ServerManager
+    server_manager = ServerManager()
+    session = server_manager.get_database_session()()
+    try:
+        count = collect_garbage(session, server_manager.get_blob_store(), args.grace)
+        logging.info(f"Deleted {count} unreferenced blobs")
+    finally:
+        session.close()
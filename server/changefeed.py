@@ -0,0 +1,85 @@
+from sqlalchemy import select, update, union_all, literal, and_, or_
+from models import Photo, PhotoDeletion, Mission
+
+# Largest page a client may request from the change feed
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 5000
+
+def next_revision(session, mission_id):
+    """
+    Allocate the revision for the changes in the current transaction. The UPDATE locks the
+    mission row until commit, so a mission's revisions become visible in increasing order and
+    a reader can never see revision N+1 before N.
+    """
+    session.execute(update(Mission).where(Mission.id == mission_id).values(revision=Mission.revision + 1))
+    return session.execute(select(Mission.revision).where(Mission.id == mission_id)).scalar_one()
+
+def record_deletions(session, mission_id, filenames, revision):
+    """Replace the photos' rows with tombstones at the given revision."""
+    filenames = list(filenames)
+    if not filenames:
+        return
+    session.query(Photo).filter(Photo.mission_id == mission_id, Photo.filename.in_(filenames)).delete(synchronize_session=False)
+    session.query(PhotoDeletion).filter(
+        PhotoDeletion.mission_id == mission_id,
+        PhotoDeletion.filename.in_(filenames)
+    ).delete(synchronize_session=False)
+    session.bulk_insert_mappings(PhotoDeletion, [
+        {"mission_id": mission_id, "filename": filename, "revision": revision} for filename in filenames
+    ])
+
+def encode_cursor(revision, filename):
+    return f"{revision}:{filename}"
+
+def decode_cursor(cursor):
+    """Parse a "<revision>:<filename>" cursor; raises ValueError if it is malformed."""
+    revision, _, filename = cursor.partition(":")
+    return int(revision), filename
+
+def get_changes(session, mission, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Return photos changed or deleted after cursor, ordered by (revision, filename).
+    Without a cursor the whole mission is returned, page by page.
+    Returns {"changes", "cursor", "has_more", "revision"}.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    photos = select(
+        Photo.revision.label("revision"),
+        Photo.filename.label("filename"),
+        Photo.photo_type.label("photo_type"),
+        literal(False).label("deleted")
+    ).where(Photo.mission_id == mission.id)
+    deletions = select(
+        PhotoDeletion.revision.label("revision"),
+        PhotoDeletion.filename.label("filename"),
+        literal(None).label("photo_type"),
+        literal(True).label("deleted")
+    ).where(PhotoDeletion.mission_id == mission.id)
+
+    if cursor:
+        revision, filename = decode_cursor(cursor)
+        photos = photos.where(or_(Photo.revision > revision, and_(Photo.revision == revision, Photo.filename > filename)))
+        deletions = deletions.where(or_(
+            PhotoDeletion.revision > revision,
+            and_(PhotoDeletion.revision == revision, PhotoDeletion.filename > filename)
+        ))
+
+    feed = union_all(photos, deletions).subquery()
+    rows = session.execute(
+        select(feed).order_by(feed.c.revision, feed.c.filename).limit(limit + 1)
+    ).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    changes = [
+        {
+            "filename": row.filename,
+            "photo_type": None if row.deleted else (row.photo_type or "Unprocessed"),
+            "deleted": bool(row.deleted),
+            "revision": row.revision
+        }
+        for row in rows
+    ]
+    if rows:
+        cursor = encode_cursor(rows[-1].revision, rows[-1].filename)
+    return {"changes": changes, "cursor": cursor, "has_more": has_more, "revision": mission.revision}
@@ -1,12 +1,13 @@
 from sqlalchemy import create_engine
-from models import Base
+from migrations import upgrade
 import os
 
-def init_db():
-    """Initialize the database and create tables."""
-    DATABASE_URL = os.getenv('DATABASE_URL')
-    engine = create_engine(DATABASE_URL)
-    Base.metadata.create_all(engine)
+def init_db(engine=None):
+    """Initialize the database: create tables or apply pending schema migrations."""
+    if engine is None:
+        DATABASE_URL = os.getenv('DATABASE_URL')
+        engine = create_engine(DATABASE_URL)
+    return upgrade(engine)
 
 if __name__ == "__main__":
     init_db()
@@ -0,0 +1,13 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+def create_executor(workers, name):
+    """
+    Pool of real OS threads for CPU-bound work such as hashing. Under gevent's monkey-patching
+    plain threads become greenlets, and a hash would then block every other request of the worker.
+    """
+    monkey = sys.modules.get("gevent.monkey")
+    if monkey is not None and monkey.is_module_patched("threading"):
+        from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+        return NativeThreadPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
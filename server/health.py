@@ -0,0 +1,165 @@
+import os
+import time
+import shutil
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from sqlalchemy import text
+from jobs import get_redis
+
+OK, DEGRADED, DOWN = "ok", "degraded", "down"
+# Without these the API cannot serve requests (Redis backs rate limiting, revocation and jobs)
+CRITICAL_CHECKS = ("database", "redis")
+
+def elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 2)
+
+def existing_parent(path):
+    """Nearest existing directory at or above path, so disk usage works before a folder is created."""
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return path
+
+class HealthMonitor:
+    """
+    Checks the server's dependencies - database, Redis, Celery workers and free disk space -
+    concurrently, each bounded by HEALTH_CHECK_TIMEOUT, and keeps the report for HEALTH_CACHE_TTL
+    seconds. Concurrent callers during a refresh wait for that one refresh instead of
+    starting their own, so a burst of probes never becomes a burst of queries.
+    """
+
+    def __init__(self, server_manager):
+        self.server_manager = server_manager
+        self.cache_ttl = server_manager.HEALTH_CACHE_TTL
+        self.check_timeout = server_manager.HEALTH_CHECK_TIMEOUT
+        self.min_free_disk_mb = server_manager.HEALTH_MIN_FREE_DISK_MB
+        self.max_queue_depth = server_manager.HEALTH_MAX_QUEUE_DEPTH
+        self.checks = {
+            "database": self.check_database,
+            "redis": self.check_redis,
+            "celery": self.check_celery,
+            "disk": self.check_disk
+        }
+        # A check stuck past its timeout keeps its thread; spare threads let the next refresh run meanwhile
+        self._executor = ThreadPoolExecutor(max_workers=2 * len(self.checks), thread_name_prefix="health")
+        self._lock = threading.Lock()
+        self._report = None
+        self._checked_at = 0.0
+
+    def report(self, force=False):
+        """Return the cached health report, refreshing it if it is older than cache_ttl."""
+        with self._lock:
+            if force or self._report is None or time.monotonic() - self._checked_at >= self.cache_ttl:
+                self._report = self.run_checks()
+                self._checked_at = time.monotonic()
+            return self._report
+
+    def run_checks(self):
+        started = time.perf_counter()
+        futures = {name: self._executor.submit(self.timed, check) for name, check in self.checks.items()}
+        deadline = time.monotonic() + self.check_timeout
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                results[name] = {"status": DOWN, "error": f"no answer within {self.check_timeout}s"}
+
+        if any(results[name]["status"] == DOWN for name in CRITICAL_CHECKS):
+            status = DOWN
+        elif any(result["status"] != OK for result in results.values()):
+            status = DEGRADED
+        else:
+            status = OK
+        return {
+            "status": status,
+            "ready": status != DOWN,
+            "checked_at": round(time.time(), 3),
+            "duration_ms": elapsed_ms(started),
+            "pid": os.getpid(),
+            "checks": results
+        }
+
+    def timed(self, check):
+        started = time.perf_counter()
+        try:
+            result = check()
+        except Exception as e:
+            logging.warning(f"Health check {check.__name__} failed: {e}")
+            # The report is unauthenticated; messages can carry hosts and paths, so they stay in the log
+            result = {"status": DOWN, "error": type(e).__name__}
+        result["latency_ms"] = elapsed_ms(started)
+        return result
+
+    def check_database(self):
+        """Round trip of SELECT 1 through the pool, plus this worker's pool usage."""
+        engine = self.server_manager.get_engine()
+        started = time.perf_counter()
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        round_trip_ms = elapsed_ms(started)
+        pool = self.server_manager.get_pool_status()
+        capacity = pool["pool_size"] + pool["max_overflow"]
+        return {
+            # Every connection in use means requests are queueing for one
+            "status": DEGRADED if pool["checked_out"] >= capacity else OK,
+            "round_trip_ms": round_trip_ms,
+            "in_use": pool["checked_out"],
+            "idle": pool["checked_in"],
+            "pool_size": pool["pool_size"],
+            "overflow": pool["overflow"],
+            "max_overflow": pool["max_overflow"]
+        }
+
+    def check_redis(self):
+        started = time.perf_counter()
+        get_redis().ping()
+        return {"status": OK, "round_trip_ms": elapsed_ms(started)}
+
+    def check_celery(self):
+        """Workers answering a control ping, and tasks waiting in the default queue."""
+        from analysis import celery
+        queue = celery.conf.task_default_queue
+        # The broker is Redis, where a queue is a list
+        queue_depth = get_redis().llen(queue)
+        # Replies are collected until the timeout, so keep it well inside check_timeout
+        workers = sorted(name for reply in celery.control.ping(timeout=self.check_timeout / 2) for name in reply)
+        if not workers:
+            status = DOWN
+        elif queue_depth > self.max_queue_depth:
+            status = DEGRADED
+        else:
+            status = OK
+        return {"status": status, "workers": len(workers), "queue": queue, "queue_depth": queue_depth}
+
+    def check_disk(self):
+        """
+        Free space on the filesystems holding uploaded images, processed images and their bytes,
+        by volume name only: the report is unauthenticated, so it does not reveal the paths.
+        """
+        volumes = {
+            "uploaded_images": self.server_manager.UPLOADED_IMAGES_PATH,
+            "processed_images": self.server_manager.PROCESSED_IMAGES_PATH,
+            "blobs": self.server_manager.BLOB_STORE_PATH
+        }
+        results = {}
+        for name, path in volumes.items():
+            free_bytes = shutil.disk_usage(existing_parent(path)).free
+            results[name] = {
+                "status": DEGRADED if free_bytes < self.min_free_disk_mb * 2**20 else OK,
+                "free_bytes": free_bytes
+            }
+        status = DEGRADED if any(result["status"] != OK for result in results.values()) else OK
+        return {"status": status, "volumes": results}
+
+_health_monitor = None
+_health_monitor_pid = None
+
+def get_health_monitor(server_manager):
+    """Return this worker's HealthMonitor, creating a fresh one (and thread pool) after fork."""
+    global _health_monitor, _health_monitor_pid
+    if _health_monitor is None or _health_monitor_pid != os.getpid():
+        _health_monitor = HealthMonitor(server_manager)
+        _health_monitor_pid = os.getpid()
+    return _health_monitor
@@ -0,0 +1,304 @@
+import os
+import json
+import time
+import random
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Photo type assigned when the model finds nothing
+NO_DEFECT_TYPE = "Clean"
+DEFAULT_CLASSES = ["Crack", "Spall", "Corrosion"]
+
+def letterbox(image, size):
+    """
+    Resize an image to fit a size x size square, preserving aspect ratio and padding with gray.
+    Returns the CHW float32 tensor scaled to [0, 1] and (scale, pad_x, pad_y) to map boxes back.
+    """
+    image = image.convert("RGB")
+    width, height = image.size
+    scale = min(size / width, size / height)
+    new_width, new_height = max(1, round(width * scale)), max(1, round(height * scale))
+    resized = image.resize((new_width, new_height), Image.BILINEAR)
+    pad_x, pad_y = (size - new_width) // 2, (size - new_height) // 2
+    canvas = Image.new("RGB", (size, size), (114, 114, 114))
+    canvas.paste(resized, (pad_x, pad_y))
+    tensor = np.asarray(canvas, dtype=np.float32).transpose(2, 0, 1) / 255.0
+    return tensor, (scale, pad_x, pad_y)
+
+def non_max_suppression(boxes, scores, iou_threshold):
+    """Indexes of boxes (x1, y1, x2, y2) kept after greedy NMS."""
+    order = scores.argsort()[::-1]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        xx1 = np.maximum(boxes[i, 0], boxes[order[1:], 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[order[1:], 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[order[1:], 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[order[1:], 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[order[1:]] - inter + 1e-9)
+        order = order[1:][iou <= iou_threshold]
+    return keep
+
+class InferenceBackend(ABC):
+    """Runs a model on a batch of letterboxed images and returns detections per image."""
+
+    def __init__(self, class_names, input_size=640, conf_threshold=0.25, iou_threshold=0.45):
+        self.class_names = class_names
+        self.input_size = input_size
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+
+    @abstractmethod
+    def infer_batch(self, batch):
+        """
+        batch is an (N, 3, input_size, input_size) float32 array.
+        Returns a list of N detection lists in letterboxed pixel coordinates,
+        each detection being {"class", "confidence", "box": [x1, y1, x2, y2]}.
+        """
+
+    def decode_yolo(self, output):
+        """Decode raw YOLOv8/v11 output of shape (N, 4 + classes, anchors) into detections."""
+        output = np.asarray(output)
+        if output.shape[1] > output.shape[2]:
+            # Some exports are already (N, anchors, 4 + classes)
+            output = output.transpose(0, 2, 1)
+        results = []
+        for prediction in output:
+            prediction = prediction.T
+            class_scores = prediction[:, 4:]
+            class_ids = class_scores.argmax(axis=1)
+            confidences = class_scores[np.arange(len(class_ids)), class_ids]
+            mask = confidences >= self.conf_threshold
+            if not mask.any():
+                results.append([])
+                continue
+            cx, cy, w, h = prediction[mask, :4].T
+            boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+            confidences, class_ids = confidences[mask], class_ids[mask]
+            keep = non_max_suppression(boxes, confidences, self.iou_threshold)
+            results.append([
+                {
+                    "class": self.class_names[class_ids[i]] if class_ids[i] < len(self.class_names) else str(class_ids[i]),
+                    "confidence": float(confidences[i]),
+                    "box": [float(v) for v in boxes[i]]
+                }
+                for i in keep
+            ])
+        return results
+
+class RandomBackend(InferenceBackend):
+    """Placeholder backend that assigns a random defect per image; used for tests and development."""
+
+    def infer_batch(self, batch):
+        size = self.input_size
+        results = []
+        for _ in range(len(batch)):
+            x1, y1 = random.uniform(0, size / 2), random.uniform(0, size / 2)
+            results.append([{
+                "class": random.choice(self.class_names),
+                "confidence": round(random.uniform(self.conf_threshold, 1.0), 3),
+                "box": [x1, y1, x1 + random.uniform(10, size / 2), y1 + random.uniform(10, size / 2)]
+            }])
+        return results
+
+class OnnxBackend(InferenceBackend):
+    """CPU backend for an exported YOLO ONNX model, using onnxruntime or OpenCV DNN."""
+
+    def __init__(self, model_path, class_names, input_size=640, conf_threshold=0.25,
+                 iou_threshold=0.45, num_threads=None):
+        super().__init__(class_names, input_size, conf_threshold, iou_threshold)
+        if not model_path or not os.path.exists(model_path):
+            raise FileNotFoundError(f"Inference model not found at {model_path}")
+        num_threads = num_threads or os.cpu_count() or 1
+
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            ort = None
+
+        if ort is not None:
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = num_threads
+            self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+            model_input = self.session.get_inputs()[0]
+            self.input_name = model_input.name
+            # Models exported without a dynamic batch axis only accept batches of exactly that size
+            self.fixed_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+            self.net = None
+        else:
+            try:
+                import cv2
+            except ImportError:
+                raise RuntimeError("The ONNX backend requires onnxruntime or opencv-python to be installed.")
+            cv2.setNumThreads(num_threads)
+            self.net = cv2.dnn.readNetFromONNX(model_path)
+            self.session = None
+            self.fixed_batch = None
+
+    def forward(self, batch):
+        if self.session is not None:
+            return self.session.run(None, {self.input_name: batch})[0]
+        self.net.setInput(batch)
+        return self.net.forward()
+
+    def infer_batch(self, batch):
+        if self.fixed_batch is None or len(batch) == self.fixed_batch:
+            return self.decode_yolo(self.forward(batch))
+        # Run fixed-size slices; the last one (e.g. a shard's remainder) is padded with blank images
+        outputs = []
+        for start in range(0, len(batch), self.fixed_batch):
+            part = batch[start:start + self.fixed_batch]
+            padding = self.fixed_batch - len(part)
+            if padding:
+                part = np.concatenate([part, np.zeros((padding,) + part.shape[1:], dtype=part.dtype)])
+            outputs.append(self.forward(part)[:self.fixed_batch - padding])
+        return self.decode_yolo(np.concatenate(outputs))
+
+class InferenceResult:
+    """Detections and derived photo type for one input image."""
+
+    def __init__(self, path, image, detections, error=None):
+        self.path = path
+        self.image = image
+        self.detections = detections
+        self.error = error
+
+    @property
+    def photo_type(self):
+        if not self.detections:
+            return NO_DEFECT_TYPE
+        return max(self.detections, key=lambda d: d["confidence"])["class"]
+
+class InferenceEngine:
+    """Decodes and letterboxes images into fixed-size batches and runs them through a backend."""
+
+    def __init__(self, backend, batch_size=8, num_threads=None):
+        self.backend = backend
+        self.batch_size = max(1, batch_size)
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self._decode_pool = ThreadPoolExecutor(max_workers=self.num_threads, thread_name_prefix="decode")
+
+    def load(self, path):
+        """Decode one image and letterbox it. Returns (image, tensor, transform)."""
+        with Image.open(path) as image:
+            image.load()
+        tensor, transform = letterbox(image, self.backend.input_size)
+        return image, tensor, transform
+
+    def _safe_load(self, path):
+        try:
+            return self.load(path), None
+        except Exception as e:
+            return None, e
+
+    def infer_loaded(self, items):
+        """
+        Run inference on already decoded items, a list of (path, (image, tensor, transform)).
+        Detections are mapped back to original image coordinates.
+        """
+        batch = np.stack([tensor for _, (_, tensor, _) in items])
+        detections = self.backend.infer_batch(batch)
+        results = []
+        for (path, (image, _, (scale, pad_x, pad_y))), image_detections in zip(items, detections):
+            width, height = image.size
+            for detection in image_detections:
+                x1, y1, x2, y2 = detection["box"]
+                detection["box"] = [
+                    round(min(max((x1 - pad_x) / scale, 0), width), 1),
+                    round(min(max((y1 - pad_y) / scale, 0), height), 1),
+                    round(min(max((x2 - pad_x) / scale, 0), width), 1),
+                    round(min(max((y2 - pad_y) / scale, 0), height), 1)
+                ]
+            results.append(InferenceResult(path, image, image_detections))
+        return results
+
+    def process(self, paths):
+        """Yield an InferenceResult per path, decoding in parallel and inferring in batches."""
+        for start in range(0, len(paths), self.batch_size):
+            chunk = paths[start:start + self.batch_size]
+            loaded = list(self._decode_pool.map(self._safe_load, chunk))
+            items = []
+            for path, (item, error) in zip(chunk, loaded):
+                if error is not None:
+                    logging.error(f"Failed to decode image {path}: {error}")
+                    yield InferenceResult(path, None, [], error=str(error))
+                else:
+                    items.append((path, item))
+            if items:
+                yield from self.infer_loaded(items)
+
+def annotate_image(image, detections):
+    """Return a copy of image with detection boxes and labels drawn on it."""
+    annotated = image.convert("RGB")
+    draw = ImageDraw.Draw(annotated)
+    for detection in detections:
+        x1, y1, x2, y2 = detection["box"]
+        draw.rectangle([x1, y1, x2, y2], outline=(255, 0, 0), width=3)
+        draw.text((x1 + 4, y1 + 4), f"{detection['class']} {detection['confidence']:.2f}", fill=(255, 0, 0))
+    return annotated
+
+def save_detections(path, result):
+    """Write an image's detections as JSON."""
+    with open(path, "w") as f:
+        json.dump({"photo_type": result.photo_type, "detections": result.detections}, f)
+
+def create_backend(name, model_path=None, class_names=None, input_size=640, conf_threshold=0.25,
+                   iou_threshold=0.45, num_threads=None):
+    """Build a backend by name ("random" or "onnx")."""
+    class_names = class_names or DEFAULT_CLASSES
+    if name == "random":
+        return RandomBackend(class_names, input_size, conf_threshold, iou_threshold)
+    if name == "onnx":
+        return OnnxBackend(model_path, class_names, input_size, conf_threshold, iou_threshold, num_threads)
+    raise ValueError(f"Unknown inference backend: {name}")
+
+def run_benchmark(backend_name, model_path, batch_sizes, num_images, threads, input_size, image_size):
+    """Report images/sec for each batch size on a synthetic image set."""
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = []
+        for i in range(num_images):
+            pixels = np.random.randint(0, 256, (image_size[1], image_size[0], 3), dtype=np.uint8)
+            path = os.path.join(tmp_dir, f"synthetic_{i}.jpg")
+            Image.fromarray(pixels).save(path, quality=90)
+            paths.append(path)
+
+        backend = create_backend(backend_name, model_path, input_size=input_size, num_threads=threads)
+        print(f"backend={backend_name} images={num_images} threads={threads} input={input_size}")
+        for batch_size in batch_sizes:
+            engine = InferenceEngine(backend, batch_size=batch_size, num_threads=threads)
+            # Warm up so one-time model initialisation is not counted
+            list(engine.process(paths[:batch_size]))
+            started = time.perf_counter()
+            count = sum(1 for _ in engine.process(paths))
+            elapsed = time.perf_counter() - started
+            print(f"batch_size={batch_size:>3}  {count / elapsed:8.2f} images/sec")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark batched inference throughput.")
+    parser.add_argument("-b", "--backend", default="random", choices=["random", "onnx"], help="Inference backend.")
+    parser.add_argument("-m", "--model", help="Path to the ONNX model (onnx backend).")
+    parser.add_argument("-n", "--images", type=int, default=128, help="Number of synthetic images.")
+    parser.add_argument("-t", "--threads", type=int, default=os.cpu_count(), help="CPU threads for decode and inference.")
+    parser.add_argument("--input-size", type=int, default=640, help="Model input size.")
+    parser.add_argument("--image-size", default="1920x1080", help="Synthetic image size, WIDTHxHEIGHT.")
+    parser.add_argument("--batch-sizes", default="1,2,4,8,16,32", help="Comma separated batch sizes.")
+    args = parser.parse_args()
+
+    run_benchmark(
+        args.backend,
+        args.model,
+        [int(b) for b in args.batch_sizes.split(",")],
+        args.images,
+        args.threads,
+        args.input_size,
+        tuple(int(v) for v in args.image_size.lower().split("x"))
+    )
@@ -0,0 +1,97 @@
+import time
+import redis
+
+# Analysis job progress lives in Redis next to the Celery broker and result backend
+DEFAULT_REDIS_URL = 'redis://localhost:6379/0'
+JOB_TTL = 7 * 24 * 3600
+
+_redis_url = DEFAULT_REDIS_URL
+_redis_client = None
+
+def configure_redis(url):
+    """Use url (ServerManager's REDIS_URL) for this process's Redis client."""
+    global _redis_url, _redis_client
+    if url != _redis_url:
+        _redis_url = url
+        _redis_client = None
+
+def get_redis():
+    """Return this process's Redis client, creating it on first use."""
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(_redis_url, decode_responses=True)
+    return _redis_client
+
+def job_key(job_id):
+    return f"analysis_job:{job_id}"
+
+def create_job(job_id, username, mission_name, total, shards):
+    """Record a new analysis job."""
+    key = job_key(job_id)
+    client = get_redis()
+    client.hset(key, mapping={
+        "username": username,
+        "mission_name": mission_name,
+        "total": total,
+        "done": 0,
+        "shards": shards,
+        "shards_done": 0,
+        "started_at": time.time()
+    })
+    client.expire(key, JOB_TTL)
+
+def add_progress(job_id, photos):
+    """Count photos committed by a shard."""
+    if job_id and photos:
+        get_redis().hincrby(job_key(job_id), "done", photos)
+
+def add_shard_done(job_id):
+    """Count a finished shard."""
+    if job_id:
+        get_redis().hincrby(job_key(job_id), "shards_done", 1)
+
+def mark_finished(job_id, remaining):
+    """Record when the job's chord callback ran and how many photos are still unanalyzed."""
+    if job_id:
+        get_redis().hset(job_key(job_id), mapping={"finished_at": time.time(), "remaining": remaining})
+
+def get_job(job_id):
+    """Return the raw job record, or None if it does not exist or has expired."""
+    job = get_redis().hgetall(job_key(job_id))
+    return job or None
+
+def describe_job(job_id, job, celery_state):
+    """Build the status payload: state, photos done/total, throughput and ETA."""
+    total = int(job.get("total", 0))
+    done = int(job.get("done", 0))
+    started_at = float(job.get("started_at", time.time()))
+    finished_at = float(job["finished_at"]) if "finished_at" in job else None
+
+    if celery_state == "FAILURE":
+        state = "FAILURE"
+    elif finished_at is not None or celery_state == "SUCCESS":
+        state = "SUCCESS"
+    elif done > 0:
+        state = "PROGRESS"
+    else:
+        state = "PENDING"
+
+    elapsed = max((finished_at or time.time()) - started_at, 1e-6)
+    throughput = done / elapsed
+    eta = None
+    if state in ("PENDING", "PROGRESS") and throughput > 0:
+        eta = round((total - done) / throughput, 1)
+
+    return {
+        "job_id": job_id,
+        "mission_name": job.get("mission_name"),
+        "state": state,
+        "photos_done": done,
+        "photos_total": total,
+        "shards_done": int(job.get("shards_done", 0)),
+        "shards_total": int(job.get("shards", 0)),
+        "elapsed": round(elapsed, 1),
+        "throughput": round(throughput, 2),
+        "eta": eta,
+        "remaining": int(job["remaining"]) if "remaining" in job else None
+    }
@@ -0,0 +1,199 @@
+import os
+import time
+import signal
+import logging
+import threading
+import subprocess
+import requests
+import urllib3
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# Bytes each slow downloader reads per step; its sleeps between steps set the download rate
+DOWNLOAD_CHUNK_SIZE = 16 * 1024
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else float('nan')
+
+def login(server_url, username, password, verify=False):
+    response = requests.post(f"{server_url}/login", json={"username": username, "password": password}, verify=verify, timeout=30)
+    response.raise_for_status()
+    return response.json()['token']
+
+def run_load(server_url, token, photo_path, api_path, downloaders=32, api_clients=4, duration=20.0,
+             download_rate=64 * 1024, verify=False, timeout=30):
+    """
+    Keep `downloaders` clients fetching photo_path at download_rate bytes/s each (a field LTE
+    link), while `api_clients` clients call api_path back to back. Returns the API clients'
+    throughput and latency percentiles, plus how much the slow downloaders received.
+    Only 200s count as measurements; 429s and other statuses are counted apart.
+    """
+    headers = {'x-access-token': token}
+    stop = threading.Event()
+    lock = threading.Lock()
+    latencies, stats = [], {"api_errors": 0, "download_bytes": 0, "downloads": 0, "download_errors": 0,
+                            "rate_limited": 0, "non_200": 0}
+
+    def count(key, amount=1):
+        with lock:
+            stats[key] += amount
+
+    def count_status(status_code):
+        count("rate_limited" if status_code == 429 else "non_200")
+
+    def slow_downloader():
+        session = requests.Session()
+        while not stop.is_set():
+            try:
+                with session.get(f"{server_url}{photo_path}", headers=headers, stream=True, verify=verify, timeout=timeout) as response:
+                    if response.status_code != 200:
+                        count_status(response.status_code)
+                        continue
+                    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        count("download_bytes", len(chunk))
+                        if stop.wait(len(chunk) / download_rate):
+                            return
+                count("downloads")
+            except requests.RequestException:
+                count("download_errors")
+
+    def api_client():
+        session = requests.Session()
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                response = session.get(f"{server_url}{api_path}", headers=headers, verify=verify, timeout=timeout)
+            except requests.RequestException:
+                count("api_errors")
+                continue
+            elapsed = time.perf_counter() - started
+            if response.status_code == 200:
+                with lock:
+                    latencies.append(elapsed)
+            else:
+                count_status(response.status_code)
+
+    threads = [threading.Thread(target=slow_downloader, daemon=True) for _ in range(downloaders)]
+    # Let the downloaders occupy the server before measuring the API
+    for thread in threads:
+        thread.start()
+    time.sleep(1)
+    api_threads = [threading.Thread(target=api_client, daemon=True) for _ in range(api_clients)]
+    started = time.perf_counter()
+    for thread in api_threads:
+        thread.start()
+    stop.wait(duration)
+    stop.set()
+    elapsed = time.perf_counter() - started
+    for thread in threads + api_threads:
+        thread.join(timeout + 1)
+
+    return {
+        "requests": len(latencies),
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+        **stats
+    }
+
+def start_server(server_manager, mode, bind, verify=False, wait=60):
+    """
+    Start gunicorn in the given serving mode on bind and wait until /ping answers. The per-IP
+    limiter is disabled, since every load client shares one address.
+    """
+    env = os.environ.copy()
+    env['SERVER_PATH'] = server_manager.SERVER_PATH
+    env['RATELIMIT_ENABLED'] = 'false'
+    proc = subprocess.Popen(server_manager.build_gunicorn_cmd(mode, bind), env=env, preexec_fn=os.setsid)
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn ({mode}) exited with code {proc.returncode}")
+        try:
+            if requests.get(f"https://{bind}/ping", verify=verify, timeout=2).status_code == 200:
+                return proc
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    stop_server(proc)
+    raise RuntimeError(f"gunicorn ({mode}) did not answer /ping within {wait}s")
+
+def stop_server(proc):
+    try:
+        os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
+        proc.wait(timeout=30)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
+
+def print_result(label, result):
+    print(f"{label:<10} {result['requests']:>8} {result['throughput']:>9.1f} {result['p50'] * 1000:>9.1f} "
+          f"{result['p99'] * 1000:>9.1f} {result['api_errors']:>7} {result['rate_limited']:>7} {result['non_200']:>7} "
+          f"{result['download_bytes'] / 2**20:>9.1f} {result['download_errors']:>7}")
+
+def check_result(label, result):
+    """Refuse a run in which the server answered anything but 200, as its numbers measure the rejections."""
+    if result['rate_limited'] or result['non_200']:
+        raise RuntimeError(f"{label}: {result['rate_limited']} responses were rate limited (429) and "
+                           f"{result['non_200']} had another non-200 status; the measurements are not valid")
+
+def compare_modes(modes, username, password, mission_name, filename, bind="127.0.0.1:5055", api_path="/missions/get_missions",
+                  server_url=None, **load_options):
+    """
+    Run the same load against each serving mode (a fresh gunicorn per mode, configured like the
+    real server) or, with server_url, against a server that is already running. Raises
+    RuntimeError if any mode saw a 429 or another non-200 response.
+    """
+    photo_path = f"/missions/{mission_name}/photos/{filename}"
+    print(f"{'mode':<10} {'requests':>8} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7} {'429':>7} {'non-200':>7} "
+          f"{'dl MiB':>9} {'dl err':>7}")
+    if server_url:
+        token = login(server_url, username, password)
+        result = run_load(server_url, token, photo_path, api_path, **load_options)
+        print_result("running", result)
+        check_result("running", result)
+        return
+
+    from server_manager import ServerManager
+    server_manager = ServerManager()
+    results = {}
+    for mode in modes:
+        proc = start_server(server_manager, mode, bind)
+        try:
+            url = f"https://{bind}"
+            results[mode] = run_load(url, login(url, username, password), photo_path, api_path, **load_options)
+            print_result(mode, results[mode])
+        finally:
+            stop_server(proc)
+    for mode, result in results.items():
+        check_result(mode, result)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare API throughput and latency across serving modes under slow downloads.")
+    parser.add_argument("--modes", default="sync,gthread,gevent", help="Comma separated serving modes to start and compare.")
+    parser.add_argument("-u", "--url", help="Measure an already running server instead of starting one per mode.")
+    parser.add_argument("--bind", default="127.0.0.1:5055", help="Address for the servers started per mode.")
+    parser.add_argument("--username", required=True, help="Account used by the load clients.")
+    parser.add_argument("--password", required=True, help="Password of that account.")
+    parser.add_argument("--mission", required=True, help="Mission holding the photo.")
+    parser.add_argument("--photo", required=True, help="Filename of the photo the slow clients download.")
+    parser.add_argument("--api-path", default="/missions/get_missions", help="Endpoint the API clients call.")
+    parser.add_argument("-n", "--downloaders", type=int, default=32, help="Concurrent slow downloaders.")
+    parser.add_argument("-c", "--api-clients", type=int, default=4, help="Concurrent API clients.")
+    parser.add_argument("-d", "--duration", type=float, default=20.0, help="Seconds to measure per mode.")
+    parser.add_argument("--rate", type=int, default=64 * 1024, help="Download rate of each slow client, bytes/s.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    try:
+        compare_modes(
+            [mode.strip() for mode in args.modes.split(",") if mode.strip()],
+            args.username, args.password, args.mission, args.photo,
+            bind=args.bind, api_path=args.api_path, server_url=args.url,
+            downloaders=args.downloaders, api_clients=args.api_clients,
+            duration=args.duration, download_rate=args.rate
+        )
+    except RuntimeError as e:
+        parser.exit(1, f"{e}\n")
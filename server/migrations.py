@@ -0,0 +1,164 @@
+from sqlalchemy import Table, Column, Integer, MetaData, inspect, text
+import logging
+from models import Base
+
+# Versioned schema migrations. Each migration upgrades the schema by one version and must be
+# safe to run against a database that already has (part of) the change applied.
+SCHEMA_VERSION_TABLE = 'schema_version'
+MIGRATIONS = []
+
+# Arbitrary key for the PostgreSQL advisory lock that serializes concurrent upgrades
+MIGRATION_LOCK_ID = 7_413_202
+
+version_metadata = MetaData()
+schema_version = Table(SCHEMA_VERSION_TABLE, version_metadata, Column('version', Integer, nullable=False))
+
+def migration(version, description):
+    """Register a migration function for the given schema version."""
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+def latest_version():
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+def get_schema_version(connection):
+    """Return the recorded schema version, or None if the database has never been versioned."""
+    if not inspect(connection).has_table(SCHEMA_VERSION_TABLE):
+        return None
+    return connection.execute(schema_version.select()).scalar()
+
+def set_schema_version(connection, version):
+    connection.execute(schema_version.delete())
+    connection.execute(schema_version.insert().values(version=version))
+
+def upgrade(engine):
+    """
+    Bring the database schema up to date. A fresh database is created from the models and
+    stamped with the latest version; an existing one runs every pending migration in order.
+    Returns the resulting schema version.
+    """
+    with engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            # Every Gunicorn worker calls this at startup; only one may migrate at a time
+            connection.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+
+        version_metadata.create_all(connection)
+        current = get_schema_version(connection)
+        if current is None:
+            if not inspect(connection).has_table('photos'):
+                Base.metadata.create_all(connection)
+                set_schema_version(connection, latest_version())
+                logging.info(f"Created database schema at version {latest_version()}")
+                return latest_version()
+            # Tables created by create_all before migrations existed
+            current = 0
+
+        for version, description, fn in MIGRATIONS:
+            if version <= current:
+                continue
+            logging.info(f"Applying schema migration {version}: {description}")
+            fn(connection)
+            set_schema_version(connection, version)
+            current = version
+
+        # Tables added to the models since the last migration
+        Base.metadata.create_all(connection)
+        return current
+
+def create_unique_constraint(connection, table, name, columns):
+    """Add a unique constraint; SQLite cannot ALTER one in, so it gets an equivalent unique index."""
+    inspector = inspect(connection)
+    existing = {c['name'] for c in inspector.get_unique_constraints(table)}
+    existing |= {i['name'] for i in inspector.get_indexes(table)}
+    if name in existing:
+        return
+    column_list = ", ".join(columns)
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text(f"CREATE UNIQUE INDEX {name} ON {table} ({column_list})"))
+    else:
+        connection.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE ({column_list})"))
+
+def create_indexes(connection, table, names):
+    """
+    Create the named model indexes of a table that do not exist yet. Migrations list their
+    indexes explicitly because the models may already describe columns added by later ones.
+    """
+    existing = {i['name'] for i in inspect(connection).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name in names and index.name not in existing:
+            index.create(connection)
+
+@migration(1, "Composite indexes and unique (username, mission_name) / (mission_id, filename)")
+def add_indexes_and_unique_constraints(connection):
+    # Merge duplicate missions into the oldest one before the unique constraint goes in
+    keep_missions = "SELECT MIN(id) FROM missions GROUP BY username, mission_name"
+    moved = connection.execute(text(f"""
+        UPDATE photos SET mission_id = (
+            SELECT MIN(m2.id) FROM missions m1
+            JOIN missions m2 ON m2.username = m1.username AND m2.mission_name = m1.mission_name
+            WHERE m1.id = photos.mission_id
+        )
+        WHERE mission_id NOT IN ({keep_missions})
+    """)).rowcount
+    dropped_missions = connection.execute(text(f"DELETE FROM missions WHERE id NOT IN ({keep_missions})")).rowcount
+
+    # Duplicate photo rows point at the same file; keep the oldest, still pending analysis if any copy was
+    keep_photos = "SELECT MIN(id) FROM photos GROUP BY mission_id, filename"
+    connection.execute(text("""
+        UPDATE photos SET is_new_image = :true
+        WHERE id IN (
+            SELECT MIN(id) FROM photos GROUP BY mission_id, filename
+            HAVING COUNT(*) > 1 AND MAX(CASE WHEN is_new_image THEN 1 ELSE 0 END) = 1
+        )
+    """), {"true": True})
+    dropped_photos = connection.execute(text(f"DELETE FROM photos WHERE id NOT IN ({keep_photos})")).rowcount
+    if moved or dropped_missions or dropped_photos:
+        logging.warning(
+            f"Merged {dropped_missions} duplicate missions ({moved} photos moved) "
+            f"and removed {dropped_photos} duplicate photo rows"
+        )
+
+    create_unique_constraint(connection, 'missions', 'uq_missions_username_mission_name', ['username', 'mission_name'])
+    create_unique_constraint(connection, 'photos', 'uq_photos_mission_id_filename', ['mission_id', 'filename'])
+    create_indexes(connection, Base.metadata.tables['photos'], {
+        'ix_photos_mission_id_is_new_image',
+        'ix_photos_username_mission_id',
+        'ix_photos_mission_id_photo_type'
+    })
+
+def add_column(connection, table, name, ddl):
+    """Add a column unless it already exists."""
+    if name not in {c['name'] for c in inspect(connection).get_columns(table)}:
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+
+@migration(2, "Photo and mission revisions for the incremental change feed")
+def add_revisions(connection):
+    add_column(connection, 'missions', 'revision', "INTEGER NOT NULL DEFAULT 0")
+    add_column(connection, 'photos', 'revision', "INTEGER NOT NULL DEFAULT 0")
+    create_indexes(connection, Base.metadata.tables['photos'], {'ix_photos_mission_id_revision_filename'})
+    # photo_deletions is a new table and is created from the models after the migrations run
+
+@migration(3, "Recorded storage paths for originals, processed images and thumbnails")
+def add_storage_paths(connection):
+    # Existing rows are filled in lazily the first time each photo is downloaded
+    add_column(connection, 'photos', 'storage_path', "VARCHAR")
+    add_column(connection, 'photos', 'processed_path', "VARCHAR")
+    add_column(connection, 'photos', 'thumbnail_sizes', "VARCHAR")
+
+@migration(4, "Content hashes of originals and processed images for the blob store")
+def add_content_hashes(connection):
+    # Photos stored before the blob store keep NULL hashes and their plain files
+    add_column(connection, 'photos', 'content_hash', "VARCHAR(64)")
+    add_column(connection, 'photos', 'processed_hash', "VARCHAR(64)")
+    create_indexes(connection, Base.metadata.tables['photos'], {
+        'ix_photos_content_hash',
+        'ix_photos_processed_hash'
+    })
+    # blobs is a new table and is created from the models after the migrations run
+
+@migration(5, "Password change time, so tokens issued before a change stop working")
+def add_password_changed_at(connection):
+    add_column(connection, 'users', 'password_changed_at', "FLOAT")
@@ -1,10 +1,15 @@
-from flask import Blueprint, request, jsonify, send_from_directory
+from flask import Blueprint, request, jsonify
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
 from auth import token_required
 import os
 import logging
 from models import Mission, Photo
+from thumbnails import ensure_thumbnail, thumbnail_path
+from storage import storage_key, absolute_path, thumbnail_key, send_stored_file
+from blobstore import release_references
+from changefeed import get_changes, next_revision, record_deletions, DEFAULT_PAGE_SIZE
 
 missions_blueprint = Blueprint('missions', __name__)
 
@@ -39,7 +44,13 @@ def create_mission(current_user):
     # Create a new mission
     mission = Mission(username=current_user, mission_name=mission_name, processed=False)
     session.add(mission)
-    session.commit()
+    try:
+        session.commit()
+    except IntegrityError:
+        # A concurrent request created the same mission first
+        session.rollback()
+        session.close()
+        return jsonify({"error": "Mission with this name already exists"}), 400
 
     # Create folder structure
     server_manager = get_server_manager()
@@ -132,41 +143,154 @@ def get_new_photos(current_user, mission_name):
     finally:
         session.close()
 
-# --- Endpoint: Download a Specific Photo ---
-@missions_blueprint.route('/missions/<mission_name>/photos/<filename>', methods=['GET'])
+# --- Endpoint: Incremental Photo Change Feed ---
+@missions_blueprint.route('/missions/<mission_name>/changes', methods=['GET'])
 @token_required
-def download_photo(current_user, mission_name, filename):
-    """Serve a specific photo to the client."""
-    if filename == "cache.json":
-        return jsonify({"error": "Photo not found"}), 404
+def get_photo_changes(current_user, mission_name):
+    """
+    Return photos added, re-uploaded, reclassified or deleted after ?since=<cursor>, one page
+    at a time. Clients store the returned cursor and keep asking while has_more is true.
+    """
+    session = get_database_session()
+    try:
+        mission = session.query(Mission).filter_by(username=current_user, mission_name=mission_name).first()
+        if not mission:
+            return jsonify({"error": "Mission not found"}), 404
+        limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+        try:
+            feed = get_changes(session, mission, request.args.get('since'), limit)
+        except ValueError:
+            return jsonify({"error": "Invalid cursor"}), 400
+        return jsonify(feed), 200
+    except Exception as e:
+        logging.error(f"Error fetching photo changes for mission {mission_name}: {e}")
+        return jsonify({"error": "Failed to fetch photo changes"}), 500
+    finally:
+        session.close()
 
+# --- Endpoint: Delete a Specific Photo ---
+@missions_blueprint.route('/missions/<mission_name>/photos/<filename>', methods=['DELETE'])
+@token_required
+def delete_photo(current_user, mission_name, filename):
+    """Delete a photo, its processed copies and thumbnails, and record it in the change feed."""
     session = get_database_session()
     try:
         mission = session.query(Mission).filter_by(username=current_user, mission_name=mission_name).first()
         if not mission:
             return jsonify({"error": "Mission not found"}), 404
+        photo = session.query(Photo).filter_by(mission_id=mission.id, filename=filename).first()
+        if not photo:
+            return jsonify({"error": "Photo not found"}), 404
+
+        # The blobs stay until garbage collection finds no other photo using them
+        release_references(session, [photo.content_hash, photo.processed_hash])
+        record_deletions(session, mission.id, [filename], next_revision(session, mission.id))
+        session.commit()
+    except Exception as e:
+        logging.error(f"Error deleting photo {filename} from mission {mission_name}: {e}")
+        session.rollback()
+        return jsonify({"error": "Failed to delete photo"}), 500
+    finally:
+        session.close()
 
-        # Paths
-        server_manager = get_server_manager()
-        uploaded_folder = os.path.join(server_manager.UPLOADED_IMAGES_PATH, current_user, mission_name)
-        processed_folder = os.path.join(server_manager.PROCESSED_IMAGES_PATH, current_user, mission_name)
+    server_manager = get_server_manager()
+    uploaded_folder = os.path.join(server_manager.UPLOADED_IMAGES_PATH, current_user, mission_name)
+    processed_folder = os.path.join(server_manager.PROCESSED_IMAGES_PATH, current_user, mission_name)
+    folders = [uploaded_folder]
+    if os.path.isdir(processed_folder):
+        folders += [entry.path for entry in os.scandir(processed_folder) if entry.is_dir()]
+    paths = [os.path.join(processed_folder, "detections", f"{filename}.json")]
+    for folder in folders:
+        paths.append(os.path.join(folder, filename))
+        paths += [thumbnail_path(folder, filename, size) for size in server_manager.THUMBNAIL_SIZES]
+    for path in paths:
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError as e:
+                logging.error(f"Failed to remove {path}: {e}")
+    return jsonify({"message": "Photo deleted"}), 200
 
-        # Serve uploaded photos
-        uploaded_path = os.path.join(uploaded_folder, filename)
-        if os.path.exists(uploaded_path):
-            return send_from_directory(uploaded_folder, filename)
+# --- Endpoint: Download a Specific Photo ---
+@missions_blueprint.route('/missions/<mission_name>/photos/<filename>', methods=['GET'])
+@token_required
+def download_photo(current_user, mission_name, filename):
+    """
+    Serve a specific photo to the client from the storage paths recorded on its row.
+    ?variant=processed returns the annotated copy instead of the original, and
+    ?size=N the N px thumbnail (N must be one of THUMBNAIL_SIZES).
+    """
+    server_manager = get_server_manager()
+    size = request.args.get('size', type=int)
+    if 'size' in request.args and size not in server_manager.THUMBNAIL_SIZES:
+        return jsonify({"error": "Unsupported size", "sizes": list(server_manager.THUMBNAIL_SIZES)}), 400
+    variant = request.args.get('variant', 'original')
+    if variant not in ('original', 'processed'):
+        return jsonify({"error": "Unsupported variant"}), 400
 
-        # Serve processed photos
-        for photo_type in ["Crack", "Spall", "Corrosion"]:
-            type_folder = os.path.join(processed_folder, photo_type)
-            processed_path = os.path.join(type_folder, filename)
-            if os.path.exists(processed_path):
-                return send_from_directory(type_folder, filename)
+    session = get_database_session()
+    try:
+        # One indexed lookup through uq_missions_username_mission_name and uq_photos_mission_id_filename
+        photo = session.query(Photo).join(Mission, Photo.mission_id == Mission.id).filter(
+            Mission.username == current_user,
+            Mission.mission_name == mission_name,
+            Photo.filename == filename
+        ).first()
+        if not photo:
+            return jsonify({"error": "Photo not found"}), 404
+        if photo.storage_path is None and photo.processed_path is None:
+            locate_legacy_photo(session, photo, current_user, mission_name)
 
-        return jsonify({"error": "Photo not found"}), 404
+        if variant == 'original' and photo.storage_path:
+            root, key = server_manager.UPLOADED_IMAGES_PATH, photo.storage_path
+            accel_prefix = server_manager.X_ACCEL_UPLOADED_PREFIX
+        elif photo.processed_path:
+            root, key = server_manager.PROCESSED_IMAGES_PATH, photo.processed_path
+            accel_prefix = server_manager.X_ACCEL_PROCESSED_PREFIX
+        else:
+            return jsonify({"error": "Photo not found"}), 404
+
+        if size is not None:
+            recorded = (photo.thumbnail_sizes or "").split(",") if key == photo.storage_path else []
+            if str(size) not in recorded:
+                # Thumbnail missing from the row: build (or refresh) it now and record it for originals
+                folder, _, name = absolute_path(root, key).rpartition(os.sep)
+                if ensure_thumbnail(folder, name, size, server_manager.THUMBNAIL_SIZES) is None:
+                    return jsonify({"error": "Failed to create thumbnail"}), 500
+                if key == photo.storage_path:
+                    photo.thumbnail_sizes = ",".join(str(s) for s in server_manager.THUMBNAIL_SIZES)
+                    session.commit()
+            try:
+                return send_stored_file(root, thumbnail_key(key, size), server_manager.SENDFILE_MODE, accel_prefix)
+            except FileNotFoundError:
+                # Recorded on the row but deleted since: rebuild it from the original and retry once
+                folder, _, name = absolute_path(root, key).rpartition(os.sep)
+                if not os.path.exists(os.path.join(folder, name)):
+                    raise
+                logging.warning(f"Thumbnail {size} of {filename} in mission {mission_name} is missing; regenerating")
+                if ensure_thumbnail(folder, name, size, server_manager.THUMBNAIL_SIZES) is None:
+                    return jsonify({"error": "Failed to create thumbnail"}), 500
+                return send_stored_file(root, thumbnail_key(key, size), server_manager.SENDFILE_MODE, accel_prefix)
 
+        return send_stored_file(root, key, server_manager.SENDFILE_MODE, accel_prefix)
+
+    except FileNotFoundError:
+        logging.error(f"Stored file for photo {filename} in mission {mission_name} is missing")
+        return jsonify({"error": "Photo not found"}), 404
     except Exception as e:
         logging.error(f"Error while serving photo {filename}: {e}")
         return jsonify({"error": "Failed to serve photo"}), 500
     finally:
         session.close()
+
+def locate_legacy_photo(session, photo, username, mission_name):
+    """Find the files of a photo stored before paths were recorded, and record them on its row."""
+    server_manager = get_server_manager()
+    if os.path.exists(os.path.join(server_manager.UPLOADED_IMAGES_PATH, username, mission_name, photo.filename)):
+        photo.storage_path = storage_key(username, mission_name, photo.filename)
+    if photo.photo_type:
+        key = storage_key(username, mission_name, photo.photo_type, photo.filename)
+        if os.path.exists(absolute_path(server_manager.PROCESSED_IMAGES_PATH, key)):
+            photo.processed_path = key
+    if photo.storage_path or photo.processed_path:
+        session.commit()
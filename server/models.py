@@ -1,18 +1,65 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Float, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship
 
 Base = declarative_base()
 
 class Photo(Base):
     __tablename__ = 'photos'
+    __table_args__ = (
+        # One row per file in a mission; also serves lookups by mission_id alone
+        UniqueConstraint('mission_id', 'filename', name='uq_photos_mission_id_filename'),
+        # Analysis queries: new photos of a mission
+        Index('ix_photos_mission_id_is_new_image', 'mission_id', 'is_new_image'),
+        # Photo listings and photo type lookups
+        Index('ix_photos_username_mission_id', 'username', 'mission_id'),
+        Index('ix_photos_mission_id_photo_type', 'mission_id', 'photo_type'),
+        # Change feed: photos changed since a (revision, filename) cursor
+        Index('ix_photos_mission_id_revision_filename', 'mission_id', 'revision', 'filename'),
+    )
     id = Column(Integer, primary_key=True)
     username = Column(String, nullable=False)
-    mission_id = Column(Integer, ForeignKey('missions.id'), nullable=False)  
+    mission_id = Column(Integer, ForeignKey('missions.id'), nullable=False)
     filename = Column(String, nullable=False)
     photo_type = Column(String)
     latitude = Column(Float)
     longitude = Column(Float)
     is_new_image = Column(Boolean, default=True)
+    # Mission revision at which this row last changed (upload, re-upload or reclassification)
+    revision = Column(Integer, nullable=False, default=0, server_default='0')
+    # Storage keys recorded at write time: original under UPLOADED_IMAGES_PATH, annotated copy
+    # under PROCESSED_IMAGES_PATH; thumbnails live in .thumbs/<size>/ next to each of them
+    storage_path = Column(String)
+    processed_path = Column(String)
+    # Comma-separated thumbnail sizes generated for the original, e.g. "200,800"
+    thumbnail_sizes = Column(String)
+    # SHA-256 of the original and the annotated image in the blob store; the files at
+    # storage_path / processed_path are hard links (or copies) of those blobs
+    content_hash = Column(String(64), index=True)
+    processed_hash = Column(String(64), index=True)
+
+    mission = relationship('Mission', back_populates='photos')
+
+class PhotoDeletion(Base):
+    """Tombstone so clients following the change feed learn about removed photos."""
+    __tablename__ = 'photo_deletions'
+    __table_args__ = (
+        UniqueConstraint('mission_id', 'filename', name='uq_photo_deletions_mission_id_filename'),
+        Index('ix_photo_deletions_mission_id_revision_filename', 'mission_id', 'revision', 'filename'),
+    )
+    id = Column(Integer, primary_key=True)
+    mission_id = Column(Integer, ForeignKey('missions.id'), nullable=False)
+    filename = Column(String, nullable=False)
+    revision = Column(Integer, nullable=False)
+
+class Blob(Base):
+    """Reference count of a content-addressed blob; unreferenced blobs are garbage collected."""
+    __tablename__ = 'blobs'
+    digest = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    refcount = Column(Integer, nullable=False, default=0)
+    # time.time() of the last reference change; gives in-flight uploads a grace period
+    updated_at = Column(Float, nullable=False)
 
 class User(Base):
     __tablename__ = 'users'
@@ -20,12 +67,21 @@ class User(Base):
     username = Column(String, unique=True, nullable=False)
     password_hash = Column(String, nullable=False)
     profile = Column(String, default='Client User')
+    # time.time() of the last password change; tokens issued before it are rejected
+    password_changed_at = Column(Float)
 
 # --- New Mission Model ---
 class Mission(Base):
     __tablename__ = 'missions'
+    __table_args__ = (
+        # Every mission lookup filters on (username, mission_name)
+        UniqueConstraint('username', 'mission_name', name='uq_missions_username_mission_name'),
+    )
     id = Column(Integer, primary_key=True)
     username = Column(String, nullable=False)
     mission_name = Column(String, nullable=False)
     processed = Column(Boolean, default=False)
+    # Bumped once per transaction that changes the mission's photos
+    revision = Column(Integer, nullable=False, default=0, server_default='0')
 
+    photos = relationship('Photo', back_populates='mission', lazy='dynamic')
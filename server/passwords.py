@@ -0,0 +1,217 @@
+import os
+import time
+import uuid
+import logging
+import threading
+import bcrypt
+import redis
+from jobs import get_redis
+from executors import create_executor
+
+# Seconds a slot may be held before it is presumed leaked by a crashed worker
+BCRYPT_SLOT_TTL = 30
+
+HASHING_SLOTS_KEY = "auth:hashing_slots"
+
+class HasherBusy(Exception):
+    """Password hashing is saturated; the request should be retried shortly."""
+
+class HashingSlots:
+    """
+    Server-wide counting semaphore in Redis (a sorted set of holders scored by acquisition time).
+    Slots left behind by a crashed worker expire after BCRYPT_SLOT_TTL seconds.
+    """
+
+    def __init__(self, limit, key=HASHING_SLOTS_KEY, ttl=BCRYPT_SLOT_TTL):
+        self.limit = limit
+        self.key = key
+        self.ttl = ttl
+
+    def acquire(self):
+        """Return a holder id, or None if every slot is taken."""
+        holder = uuid.uuid4().hex
+        now = time.time()
+        try:
+            pipe = get_redis().pipeline()
+            pipe.zremrangebyscore(self.key, '-inf', now - self.ttl)
+            pipe.zadd(self.key, {holder: now})
+            pipe.zrank(self.key, holder)
+            pipe.expire(self.key, self.ttl)
+            _, _, rank, _ = pipe.execute()
+        except redis.RedisError as e:
+            # Without Redis only the per-process bound applies
+            logging.error(f"Could not acquire a hashing slot: {e}")
+            return holder
+        if rank is None or rank >= self.limit:
+            self.release(holder)
+            return None
+        return holder
+
+    def release(self, holder):
+        try:
+            get_redis().zrem(self.key, holder)
+        except redis.RedisError as e:
+            logging.error(f"Could not release hashing slot {holder}: {e}")
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small bounded thread pool instead of inline in request handlers.
+    A call that finds the pool full, or every server-wide slot taken, raises HasherBusy at
+    once instead of queueing, so a login storm turns into quick 503s rather than stalled workers.
+    """
+
+    def __init__(self, rounds=12, workers=1, max_pending=2, slots=None):
+        self.rounds = rounds
+        self.max_pending = max_pending
+        self.slots = slots
+        self._executor = create_executor(workers, "bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def _run(self, fn):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise HasherBusy()
+            self._pending += 1
+        holder = None
+        try:
+            if self.slots is not None:
+                holder = self.slots.acquire()
+                if holder is None:
+                    raise HasherBusy()
+            return self._executor.submit(fn).result()
+        finally:
+            if holder is not None:
+                self.slots.release(holder)
+            with self._lock:
+                self._pending -= 1
+
+    def hash(self, password):
+        """Return a bcrypt hash of password at the configured cost."""
+        return self._run(
+            lambda: bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds)).decode('utf-8')
+        )
+
+    def verify(self, password, password_hash):
+        return self._run(lambda: bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8')))
+
+    def needs_rehash(self, password_hash):
+        """True if password_hash was made with a cost other than the configured one."""
+        try:
+            return int(password_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+_password_hasher = None
+_password_hasher_pid = None
+
+def get_password_hasher(server_manager):
+    """Return this worker's PasswordHasher, creating a fresh pool after fork."""
+    global _password_hasher, _password_hasher_pid
+    if _password_hasher is None or _password_hasher_pid != os.getpid():
+        _password_hasher = PasswordHasher(server_manager.BCRYPT_ROUNDS, server_manager.BCRYPT_WORKERS,
+                                          server_manager.BCRYPT_MAX_PENDING,
+                                          slots=HashingSlots(server_manager.BCRYPT_MAX_CONCURRENT))
+        _password_hasher_pid = os.getpid()
+    return _password_hasher
+
+def run_benchmark(server_url, username, password, mission_name, filename, logins=16, duration=10.0, verify=False,
+                  bind="127.0.0.1:5055"):
+    """
+    Report photo-serving latency on its own and during a storm of concurrent logins, plus how
+    the logins were answered. Without server_url a server is started on bind with the per-IP
+    limiter disabled, so the storm measures the bcrypt gate (503) rather than the limiter (429).
+    Raises RuntimeError if any request was rate limited or a photo was not served.
+    """
+    if server_url is None:
+        from server_manager import ServerManager
+        from loadtest import start_server, stop_server
+        server_manager = ServerManager()
+        proc = start_server(server_manager, server_manager.SERVING_MODE, bind, verify)
+        try:
+            return run_benchmark(f"https://{bind}", username, password, mission_name, filename, logins, duration, verify)
+        finally:
+            stop_server(proc)
+
+    import requests
+    from collections import Counter
+    from loadtest import login, percentile
+
+    session = requests.Session()
+    headers = {'x-access-token': login(server_url, username, password, verify)}
+    photo_url = f"{server_url}/missions/{mission_name}/photos/{filename}"
+    # Only 200s are latency samples; any other photo status is counted here
+    photo_statuses = Counter()
+
+    def sample(seconds):
+        latencies = []
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = session.get(photo_url, headers=headers, verify=verify, timeout=30)
+            response.content
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                photo_statuses[response.status_code] += 1
+        return latencies
+
+    def report(label, latencies):
+        print(f"{label:<14} requests={len(latencies):>5}  p50={percentile(latencies, 0.5) * 1000:7.1f}ms  "
+              f"p95={percentile(latencies, 0.95) * 1000:7.1f}ms  max={max(latencies, default=0) * 1000:7.1f}ms")
+
+    report("photos alone", sample(duration / 2))
+
+    stop = threading.Event()
+    statuses = Counter()
+    statuses_lock = threading.Lock()
+
+    def storm():
+        storm_session = requests.Session()
+        while not stop.is_set():
+            try:
+                r = storm_session.post(f"{server_url}/login", json={"username": username, "password": password}, verify=verify, timeout=30)
+                status = r.status_code
+            except requests.RequestException:
+                status = 'error'
+            with statuses_lock:
+                statuses[status] += 1
+
+    threads = [threading.Thread(target=storm, daemon=True) for _ in range(logins)]
+    for thread in threads:
+        thread.start()
+    try:
+        report("during storm", sample(duration))
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    others = {status: count for status, count in statuses.items() if status not in (200, 503, 429)}
+    print(f"logins ({logins} concurrent): ok={statuses[200]}  shed (503)={statuses[503]}  rate limited (429)={statuses[429]}"
+          + "".join(f"  {status}={count}" for status, count in sorted(others.items(), key=str)))
+    if photo_statuses:
+        print("photos not served: " + ", ".join(f"{status}: {count}" for status, count in sorted(photo_statuses.items())))
+    if statuses[429] or photo_statuses:
+        raise RuntimeError(f"{statuses[429]} logins were rate limited and {sum(photo_statuses.values())} photo requests "
+                           f"were not served; disable the limiter (RATELIMIT_ENABLED=false) for a valid measurement")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark photo latency during a login storm.")
+    parser.add_argument("-u", "--url", help="Measure an already running server instead of starting one without the rate limiter.")
+    parser.add_argument("--bind", default="127.0.0.1:5055", help="Address for the server started for the benchmark.")
+    parser.add_argument("--username", required=True, help="Account used for logging in.")
+    parser.add_argument("--password", required=True, help="Password of that account.")
+    parser.add_argument("--mission", required=True, help="Mission holding the photo.")
+    parser.add_argument("--photo", required=True, help="Filename of the photo to fetch repeatedly.")
+    parser.add_argument("-c", "--logins", type=int, default=16, help="Concurrent login clients.")
+    parser.add_argument("-d", "--duration", type=float, default=10.0, help="Seconds of photo requests during the storm.")
+    parser.add_argument("--cert", help="CA bundle or server certificate to verify TLS with (not verified by default).")
+    args = parser.parse_args()
+
+    try:
+        run_benchmark(args.url, args.username, args.password, args.mission, args.photo,
+                      args.logins, args.duration, verify=args.cert or False, bind=args.bind)
+    except RuntimeError as e:
+        parser.exit(1, f"{e}\n")
@@ -1,14 +1,26 @@
 from flask import Blueprint, request, jsonify, send_from_directory
 from werkzeug.utils import secure_filename
+from werkzeug.sansio.multipart import MultipartDecoder, NeedData, File, Data, Epilogue
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine
 from auth import token_required
 from models import Photo, Mission
+from analysis import queue_thumbnails
+from changefeed import next_revision
+from storage import storage_key
+from thumbnails import remove_thumbnails
+from blobstore import add_references, release_references
 import os
+import hashlib
 import logging
 
 photos_blueprint = Blueprint('photos', __name__)
 
+# Bytes read from the request stream per iteration when streaming uploads
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Content hashes a client may ask about in one request
+MAX_HASH_LOOKUP = 5000
+
 def get_server_manager():
     """Retrieve the server manager instance attached to the blueprint."""
     server_manager = getattr(photos_blueprint, 'server_manager', None)
@@ -43,19 +55,17 @@ def upload_images(current_user, mission_name):
     os.makedirs(user_upload_folder, exist_ok=True)
 
     try:
+        blob_store = server_manager.get_blob_store()
+        stored = {}
         for image in images:
             filename = secure_filename(image.filename)
-            image_path = os.path.join(user_upload_folder, filename)
-            image.save(image_path)
-            photo = Photo(
-                username=current_user,
-                mission_id=mission.id,
-                filename=filename,
-                is_new_image=True
-            )
-            session.add(photo)
+            tmp_path = os.path.join(user_upload_folder, f".{filename}.part")
+            image.save(tmp_path)
+            stored[filename] = store_original(blob_store, tmp_path, os.path.join(user_upload_folder, filename))
 
+        changed = record_uploaded_photos(session, mission, current_user, mission_name, stored, user_upload_folder)
         session.commit()
+        queue_thumbnails(current_user, mission_name, changed)
         return jsonify({"message": "Images uploaded successfully"}), 200
     except Exception as e:
         logging.error(f"Error uploading images for mission {mission_name}: {e}")
@@ -63,3 +73,240 @@ def upload_images(current_user, mission_name):
         return jsonify({"error": "Failed to upload images"}), 500
     finally:
         session.close()
+
+@photos_blueprint.route('/missions/<mission_name>/upload_images/stream', methods=['POST'])
+@token_required
+def upload_images_stream(current_user, mission_name):
+    """
+    Stream a multipart upload straight to disk, one part at a time.
+    Each file is reported individually so a failed part does not discard the rest.
+    """
+    boundary = request.mimetype_params.get('boundary')
+    if request.mimetype != 'multipart/form-data' or not boundary:
+        return jsonify({"error": "Expected a multipart/form-data body"}), 400
+
+    session = get_database_session()
+    try:
+        mission = session.query(Mission).filter_by(username=current_user, mission_name=mission_name).first()
+        if not mission:
+            return jsonify({"error": "Mission not found"}), 404
+
+        server_manager = get_server_manager()
+        user_upload_folder = os.path.join(server_manager.UPLOADED_IMAGES_PATH, current_user, mission_name)
+        os.makedirs(user_upload_folder, exist_ok=True)
+
+        results = stream_multipart_to_disk(
+            request.stream, boundary.encode('latin-1'), user_upload_folder,
+            blob_store=server_manager.get_blob_store()
+        )
+        stored = {r['filename']: (r['sha256'], r['size']) for r in results if r['status'] == 'uploaded'}
+        saved = [r['filename'] for r in results if r['status'] == 'uploaded']
+
+        if stored:
+            changed = record_uploaded_photos(session, mission, current_user, mission_name, stored, user_upload_folder)
+            session.commit()
+            queue_thumbnails(current_user, mission_name, changed)
+
+        failed = [r for r in results if r['status'] != 'uploaded']
+        if not results:
+            return jsonify({"error": "No images provided"}), 400
+        if failed:
+            return jsonify({"message": f"{len(saved)} of {len(results)} images uploaded", "results": results}), 207
+        return jsonify({"message": "Images uploaded successfully", "results": results}), 200
+    except Exception as e:
+        logging.error(f"Error streaming images for mission {mission_name}: {e}")
+        session.rollback()
+        return jsonify({"error": "Failed to upload images"}), 500
+    finally:
+        session.close()
+
+@photos_blueprint.route('/missions/<mission_name>/hashes', methods=['POST'])
+@token_required
+def lookup_hashes(current_user, mission_name):
+    """
+    Report which of the given SHA-256 content hashes the mission already has, so a client
+    only uploads missing content. Body: {"hashes": [...]}; answers {"present": [...]}.
+    """
+    data = request.get_json(silent=True) or {}
+    hashes = data.get('hashes')
+    if not isinstance(hashes, list) or not all(isinstance(h, str) for h in hashes):
+        return jsonify({"error": "A list of hashes is required"}), 400
+    if len(hashes) > MAX_HASH_LOOKUP:
+        return jsonify({"error": f"At most {MAX_HASH_LOOKUP} hashes per request"}), 400
+    hashes = list({h.lower() for h in hashes})
+
+    session = get_database_session()
+    try:
+        mission = session.query(Mission).filter_by(username=current_user, mission_name=mission_name).first()
+        if not mission:
+            return jsonify({"error": "Mission not found"}), 404
+        present = [
+            row[0] for row in session.query(Photo.content_hash).filter(
+                Photo.mission_id == mission.id,
+                Photo.content_hash.in_(hashes)
+            ).distinct()
+        ] if hashes else []
+        return jsonify({"present": present}), 200
+    finally:
+        session.close()
+
+def store_original(blob_store, tmp_path, final_path, digest=None):
+    """
+    Move a completed upload into the blob store and place the blob at final_path.
+    Identical content already in the store is kept once. Returns (digest, size).
+    """
+    size = os.path.getsize(tmp_path)
+    digest = blob_store.put_file(tmp_path, digest)
+    blob_store.place(digest, final_path)
+    return digest, size
+
+def record_uploaded_photos(session, mission, username, mission_name, stored, upload_folder):
+    """
+    Insert or update the rows of freshly stored originals in upload_folder; stored maps filename
+    to (digest, size). A re-upload with the same content changes nothing, a different one replaces
+    the original, needs analysing again, loses its thumbnails and releases its previous blob.
+    Returns the filenames that changed.
+    """
+    existing = {
+        row.filename: row for row in session.query(Photo.id, Photo.filename, Photo.content_hash).filter(
+            Photo.mission_id == mission.id,
+            Photo.filename.in_(list(stored))
+        )
+    }
+    changed = [f for f in stored if f not in existing or existing[f].content_hash != stored[f][0]]
+    if not changed:
+        return []
+
+    revision = next_revision(session, mission.id)
+    new_rows = [
+        {"username": username, "mission_id": mission.id, "filename": filename, "is_new_image": True,
+         "revision": revision, "storage_path": storage_key(username, mission_name, filename),
+         "content_hash": stored[filename][0]}
+        for filename in changed if filename not in existing
+    ]
+    if new_rows:
+        session.bulk_insert_mappings(Photo, new_rows)
+    replaced = [existing[filename] for filename in changed if filename in existing]
+    if replaced:
+        session.bulk_update_mappings(Photo, [
+            {"id": row.id, "is_new_image": True, "revision": revision,
+             "storage_path": storage_key(username, mission_name, row.filename),
+             "thumbnail_sizes": None, "content_hash": stored[row.filename][0]}
+            for row in replaced
+        ])
+        release_references(session, [row.content_hash for row in replaced])
+        # The new original may be an older blob, with an mtime before these thumbnails
+        for row in replaced:
+            remove_thumbnails(upload_folder, row.filename)
+    add_references(session, [stored[filename] for filename in changed])
+    return changed
+
+def stream_multipart_to_disk(stream, boundary, upload_folder, field_name='images', blob_store=None):
+    """
+    Parse a multipart body incrementally and write each file part to upload_folder.
+    Parts are written to a hidden temporary file, hashed on the way, and renamed into place
+    (or, with a blob_store, stored by content and placed) once complete.
+    Returns a list of {"filename", "status", "sha256"?, "size"?, "error"?} dicts, one per file part.
+    """
+    decoder = MultipartDecoder(boundary)
+    results = []
+    current = None
+    eof = False
+
+    while True:
+        try:
+            event = decoder.next_event()
+        except ValueError as e:
+            # Truncated or malformed body; keep whatever completed before it
+            if current:
+                _abort_part(current, results, f"Upload interrupted: {e}")
+            break
+
+        if isinstance(event, NeedData):
+            if eof:
+                if current:
+                    _abort_part(current, results, "Upload interrupted")
+                break
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                eof = True
+                decoder.receive_data(None)
+            else:
+                decoder.receive_data(chunk)
+        elif isinstance(event, File):
+            current = _open_part(event, upload_folder, field_name)
+        elif isinstance(event, Data):
+            if current is not None:
+                if current['fh'] is not None:
+                    try:
+                        current['fh'].write(event.data)
+                        current['hash'].update(event.data)
+                        current['size'] += len(event.data)
+                    except OSError as e:
+                        _discard_part_file(current)
+                        current['error'] = str(e)
+                if not event.more_data:
+                    _finish_part(current, results, blob_store)
+                    current = None
+        elif isinstance(event, Epilogue):
+            break
+        else:
+            # Preamble and non-file form fields are not needed here
+            current = None
+
+    return results
+
+def _open_part(event, upload_folder, field_name):
+    """Open the temporary file for a new file part, or mark it as rejected."""
+    if event.name != field_name:
+        return None
+    filename = secure_filename(event.filename or '')
+    part = {"filename": filename, "fh": None, "tmp_path": None, "error": None, "hash": hashlib.sha256(), "size": 0}
+    if not filename:
+        part['error'] = "Invalid filename"
+        return part
+    part['tmp_path'] = os.path.join(upload_folder, f".{filename}.part")
+    try:
+        part['fh'] = open(part['tmp_path'], 'wb')
+    except OSError as e:
+        part['error'] = str(e)
+    return part
+
+def _finish_part(part, results, blob_store=None):
+    """Move a completed part into its final location and record the outcome."""
+    if part['error'] is None and part['fh'] is not None:
+        try:
+            part['fh'].close()
+            final_path = os.path.join(os.path.dirname(part['tmp_path']), part['filename'])
+            digest = part['hash'].hexdigest()
+            if blob_store is not None:
+                store_original(blob_store, part['tmp_path'], final_path, digest)
+            else:
+                os.replace(part['tmp_path'], final_path)
+            results.append({"filename": part['filename'], "status": "uploaded", "sha256": digest, "size": part['size']})
+            return
+        except OSError as e:
+            part['error'] = str(e)
+    _discard_part_file(part)
+    logging.error(f"Failed to store uploaded image {part['filename']}: {part['error']}")
+    results.append({"filename": part['filename'], "status": "failed", "error": part['error']})
+
+def _abort_part(part, results, reason):
+    """Drop a part whose data never finished arriving."""
+    part['error'] = part['error'] or reason
+    _discard_part_file(part)
+    _finish_part(part, results)
+
+def _discard_part_file(part):
+    """Close and delete a part's temporary file."""
+    if part['fh'] is not None:
+        try:
+            part['fh'].close()
+        except OSError:
+            pass
+        part['fh'] = None
+    if part['tmp_path'] and os.path.exists(part['tmp_path']):
+        try:
+            os.remove(part['tmp_path'])
+        except OSError:
+            pass
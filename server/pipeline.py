@@ -0,0 +1,170 @@
+import time
+import queue
+import logging
+import threading
+
+# End-of-stream marker passed between stages
+_DONE = object()
+
+class StageStats:
+    """Items processed and busy time for one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.errors = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, count, seconds, error=False):
+        with self._lock:
+            self.items += count
+            self.busy += seconds
+            if error:
+                self.errors += 1
+
+    def as_dict(self):
+        return {"items": self.items, "errors": self.errors, "busy_seconds": round(self.busy, 3)}
+
+class AnalysisPipeline:
+    """
+    Streams images through decode -> infer -> write -> commit stages connected by bounded queues,
+    so disk I/O, CPU inference and database writes overlap and a mission finishes close to the
+    speed of its slowest stage.
+    """
+
+    def __init__(self, engine, readers=2, writers=2, queue_size=16, db_batch_size=100, batch_timeout=0.05):
+        self.engine = engine
+        self.readers = max(1, readers)
+        self.writers = max(1, writers)
+        self.queue_size = max(1, queue_size)
+        self.db_batch_size = max(1, db_batch_size)
+        self.batch_timeout = batch_timeout
+
+    def run(self, items, write_fn, commit_fn):
+        """
+        Process (key, path) items.
+        write_fn(key, result) runs on the writer pool and returns a database update (or None).
+        commit_fn(updates) runs on the calling thread with batches of at most db_batch_size updates.
+        Returns per-stage statistics.
+        """
+        stats = {name: StageStats(name) for name in ("decode", "infer", "write", "commit")}
+        input_queue = queue.Queue()
+        decoded_queue = queue.Queue(maxsize=self.queue_size)
+        result_queue = queue.Queue(maxsize=self.queue_size)
+        update_queue = queue.Queue(maxsize=self.queue_size * 4)
+
+        for item in items:
+            input_queue.put(item)
+        for _ in range(self.readers):
+            input_queue.put(_DONE)
+
+        aborted = threading.Event()
+        readers_left = [self.readers]
+        writers_left = [self.writers]
+        counter_lock = threading.Lock()
+
+        def finish_worker(counter, out_queue, sentinels):
+            """The last worker of a stage tells the next stage the stream has ended."""
+            with counter_lock:
+                counter[0] -= 1
+                last = counter[0] == 0
+            if last:
+                for _ in range(sentinels):
+                    out_queue.put(_DONE)
+
+        def reader():
+            while True:
+                item = input_queue.get()
+                if item is _DONE or aborted.is_set():
+                    break
+                key, path = item
+                started = time.perf_counter()
+                try:
+                    loaded = self.engine.load(path)
+                    stats["decode"].record(1, time.perf_counter() - started)
+                    decoded_queue.put((key, path, loaded))
+                except Exception as e:
+                    stats["decode"].record(0, time.perf_counter() - started, error=True)
+                    logging.error(f"Failed to decode image {path}: {e}")
+            finish_worker(readers_left, decoded_queue, 1)
+
+        def inferrer():
+            done = False
+            while not done:
+                item = decoded_queue.get()
+                if item is _DONE:
+                    break
+                batch = [item]
+                # Fill the batch with whatever else is decoded, without stalling on slow readers
+                deadline = time.monotonic() + self.batch_timeout
+                while len(batch) < self.engine.batch_size:
+                    try:
+                        item = decoded_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is _DONE:
+                        done = True
+                        break
+                    batch.append(item)
+
+                started = time.perf_counter()
+                try:
+                    results = self.engine.infer_loaded([(path, loaded) for _, path, loaded in batch])
+                    stats["infer"].record(len(batch), time.perf_counter() - started)
+                    for (key, _, _), result in zip(batch, results):
+                        result_queue.put((key, result))
+                except Exception as e:
+                    stats["infer"].record(0, time.perf_counter() - started, error=True)
+                    logging.error(f"Inference failed for a batch of {len(batch)} images: {e}")
+            for _ in range(self.writers):
+                result_queue.put(_DONE)
+
+        def writer():
+            while True:
+                item = result_queue.get()
+                if item is _DONE:
+                    break
+                key, result = item
+                started = time.perf_counter()
+                try:
+                    update = write_fn(key, result)
+                    stats["write"].record(1, time.perf_counter() - started)
+                    if update is not None:
+                        update_queue.put(update)
+                except Exception as e:
+                    stats["write"].record(0, time.perf_counter() - started, error=True)
+                    logging.error(f"Failed to write analysis output for {result.path}: {e}")
+            finish_worker(writers_left, update_queue, 1)
+
+        threads = [threading.Thread(target=reader, name=f"analysis-decode-{i}", daemon=True) for i in range(self.readers)]
+        threads.append(threading.Thread(target=inferrer, name="analysis-infer", daemon=True))
+        threads += [threading.Thread(target=writer, name=f"analysis-write-{i}", daemon=True) for i in range(self.writers)]
+        for thread in threads:
+            thread.start()
+
+        # The calling thread owns the database session, so it runs the commit stage
+        pending = []
+        failure = None
+        while True:
+            update = update_queue.get()
+            if update is not _DONE and failure is None:
+                pending.append(update)
+            if pending and (update is _DONE or len(pending) >= self.db_batch_size):
+                started = time.perf_counter()
+                try:
+                    commit_fn(pending)
+                    stats["commit"].record(len(pending), time.perf_counter() - started)
+                except Exception as e:
+                    # Stop feeding new images and drain what is already in flight
+                    failure = e
+                    aborted.set()
+                pending = []
+            if update is _DONE:
+                break
+
+        for thread in threads:
+            thread.join()
+        if failure is not None:
+            raise failure
+        return {name: stage.as_dict() for name, stage in stats.items()}
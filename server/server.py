@@ -10,6 +10,7 @@ from analysis import analysis_blueprint
 from auth import auth_blueprint
 from missions import missions_blueprint
 from photos import photos_blueprint
+from uploads import uploads_blueprint
 
 # Ensure the current directory is in the sys.path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -25,12 +26,14 @@ analysis_blueprint.server_manager = server_manager
 auth_blueprint.server_manager = server_manager
 missions_blueprint.server_manager = server_manager
 photos_blueprint.server_manager = server_manager
+uploads_blueprint.server_manager = server_manager
 
 # Register blueprints
 app.register_blueprint(analysis_blueprint)
 app.register_blueprint(auth_blueprint)
 app.register_blueprint(missions_blueprint)
 app.register_blueprint(photos_blueprint)
+app.register_blueprint(uploads_blueprint)
 
 if __name__ == "__main__":
     # Parse arguments for configuration and runtime options
@@ -65,6 +68,8 @@ if __name__ == "__main__":
     # Set up signal handlers for clean shutdown
     signal.signal(signal.SIGINT, server_manager.handle_signal)
     signal.signal(signal.SIGTERM, server_manager.handle_signal)
+    # kill -HUP reloads the API workers one by one and restarts Celery gracefully
+    signal.signal(signal.SIGHUP, server_manager.reload_processes)
 
     # Start and monitor server processes
     server_manager.start_processes(run_gui=args.run_gui)
@@ -1,33 +1,78 @@
 import os
 import signal
-import subprocess
 import sys
-import time
 import logging
+import importlib.util
+import socket
+import requests
+import urllib3
 from urllib.parse import urlparse
 from flask import Flask, jsonify
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, scoped_session
 from dotenv import load_dotenv
 import warnings
 
-from auth import auth_blueprint
+from auth import auth_blueprint, token_required
 from photos import photos_blueprint
-from analysis import analysis_blueprint
+from analysis import analysis_blueprint, configure_celery
+from jobs import configure_redis
 from database import init_db
+from thumbnails import parse_sizes
+from storage import SENDFILE_MODES
+from supervisor import Supervisor, ChildProcess, EventLog
+from health import get_health_monitor
 
 warnings.filterwarnings("ignore", category=UserWarning)
+# The liveness probe calls our own self-signed endpoint
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# Gunicorn worker classes: sync (one request per process), gthread (a thread per request)
+# and gevent (greenlets; needs the gevent package, and psycogreen with PostgreSQL)
+SERVING_MODES = ("sync", "gthread", "gevent")
+
+def default_web_workers(mode, cpu_count=None):
+    """Gunicorn worker processes for a serving mode, derived from the CPU count."""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    if mode == "sync":
+        # Gunicorn's rule of thumb: requests block their process, so oversubscribe the CPUs
+        return 2 * cpu_count + 1
+    # Threads or greenlets absorb the waiting; one process per CPU uses the cores
+    return max(2, cpu_count)
+
+def default_web_threads(cpu_count=None):
+    """Request threads per gthread worker, derived from the CPU count."""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    return max(4, 2 * cpu_count)
+
+def patch_psycopg_for_gevent(database_url):
+    """Make psycopg2 yield to other greenlets while waiting on PostgreSQL (gevent mode)."""
+    monkey = sys.modules.get("gevent.monkey")
+    if monkey is None or not monkey.is_module_patched("socket") or not database_url.startswith("postgres"):
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        logging.warning("psycogreen is not installed; database queries will block gevent workers")
+        return
+    patch_psycopg()
 
 class ServerManager:
-    def __init__(self):
-        """Initialize server manager and load configurations."""
-        self.ENV_PATH = os.path.join(os.path.dirname(__file__), 'conf', '.env')
+    def __init__(self, env_path=None):
+        """Initialize server manager and load configurations (from conf/.env unless env_path is given)."""
+        self.ENV_PATH = env_path or os.path.join(os.path.dirname(__file__), 'conf', '.env')
         self._load_and_validate_env()
+        # Modules imported before .env was loaded (such as analysis.celery) take Redis from here
+        configure_redis(self.REDIS_URL)
+        configure_celery(self.REDIS_URL)
 
         self.UPLOADED_IMAGES_PATH = os.path.join(self.SERVER_PATH, "uploaded_images")
         self.PROCESSED_IMAGES_PATH = os.path.join(self.SERVER_PATH, "processed_images")
+        # Content-addressed image bytes; keep on the same filesystem as the image folders so
+        # placements can be hard links
+        self.BLOB_STORE_PATH = os.getenv('BLOB_STORE_PATH', os.path.join(self.SERVER_PATH, "blobs"))
 
         # Extract host and port from SERVER_URL
         parsed_url = urlparse(self.SERVER_URL)
@@ -35,30 +80,26 @@ class ServerManager:
         self.SERVER_PORT = parsed_url.port
 
         # Gunicorn and Celery commands
-        self.GUNICORN_CMD = [
-            "env",
-            f"PYTHONPATH={self.SERVER_PATH}",
-            "gunicorn",
-            "server:app",
-            "--bind", f"{self.SERVER_HOST}:{self.SERVER_PORT}",
-            "--certfile", self.CERT_PATH,
-            "--keyfile", self.KEY_PATH,
-            "--ciphers", "ECDHE+AESGCM:!aNULL:!eNULL",
-            # "--ca-certs", "/path/to/ca.pem",
-            # "--cert-reqs", "2",  # 2 means ssl.CERT_REQUIRED in gunicorn
-            "--workers", "4",
-            "--timeout", "60",
-            "--log-level", "critical"  
-        ]
+        self.GUNICORN_CMD = self.build_gunicorn_cmd()
+        self.CELERY_NODE_NAME = f"celery@{socket.gethostname()}"
         self.CELERY_CMD = [
             "env",
             f"PYTHONPATH={self.SERVER_PATH}",
-            "celery", "-A", "analysis.celery", "worker",
+            "celery", "-A", "analysis.celery", "-b", self.REDIS_URL, "--result-backend", self.REDIS_URL, "worker",
+            "-n", self.CELERY_NODE_NAME,
             "--loglevel=error", "--autoscale=10,3"
         ]
 
-        # Processes list for monitoring
-        self.processes = []
+        # Supervisor of the subprocesses, created by start_processes
+        self.supervisor = None
+        self.SUPERVISOR_EVENT_LOG = os.getenv('SUPERVISOR_EVENT_LOG', os.path.join(self.SERVER_PATH, "supervisor_events.jsonl"))
+
+        # Database engine and session factory, created lazily per process
+        self._engine = None
+        self._session_factory = None
+        self._engine_pid = None
+        self._inference_engine = None
+        self._blob_store = None
 
         # Set up logging
         logging.basicConfig(
@@ -70,6 +111,12 @@ class ServerManager:
         logging.getLogger("gunicorn.error").setLevel(logging.CRITICAL)
         logging.getLogger("celery").setLevel(logging.ERROR)
 
+        if self.SERVING_MODE == "gthread" and self.WEB_THREADS > self.DB_POOL_SIZE + self.DB_MAX_OVERFLOW:
+            logging.warning(
+                f"WEB_THREADS={self.WEB_THREADS} exceeds the database pool ({self.DB_POOL_SIZE}+{self.DB_MAX_OVERFLOW}); "
+                "requests may wait for a connection"
+            )
+
         # Initialize the shutdown logger
         shutdown_log_path = os.path.join(self.SERVER_PATH, "shutdown.log")
         self.shutdown_logger = logging.getLogger("shutdown")
@@ -101,79 +148,289 @@ class ServerManager:
         self.SECRET_KEY = os.getenv('SECRET_KEY')
         self.DATABASE_URL = os.getenv('DATABASE_URL')
 
+        # Redis: Celery broker and result backend, analysis job progress, hashing slots and auth sync
+        self.REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
+        # Connection pool settings (one pool per Gunicorn worker / Celery process)
+        self.DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+        self.DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+        self.DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))
+        self.DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+        self.DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+
+        # Inference settings
+        self.INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'random')
+        self.INFERENCE_MODEL_PATH = os.getenv('INFERENCE_MODEL_PATH')
+        self.INFERENCE_BATCH_SIZE = int(os.getenv('INFERENCE_BATCH_SIZE', '8'))
+        self.INFERENCE_THREADS = int(os.getenv('INFERENCE_THREADS', str(os.cpu_count() or 1)))
+        self.INFERENCE_INPUT_SIZE = int(os.getenv('INFERENCE_INPUT_SIZE', '640'))
+        self.INFERENCE_CONF_THRESHOLD = float(os.getenv('INFERENCE_CONF_THRESHOLD', '0.25'))
+        self.INFERENCE_IOU_THRESHOLD = float(os.getenv('INFERENCE_IOU_THRESHOLD', '0.45'))
+        self.INFERENCE_CLASSES = [c.strip() for c in os.getenv('INFERENCE_CLASSES', 'Crack,Spall,Corrosion').split(',') if c.strip()]
+
+        # Analysis pipeline settings
+        self.ANALYSIS_READERS = int(os.getenv('ANALYSIS_READERS', '2'))
+        self.ANALYSIS_WRITERS = int(os.getenv('ANALYSIS_WRITERS', '2'))
+        self.ANALYSIS_QUEUE_SIZE = int(os.getenv('ANALYSIS_QUEUE_SIZE', str(2 * self.INFERENCE_BATCH_SIZE)))
+        self.ANALYSIS_DB_BATCH_SIZE = int(os.getenv('ANALYSIS_DB_BATCH_SIZE', '100'))
+        self.ANALYSIS_SHARD_SIZE = int(os.getenv('ANALYSIS_SHARD_SIZE', '200'))
+
+        # Thumbnail edge lengths (px) generated at ingest and served with ?size=
+        self.THUMBNAIL_SIZES = parse_sizes(os.getenv('THUMBNAIL_SIZES', '200,800'))
+
+        # Photo delivery: direct, x-sendfile (Apache/lighttpd) or x-accel-redirect (nginx internal locations)
+        self.SENDFILE_MODE = os.getenv('SENDFILE_MODE', 'direct').lower()
+        if self.SENDFILE_MODE not in SENDFILE_MODES:
+            raise ValueError(f"SENDFILE_MODE must be one of {', '.join(SENDFILE_MODES)}")
+        self.X_ACCEL_UPLOADED_PREFIX = os.getenv('X_ACCEL_UPLOADED_PREFIX', '/protected/uploaded')
+        self.X_ACCEL_PROCESSED_PREFIX = os.getenv('X_ACCEL_PROCESSED_PREFIX', '/protected/processed')
+
+        self.BLOB_STORE_BACKEND = os.getenv('BLOB_STORE_BACKEND', 'local').lower()
+
+        # Completed resumable uploads hashed and stored at once per worker process, off the request threads
+        self.UPLOAD_COMPLETION_WORKERS = int(os.getenv('UPLOAD_COMPLETION_WORKERS', '2'))
+
+        # Serving mode: slow downloads and uploads only pin a thread/greenlet in gthread and gevent modes
+        self.SERVING_MODE = os.getenv('SERVING_MODE', 'gthread').lower()
+        if self.SERVING_MODE not in SERVING_MODES:
+            raise ValueError(f"SERVING_MODE must be one of {', '.join(SERVING_MODES)}")
+        if self.SERVING_MODE == "gevent" and importlib.util.find_spec("gevent") is None:
+            raise ValueError("SERVING_MODE=gevent needs the gevent package (pip install gevent)")
+        self.WEB_WORKERS = int(os.getenv('WEB_WORKERS') or default_web_workers(self.SERVING_MODE))
+        self.WEB_THREADS = int(os.getenv('WEB_THREADS') or default_web_threads())
+        self.WEB_WORKER_CONNECTIONS = int(os.getenv('WEB_WORKER_CONNECTIONS', '1000'))
+        self.WEB_TIMEOUT = int(os.getenv('WEB_TIMEOUT', '60'))
+        self.WEB_KEEPALIVE = int(os.getenv('WEB_KEEPALIVE', '5'))
+
+        # Per-IP rate limiting; disabled when benchmarking from a single address
+        self.RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+        self.RATELIMIT_STORAGE_URI = os.getenv('RATELIMIT_STORAGE_URI', 'redis://localhost:6379')
+
+        # Password hashing: bcrypt cost for new hashes (other costs are re-hashed at login), hashing threads and
+        # hashes accepted at once per worker process, and hashes in flight across all worker processes
+        self.BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12'))
+        self.BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', '1'))
+        self.BCRYPT_MAX_PENDING = int(os.getenv('BCRYPT_MAX_PENDING', '2'))
+        self.BCRYPT_MAX_CONCURRENT = int(os.getenv('BCRYPT_MAX_CONCURRENT', str(max(1, (os.cpu_count() or 2) // 2))))
+
+        # Auth caches per worker: verified tokens and how long one may outlive its verification, users (one
+        # deleted straight from the database is noticed within the TTL), and how often revocations and user
+        # changes made through other workers are pulled from Redis
+        self.TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '4096'))
+        self.TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', '300'))
+        self.USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '1024'))
+        self.USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '60'))
+        self.AUTH_SYNC_INTERVAL = float(os.getenv('AUTH_SYNC_INTERVAL', '5'))
+
+        # Health checks: seconds a report is reused and each dependency check may take, free disk space (MB) and
+        # waiting analysis tasks beyond which a check is degraded, and the Retry-After sent with a 503 from /health/ready
+        self.HEALTH_CACHE_TTL = float(os.getenv('HEALTH_CACHE_TTL', '5'))
+        self.HEALTH_CHECK_TIMEOUT = float(os.getenv('HEALTH_CHECK_TIMEOUT', '2'))
+        self.HEALTH_MIN_FREE_DISK_MB = int(os.getenv('HEALTH_MIN_FREE_DISK_MB', '1024'))
+        self.HEALTH_MAX_QUEUE_DEPTH = int(os.getenv('HEALTH_MAX_QUEUE_DEPTH', '100'))
+        self.HEALTH_RETRY_AFTER = int(os.getenv('HEALTH_RETRY_AFTER', '5'))
+
+        # Supervisor: restart backoff (seconds), crash-loop threshold (restarts within a window) and liveness probes
+        self.SUPERVISOR_BACKOFF_BASE = float(os.getenv('SUPERVISOR_BACKOFF_BASE', '1'))
+        self.SUPERVISOR_BACKOFF_MAX = float(os.getenv('SUPERVISOR_BACKOFF_MAX', '60'))
+        self.SUPERVISOR_CRASH_LOOP_RESTARTS = int(os.getenv('SUPERVISOR_CRASH_LOOP_RESTARTS', '5'))
+        self.SUPERVISOR_CRASH_LOOP_WINDOW = float(os.getenv('SUPERVISOR_CRASH_LOOP_WINDOW', '120'))
+        self.SUPERVISOR_PROBE_INTERVAL = float(os.getenv('SUPERVISOR_PROBE_INTERVAL', '10'))
+        self.SUPERVISOR_PROBE_FAILURES = int(os.getenv('SUPERVISOR_PROBE_FAILURES', '3'))
+
         # logging.info(f"SERVER_PATH: {self.SERVER_PATH}")
         # logging.info(f"DATABASE_URL: {self.DATABASE_URL}")
         # Validate required variables
         if not all([self.SECRET_KEY, self.DATABASE_URL, self.CERT_PATH, self.KEY_PATH]):
             raise ValueError("One or more required environment variables are missing.")
 
+    def build_gunicorn_cmd(self, mode=None, bind=None):
+        """Gunicorn command line for a serving mode (SERVING_MODE by default)."""
+        mode = mode or self.SERVING_MODE
+        cmd = [
+            "env",
+            f"PYTHONPATH={self.SERVER_PATH}",
+            "gunicorn",
+            "server:app",
+            "--bind", bind or f"{self.SERVER_HOST}:{self.SERVER_PORT}",
+            "--certfile", self.CERT_PATH,
+            "--keyfile", self.KEY_PATH,
+            "--ciphers", "ECDHE+AESGCM:!aNULL:!eNULL",
+            # "--ca-certs", "/path/to/ca.pem",
+            # "--cert-reqs", "2",  # 2 means ssl.CERT_REQUIRED in gunicorn
+            "--worker-class", mode,
+            "--workers", str(self.WEB_WORKERS if mode == self.SERVING_MODE else default_web_workers(mode)),
+            "--timeout", str(self.WEB_TIMEOUT),
+            "--log-level", "critical"
+        ]
+        if mode == "gthread":
+            cmd += ["--threads", str(self.WEB_THREADS)]
+        elif mode == "gevent":
+            cmd += ["--worker-connections", str(self.WEB_WORKER_CONNECTIONS)]
+        if mode != "sync":
+            # The sync worker closes every connection; the others can keep clients' sessions open
+            cmd += ["--keep-alive", str(self.WEB_KEEPALIVE)]
+        return cmd
+
+    def get_engine(self):
+        """Return the pooled engine for this process, creating it after fork if needed."""
+        pid = os.getpid()
+        if self._engine is None or self._engine_pid != pid:
+            if self._engine is not None:
+                # Inherited from the parent process; drop its connections without closing them
+                self._engine.dispose(close=False)
+            patch_psycopg_for_gevent(self.DATABASE_URL)
+            self._engine = create_engine(
+                self.DATABASE_URL,
+                pool_size=self.DB_POOL_SIZE,
+                max_overflow=self.DB_MAX_OVERFLOW,
+                pool_timeout=self.DB_POOL_TIMEOUT,
+                pool_recycle=self.DB_POOL_RECYCLE,
+                pool_pre_ping=self.DB_POOL_PRE_PING
+            )
+            self._session_factory = scoped_session(sessionmaker(bind=self._engine))
+            self._engine_pid = pid
+            logging.info(f"Created database engine for process {pid}")
+        return self._engine
+
     def get_database_session(self):
-        """Provide a new database session."""
-        engine = create_engine(self.DATABASE_URL)
-        return sessionmaker(bind=engine)
+        """Provide the scoped session factory bound to the shared engine."""
+        self.get_engine()
+        return self._session_factory
+
+    def remove_database_session(self, exception=None):
+        """Release the current thread's session back to the pool."""
+        if self._session_factory is not None and self._engine_pid == os.getpid():
+            self._session_factory.remove()
+
+    def get_pool_status(self):
+        """Return connection pool statistics for monitoring."""
+        pool = self.get_engine().pool
+        return {
+            "pid": os.getpid(),
+            "pool_size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": self.DB_MAX_OVERFLOW,
+            "status": pool.status()
+        }
+
+    def get_inference_engine(self):
+        """Return this process's inference engine, loading the model on first use."""
+        if self._inference_engine is None:
+            from inference import InferenceEngine, create_backend
+            backend = create_backend(
+                self.INFERENCE_BACKEND,
+                model_path=self.INFERENCE_MODEL_PATH,
+                class_names=self.INFERENCE_CLASSES,
+                input_size=self.INFERENCE_INPUT_SIZE,
+                conf_threshold=self.INFERENCE_CONF_THRESHOLD,
+                iou_threshold=self.INFERENCE_IOU_THRESHOLD,
+                num_threads=self.INFERENCE_THREADS
+            )
+            self._inference_engine = InferenceEngine(
+                backend,
+                batch_size=self.INFERENCE_BATCH_SIZE,
+                num_threads=self.INFERENCE_THREADS
+            )
+            logging.info(f"Loaded '{self.INFERENCE_BACKEND}' inference backend in process {os.getpid()}")
+        return self._inference_engine
+
+    def get_blob_store(self):
+        """Return the content-addressed store holding uploaded and processed image bytes."""
+        if self._blob_store is None:
+            from blobstore import create_blob_store, record_reuse
+            self._blob_store = create_blob_store(
+                self.BLOB_STORE_BACKEND, root=self.BLOB_STORE_PATH,
+                on_reuse=lambda digest, size: record_reuse(self.get_engine(), digest, size)
+            )
+        return self._blob_store
 
     def create_app(self):
         """Create and configure the Flask application."""
         app = Flask(__name__)
         app.config['SECRET_KEY'] = self.SECRET_KEY
         app.config['SQLALCHEMY_DATABASE_URI'] = self.DATABASE_URL
+        app.config['USE_X_SENDFILE'] = self.SENDFILE_MODE == 'x-sendfile'
 
         # Initialize rate limiting
         limiter = Limiter(
             key_func=get_remote_address,
             default_limits=["900 per day", "500 per hour"],
-            storage_uri="redis://localhost:6379"
+            storage_uri=self.RATELIMIT_STORAGE_URI,
+            enabled=self.RATELIMIT_ENABLED
         )
         limiter.init_app(app)
 
-        init_db()
+        init_db(self.get_engine())
+
+        # Return each request's session to the pool when the request ends
+        app.teardown_appcontext(self.remove_database_session)
 
+        # Probes are exempt from rate limiting: the supervisor and load balancers poll far more
+        # often than any limit allows, and a 429 on /ping would get Gunicorn reloaded
         @app.route('/ping', methods=['GET'])
+        @limiter.exempt
         def ping():
             """Simple health-check or availability endpoint."""
             return jsonify({"status": "ok", "message": "Server is running"}), 200
 
+        @app.route('/health', methods=['GET'])
+        @limiter.exempt
+        def health():
+            """Dependency report (cached for a few seconds); 503 while the API cannot serve requests."""
+            report = get_health_monitor(self).report()
+            return jsonify(report), 200 if report["ready"] else 503
+
+        @app.route('/health/ready', methods=['GET'])
+        @limiter.exempt
+        def health_ready():
+            """Readiness for load balancers and clients: 503 with Retry-After until the database and Redis answer."""
+            report = get_health_monitor(self).report()
+            if report["ready"]:
+                return jsonify({"ready": True, "status": report["status"]}), 200
+            down = [name for name, check in report["checks"].items() if check["status"] == "down"]
+            response = jsonify({"ready": False, "status": report["status"], "reason": f"unavailable: {', '.join(down)}"})
+            response.headers['Retry-After'] = str(self.HEALTH_RETRY_AFTER)
+            return response, 503
+
+        @app.route('/stats/db_pool', methods=['GET'])
+        @token_required
+        def db_pool_stats(current_user):
+            """Expose this worker's database connection pool statistics to signed-in users."""
+            return jsonify(self.get_pool_status()), 200
+
         return app
 
     def start_processes(self, run_gui=False):
-        """Start Gunicorn, Celery, and optionally the Server GUI as subprocesses."""
+        """Start Gunicorn, Celery, and optionally the Server GUI under the supervisor."""
         env = os.environ.copy()
         env['SERVER_PATH'] = self.SERVER_PATH
 
-        try:
-            print("Starting Gunicorn...")
-            gunicorn_proc = subprocess.Popen(
-                self.GUNICORN_CMD,
-                env=env,
-                stdout=sys.stdout,
-                stderr=sys.stderr,
-                preexec_fn=os.setsid
-            )
-            self.processes.append(("Gunicorn", gunicorn_proc))
-
-            print("Starting Celery...")
-            celery_proc = subprocess.Popen(
-                self.CELERY_CMD,
-                env=env,
-                stdout=sys.stdout,
-                stderr=sys.stderr,
-                preexec_fn=os.setsid
-            )
-            self.processes.append(("Celery", celery_proc))
-
-            if run_gui:
-                print("Starting Server GUI...")
-                gui_proc = subprocess.Popen(
-                    ["python", os.path.join(self.SERVER_PATH, "server_gui.py")],
-                    env=env,
-                    stdout=sys.stdout,
-                    stderr=sys.stderr,
-                    preexec_fn=os.setsid
-                )
-                self.processes.append(("Server GUI", gui_proc))
-            else:
-                print("Server GUI will not be started.")
+        self.supervisor = Supervisor(
+            EventLog(self.SUPERVISOR_EVENT_LOG, self.shutdown_logger),
+            backoff_base=self.SUPERVISOR_BACKOFF_BASE,
+            backoff_max=self.SUPERVISOR_BACKOFF_MAX,
+            crash_loop_restarts=self.SUPERVISOR_CRASH_LOOP_RESTARTS,
+            crash_loop_window=self.SUPERVISOR_CRASH_LOOP_WINDOW,
+            probe_interval=self.SUPERVISOR_PROBE_INTERVAL,
+            probe_failures=self.SUPERVISOR_PROBE_FAILURES
+        )
+        # Without the API there is nothing to serve; without Celery only analysis is unavailable
+        self.supervisor.add(ChildProcess("Gunicorn", self.GUNICORN_CMD, env, critical=True,
+                                         probe=self.probe_gunicorn, reload_signal=signal.SIGHUP))
+        self.supervisor.add(ChildProcess("Celery", self.CELERY_CMD, env, critical=False, probe=self.probe_celery))
+        if run_gui:
+            self.supervisor.add(ChildProcess("Server GUI", ["python", os.path.join(self.SERVER_PATH, "server_gui.py")], env,
+                                             stops_all_on_exit=True))
+        else:
+            print("Server GUI will not be started.")
 
+        try:
+            for name in self.supervisor.children:
+                print(f"Starting {name}...")
+            self.supervisor.start_all()
         except Exception as e:
             self.shutdown_logger.error(f"Error starting processes: {e}")
             self.stop_processes()
@@ -181,71 +438,53 @@ class ServerManager:
 
     def stop_processes(self, exclude_gui=False):
         """Terminate all running subprocesses, optionally excluding the GUI."""
-        for name, proc in self.processes[:]:
-            if exclude_gui and name == "Server GUI":
-                continue
-            if proc.poll() is None:  
-                try:
-                    os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
-                    self.shutdown_logger.info(f"Terminated process '{name}' with PID {proc.pid}")
-                except Exception as e:
-                    self.shutdown_logger.error(f"Error stopping process '{name}' with PID {proc.pid}: {e}")
-                self.processes.remove((name, proc))
+        if self.supervisor is not None:
+            self.supervisor.stop_all(exclude=("Server GUI",) if exclude_gui else ())
 
     def monitor_processes(self):
-        """Monitor subprocesses and terminate all if one fails."""
+        """Supervise the subprocesses until the GUI closes, a critical one crash-loops or we are interrupted."""
         try:
-            while True:
-                for name, proc in self.processes[:]:
-                    if proc.poll() is not None:  
-                        if name == "Server GUI":
-                            # If GUI ends, stop other processes gracefully
-                            print("Server GUI process has ended. Stopping all processes.")
-                            self.stop_processes(exclude_gui=True)
-                            sys.exit(0)
-                        else:
-                            # Handle unexpected process termination
-                            print(f"Process '{name}' has stopped unexpectedly.")
-                            self.stop_processes()
-                            sys.exit(1)
-                time.sleep(1)
+            exit_code = self.supervisor.run()
         except KeyboardInterrupt:
             print("Keyboard interrupt received. Stopping all processes.")
             self.stop_processes()
+            return
+        if exit_code:
+            print("A server process kept crashing. Stopping all processes.")
+        sys.exit(exit_code)
 
     def restart_process(self, name):
         """Restart a subprocess by name."""
         self.shutdown_logger.info(f"Attempting to restart process '{name}'")
-        if name == "Gunicorn":
-            cmd = self.GUNICORN_CMD
-        elif name == "Celery":
-            cmd = self.CELERY_CMD
-        elif name == "Server GUI":
-            cmd = ["python", "server_gui.py"]
-        else:
+        if self.supervisor is None or name not in self.supervisor.children:
             self.shutdown_logger.error(f"Unknown process name: {name}")
             return
-
-        env = os.environ.copy()
-        env['SERVER_PATH'] = self.SERVER_PATH
-
         try:
-            proc = subprocess.Popen(
-                cmd,
-                env=env,
-                stdout=sys.stdout,
-                stderr=sys.stderr,
-                preexec_fn=os.setsid
-            )
-            self.processes.append((name, proc))
-            self.shutdown_logger.info(f"Successfully restarted process '{name}' with PID {proc.pid}")
+            self.supervisor.restart(name)
         except Exception as e:
             self.shutdown_logger.error(f"Failed to restart process '{name}': {e}")
 
+    def reload_processes(self, signum=None, frame=None):
+        """SIGHUP handler: rolling reload of the Gunicorn workers and a graceful Celery restart."""
+        if self.supervisor is not None:
+            self.supervisor.request_reload()
+
+    def probe_gunicorn(self):
+        """Liveness: the API answers /ping (not /health/ready; restarting Gunicorn cannot fix a database outage)."""
+        host = "127.0.0.1" if self.SERVER_HOST in (None, "0.0.0.0") else self.SERVER_HOST
+        response = requests.get(f"https://{host}:{self.SERVER_PORT}/ping", verify=False, timeout=5)
+        return response.status_code == 200
+
+    def probe_celery(self):
+        """Liveness: this host's Celery worker answers a control ping."""
+        from analysis import celery
+        return bool(celery.control.ping(destination=[self.CELERY_NODE_NAME], timeout=2))
+
     def run(self):
         # Set up signal handlers
         signal.signal(signal.SIGINT, self.handle_signal)
         signal.signal(signal.SIGTERM, self.handle_signal)
+        signal.signal(signal.SIGHUP, self.reload_processes)
 
         self.start_processes()
         self.monitor_processes()
@@ -0,0 +1,43 @@
+import os
+import mimetypes
+from flask import Response, send_file
+from thumbnails import THUMBNAIL_DIR
+
+# How photo bytes leave the server: Flask streams them itself ("direct"), or a fronting web
+# server does after seeing X-Sendfile (Apache/lighttpd) or X-Accel-Redirect (nginx)
+SENDFILE_MODES = ("direct", "x-sendfile", "x-accel-redirect")
+
+def storage_key(username, mission_name, *parts):
+    """Path of a stored file relative to its storage root, always with forward slashes."""
+    return "/".join((username, mission_name) + parts)
+
+def absolute_path(root, key):
+    return os.path.join(root, *key.split("/"))
+
+def thumbnail_key(key, size):
+    """Storage key of the size px thumbnail stored next to the file at key."""
+    folder, _, filename = key.rpartition("/")
+    return f"{folder}/{THUMBNAIL_DIR}/{size}/{filename}"
+
+def send_stored_file(root, key, mode="direct", accel_prefix=None):
+    """
+    Send the file at root/key with a strong ETag (mtime, size and name) and Last-Modified,
+    answering If-None-Match / If-Modified-Since with 304 and Range / If-Range with 206.
+    With x-accel-redirect the response only names the internal nginx location
+    (accel_prefix + key) and nginx serves the bytes, conditionals and ranges itself.
+    X-Sendfile is handled by send_file when the app's USE_X_SENDFILE is set.
+    Raises FileNotFoundError if the file is missing, in every mode.
+    """
+    path = absolute_path(root, key)
+    if mode == "x-accel-redirect":
+        # nginx would answer a missing file with its own 404; let the caller decide instead
+        if not os.path.isfile(path):
+            raise FileNotFoundError(path)
+        response = Response(mimetype=mimetypes.guess_type(path)[0] or "application/octet-stream")
+        response.headers["X-Accel-Redirect"] = f"{accel_prefix.rstrip('/')}/{key}"
+    else:
+        response = send_file(path, conditional=True, etag=True)
+        response.headers["Accept-Ranges"] = "bytes"
+    # Photos are per-user, so shared caches must not store them; clients revalidate every time
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
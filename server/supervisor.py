@@ -0,0 +1,260 @@
+import os
+import json
+import time
+import signal
+import logging
+import threading
+import subprocess
+from collections import deque
+
+class EventLog:
+    """Append-only JSON-lines log of supervisor events, one object per line."""
+
+    def __init__(self, path, logger=None):
+        self.path = path
+        self.logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+    def record(self, event, process=None, **fields):
+        entry = {"time": round(time.time(), 3), "event": event, "process": process, **fields}
+        line = json.dumps(entry)
+        with self._lock:
+            try:
+                with open(self.path, 'a') as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                self.logger.error(f"Could not write supervisor event log {self.path}: {e}")
+        self.logger.info(line)
+        return entry
+
+class ChildProcess:
+    """
+    A supervised subprocess. critical children that crash-loop bring the whole server down
+    (there is nothing left to serve); others are retried after a cool-down. probe() returns
+    True while the child is healthy; reload_signal, if set, reloads it in place (e.g. SIGHUP
+    makes the gunicorn master replace its workers one by one).
+    """
+
+    def __init__(self, name, cmd, env=None, critical=True, probe=None, reload_signal=None, stops_all_on_exit=False):
+        self.name = name
+        self.cmd = cmd
+        self.env = env
+        self.critical = critical
+        self.probe = probe
+        self.reload_signal = reload_signal
+        self.stops_all_on_exit = stops_all_on_exit
+
+        self.proc = None
+        self.started_at = None
+        self.failures = 0            # consecutive unexpected exits, reset once the child stays up
+        self.failure_times = deque() # for crash-loop detection
+        self.restart_at = None
+        self.probe_failures = 0
+        self.probe_after = 0.0
+        self.reloaded = False
+
+    @property
+    def pid(self):
+        return self.proc.pid if self.proc else None
+
+    def running(self):
+        return self.proc is not None and self.proc.poll() is None
+
+class Supervisor:
+    """
+    Keeps the server's child processes running: restarts those that exit unexpectedly with
+    exponential backoff, detects crash loops, probes liveness and reloads or restarts children
+    that stop answering, and records every decision in an EventLog.
+    """
+
+    def __init__(self, event_log, backoff_base=1.0, backoff_max=60.0, crash_loop_restarts=5, crash_loop_window=120.0,
+                 crash_loop_cooldown=300.0, stable_after=60.0, probe_interval=10.0, probe_failures=3, probe_grace=30.0,
+                 stop_timeout=30.0, poll_interval=0.5):
+        self.events = event_log
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.crash_loop_restarts = crash_loop_restarts
+        self.crash_loop_window = crash_loop_window
+        self.crash_loop_cooldown = crash_loop_cooldown
+        self.stable_after = stable_after
+        self.probe_interval = probe_interval
+        self.probe_failures = probe_failures
+        self.probe_grace = probe_grace
+        self.stop_timeout = stop_timeout
+        self.poll_interval = poll_interval
+        self.children = {}
+        self._lock = threading.RLock()
+        self._exit_code = None
+        self._reload_requested = False
+
+    def add(self, child):
+        self.children[child.name] = child
+        return child
+
+    # Starting and stopping
+
+    def start(self, child):
+        env = dict(os.environ if child.env is None else child.env)
+        # Own process group, so stopping a child also stops everything it spawned
+        child.proc = subprocess.Popen(child.cmd, env=env, preexec_fn=os.setsid)
+        child.started_at = time.monotonic()
+        child.restart_at = None
+        child.probe_failures = 0
+        child.probe_after = child.started_at + self.probe_grace
+        child.reloaded = False
+        self.events.record("started", child.name, pid=child.pid)
+
+    def start_all(self):
+        for child in self.children.values():
+            self.start(child)
+
+    def stop(self, child, reason="stop"):
+        """Stop a child's process group: SIGTERM, then SIGKILL after stop_timeout."""
+        proc = child.proc
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
+            proc.wait(timeout=self.stop_timeout)
+        except subprocess.TimeoutExpired:
+            self.events.record("killed", child.name, pid=proc.pid, reason="stop timeout")
+            os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
+            proc.wait()
+        except ProcessLookupError:
+            pass
+        self.events.record("stopped", child.name, pid=proc.pid, reason=reason, returncode=proc.returncode)
+
+    def stop_all(self, exclude=()):
+        with self._lock:
+            for child in reversed(list(self.children.values())):
+                if child.name not in exclude:
+                    child.restart_at = None
+                    self.stop(child, "shutdown")
+
+    def restart(self, name, reason="manual"):
+        """Stop and start a child right away; not counted as a failure."""
+        with self._lock:
+            child = self.children[name]
+            self.stop(child, reason)
+            self.start(child)
+
+    def reload(self, name=None):
+        """
+        Reload one child (or all): signal those that reload in place (gunicorn's rolling HUP
+        reload keeps serving throughout) and gracefully restart the others.
+        """
+        with self._lock:
+            for child in self.children.values():
+                if name is not None and child.name != name:
+                    continue
+                if child.stops_all_on_exit or not child.running():
+                    continue
+                if child.reload_signal is not None:
+                    os.kill(child.pid, child.reload_signal)
+                    child.probe_after = time.monotonic() + self.probe_grace
+                    self.events.record("reload", child.name, pid=child.pid, signal=signal.Signals(child.reload_signal).name)
+                else:
+                    self.restart(child.name, reason="reload")
+
+    def request_reload(self):
+        """
+        Reload every child at the next turn of run(). Safe to call from a signal handler: the
+        handler runs on run()'s thread, possibly while it is stopping or starting a child, so it
+        only records the request.
+        """
+        self._reload_requested = True
+
+    # Supervision loop
+
+    def run(self):
+        """Supervise until a child ends the server; returns the exit code for the main process."""
+        self.events.record("supervisor_started", pids={name: child.pid for name, child in self.children.items()})
+        while self._exit_code is None:
+            if self._reload_requested:
+                self._reload_requested = False
+                self.reload()
+            now = time.monotonic()
+            with self._lock:
+                for child in list(self.children.values()):
+                    self.check(child, now)
+                    if self._exit_code is not None:
+                        break
+            time.sleep(self.poll_interval)
+        return self._exit_code
+
+    def check(self, child, now):
+        if child.proc is None:
+            if child.restart_at is not None and now >= child.restart_at:
+                self.events.record("restarting", child.name, attempt=child.failures)
+                self.start(child)
+            return
+
+        returncode = child.proc.poll()
+        if returncode is not None:
+            self.events.record("exited", child.name, pid=child.pid, returncode=returncode,
+                               uptime=round(now - child.started_at, 1))
+            child.proc = None
+            if child.stops_all_on_exit:
+                self.shutdown(0, f"{child.name} ended")
+            else:
+                self.schedule_restart(child, now)
+            return
+
+        if child.probe is not None and now >= child.probe_after:
+            self.run_probe(child, now)
+
+    def schedule_restart(self, child, now):
+        """Back off exponentially between restarts; a child restarting too often is crash-looping."""
+        if child.started_at is not None and now - child.started_at >= self.stable_after:
+            child.failures = 0
+        child.failures += 1
+        child.failure_times.append(now)
+        while child.failure_times and now - child.failure_times[0] > self.crash_loop_window:
+            child.failure_times.popleft()
+
+        if len(child.failure_times) >= self.crash_loop_restarts:
+            self.events.record("crash_loop", child.name, failures=len(child.failure_times), window=self.crash_loop_window)
+            if child.critical:
+                self.shutdown(1, f"{child.name} is crash-looping")
+                return
+            child.failure_times.clear()
+            delay = self.crash_loop_cooldown
+        else:
+            delay = min(self.backoff_max, self.backoff_base * 2 ** (child.failures - 1))
+        child.restart_at = now + delay
+        self.events.record("restart_scheduled", child.name, delay=delay, failures=child.failures)
+
+    def run_probe(self, child, now):
+        """Probe liveness; after repeated failures reload the child in place once, then restart it."""
+        child.probe_after = now + self.probe_interval
+        try:
+            healthy = bool(child.probe())
+            error = None
+        except Exception as e:
+            healthy, error = False, str(e)
+        if healthy:
+            child.probe_failures = 0
+            child.reloaded = False
+            return
+
+        child.probe_failures += 1
+        self.events.record("probe_failed", child.name, pid=child.pid, failures=child.probe_failures, error=error)
+        if child.probe_failures < self.probe_failures:
+            return
+        child.probe_failures = 0
+        if child.reload_signal is not None and not child.reloaded:
+            child.reloaded = True
+            os.kill(child.pid, child.reload_signal)
+            child.probe_after = now + self.probe_grace
+            self.events.record("reload", child.name, pid=child.pid, reason="unhealthy",
+                               signal=signal.Signals(child.reload_signal).name)
+            return
+        self.stop(child, "unhealthy")
+        child.proc = None
+        self.schedule_restart(child, now)
+
+    def shutdown(self, exit_code, reason):
+        """Stop every child and make run() return exit_code."""
+        self.events.record("shutdown", reason=reason, exit_code=exit_code)
+        self.stop_all()
+        self._exit_code = exit_code
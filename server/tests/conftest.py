@@ -0,0 +1,73 @@
+import os
+import sys
+import pytest
+import fakeredis
+
+# The server modules import each other by name, as they do when Gunicorn runs server.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jobs
+import uploads
+import authcache
+import passwords
+from server_manager import ServerManager
+from models import Mission, User
+from auth import auth_blueprint, issue_token
+from missions import missions_blueprint
+from uploads import uploads_blueprint
+
+@pytest.fixture
+def server_env():
+    """Extra .env settings for the server_manager fixture; parametrize a test to change them."""
+    return {}
+
+@pytest.fixture
+def server_manager(tmp_path, monkeypatch, server_env):
+    """A ServerManager on a temporary SQLite database and folder, with in-memory rate limits and Redis."""
+    env_path = tmp_path / ".env"
+    env_path.write_text(
+        f"SERVER_PATH={tmp_path}\n"
+        f"LOG_PATH={tmp_path / 'server.log'}\n"
+        f"CERT_PATH={tmp_path / 'cert.pem'}\n"
+        f"KEY_PATH={tmp_path / 'key.pem'}\n"
+        "SECRET_KEY=test-secret\n"
+        f"DATABASE_URL=sqlite:///{tmp_path / 'skysync.db'}\n"
+        "RATELIMIT_STORAGE_URI=memory://\n"
+        + "".join(f"{name}={value}\n" for name, value in server_env.items())
+    )
+    # load_dotenv writes into os.environ; give it a copy that is thrown away after the test
+    monkeypatch.setattr(os, "environ", os.environ.copy())
+    # Cached users and tokens belong to the previous test's database
+    monkeypatch.setattr(authcache, "_auth_cache", None)
+    # Built from the previous test's settings
+    monkeypatch.setattr(passwords, "_password_hasher", None)
+    server_manager = ServerManager(env_path=str(env_path))
+    # After ServerManager has configured the Redis URL, which would drop this client
+    monkeypatch.setattr(jobs, "_redis_client", fakeredis.FakeRedis(decode_responses=True))
+    yield server_manager
+    server_manager.get_engine().dispose()
+
+@pytest.fixture
+def app(server_manager, monkeypatch):
+    """The API as server.py assembles it."""
+    app = server_manager.create_app()
+    for blueprint in (auth_blueprint, missions_blueprint, uploads_blueprint):
+        monkeypatch.setattr(blueprint, "server_manager", server_manager, raising=False)
+        app.register_blueprint(blueprint)
+    return app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def headers(app, server_manager, monkeypatch):
+    """Token of a user owning the mission 'survey'; thumbnails are left to be built on request."""
+    monkeypatch.setattr(uploads, "queue_thumbnails", lambda *args: None)
+    session = server_manager.get_database_session()()
+    session.add(User(username='pilot', password_hash='unused'))
+    session.add(Mission(username='pilot', mission_name='survey', processed=False))
+    session.commit()
+    session.close()
+    with app.app_context():
+        return {'x-access-token': issue_token('pilot')}
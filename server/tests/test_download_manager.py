@@ -0,0 +1,80 @@
+import os
+import sys
+import json
+import threading
+
+# The client's modules import each other by name, as they do when client.py runs
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'client'))
+from gui.download_manager import DownloadManager, ETagStore, save_json_atomic
+
+class StreamedPhoto:
+    """Stands in for a streamed requests response; on_chunk runs after each chunk is handed out."""
+
+    def __init__(self, chunks, on_chunk=lambda: None):
+        self.status_code = 200
+        self.headers = {"ETag": '"v2"'}
+        self.chunks = chunks
+        self.on_chunk = on_chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_content(self, chunk_size):
+        for chunk in self.chunks:
+            yield chunk
+            self.on_chunk()
+
+class PhotoSession:
+    def __init__(self):
+        self.responses = []
+
+    def get(self, url, **kwargs):
+        return self.responses.pop(0)
+
+def test_concurrent_json_saves_do_not_collide(tmp_path):
+    path = str(tmp_path / "survey_cache.json")
+    errors = []
+
+    def writer(n):
+        try:
+            for i in range(50):
+                save_json_atomic(path, {"writer": n, "write": i})
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    with open(path) as f:
+        assert json.load(f)["write"] == 49
+    assert os.listdir(tmp_path) == ["survey_cache.json"]
+
+def test_cancelled_sync_writes_nothing_more(tmp_path):
+    mission_dir = str(tmp_path)
+    local_path = os.path.join(mission_dir, "Crack", "IMG_0001.jpg")
+    os.makedirs(os.path.dirname(local_path))
+    with open(local_path, "wb") as f:
+        f.write(b"old")
+    etags = ETagStore(mission_dir)
+    etags.set(local_path, '"v1"')
+    etags.save()
+
+    session = PhotoSession()
+    manager = DownloadManager("http://skysync.test", "token", max_workers=1, session=session)
+    # The selection changes while the revalidated photo is coming in
+    session.responses.append(StreamedPhoto([b"new ", b"photo"], on_chunk=manager.cancel))
+
+    present = manager.download_all("survey", mission_dir, [("Crack", "IMG_0001.jpg")], revalidate=True)
+    assert present == []
+    with open(local_path, "rb") as f:
+        assert f.read() == b"old"
+    assert ETagStore(mission_dir).get(local_path) == '"v1"'
+    # Nothing is started once cancelled
+    assert manager.download_one("survey", "IMG_0002.jpg", os.path.join(mission_dir, "Crack", "IMG_0002.jpg")) is False
@@ -0,0 +1,48 @@
+import io
+import os
+import time
+import hashlib
+from PIL import Image
+
+def jpeg(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (640, 480), color).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+def upload(client, headers, filename, data):
+    """Upload a file as a one-chunk resumable upload and wait until it is stored."""
+    upload_id = client.post("/missions/survey/uploads", headers=headers,
+                            json={"filename": filename, "size": len(data), "chunk_size": len(data)}).get_json()['upload_id']
+    client.put(f"/missions/survey/uploads/{upload_id}/chunks/0", data=data,
+               headers={**headers, 'X-Chunk-SHA256': hashlib.sha256(data).hexdigest()})
+    client.post(f"/missions/survey/uploads/{upload_id}/complete", headers=headers)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        status = client.get(f"/missions/survey/uploads/{upload_id}", headers=headers).get_json()
+        if status['state'] != 'completing':
+            assert status['state'] == 'complete'
+            return
+        time.sleep(0.05)
+    raise AssertionError(f"upload of {filename} did not complete")
+
+def thumbnail_color(client, headers, filename):
+    response = client.get(f"/missions/survey/photos/{filename}?size=200", headers=headers)
+    assert response.status_code == 200
+    return Image.open(io.BytesIO(response.get_data())).convert("RGB").getpixel((10, 10))
+
+def close(color, expected):
+    return all(abs(a - b) < 8 for a, b in zip(color, expected))
+
+def test_replacing_an_original_with_stored_content_refreshes_its_thumbnail(client, headers, server_manager):
+    red, blue = jpeg((220, 0, 0)), jpeg((0, 0, 220))
+    upload(client, headers, "IMG_0001.jpg", red)
+    upload(client, headers, "IMG_0002.jpg", blue)
+    # The blue blob is older than any thumbnail built from here on
+    for dirpath, _, filenames in os.walk(server_manager.BLOB_STORE_PATH):
+        for name in filenames:
+            os.utime(os.path.join(dirpath, name), (time.time() - 3600,) * 2)
+    assert close(thumbnail_color(client, headers, "IMG_0001.jpg"), (220, 0, 0))
+
+    # Re-uploading IMG_0001.jpg with the blue bytes links the old blob in place
+    upload(client, headers, "IMG_0001.jpg", blue)
+    assert close(thumbnail_color(client, headers, "IMG_0001.jpg"), (0, 0, 220))
@@ -0,0 +1,61 @@
+import pytest
+
+import health
+import authcache
+from models import User
+from analysis import celery
+
+def test_ping_is_not_rate_limited(client):
+    # The supervisor probes every 10 s: more than the 500/hour and 900/day limits allow
+    statuses = {client.get('/ping').status_code for _ in range(1000)}
+    assert statuses == {200}
+
+def test_other_endpoints_are_rate_limited(client):
+    statuses = [client.get('/stats/db_pool').status_code for _ in range(501)]
+    assert statuses[-1] == 429
+
+def test_health_does_not_reveal_paths(client, server_manager, monkeypatch):
+    # No Celery broker here; report its workers as down rather than waiting on a connection
+    monkeypatch.setattr(health.HealthMonitor, "check_celery", lambda self: {"status": health.DOWN})
+    monkeypatch.setattr(health, "_health_monitor", None)
+    response = client.get('/health')
+    assert response.status_code == 200
+    report = response.get_json()
+    assert set(report["checks"]["disk"]["volumes"]) == {"uploaded_images", "processed_images", "blobs"}
+    for volume in report["checks"]["disk"]["volumes"].values():
+        assert set(volume) == {"status", "free_bytes"}
+    assert server_manager.SERVER_PATH not in response.get_data(as_text=True)
+
+@pytest.mark.parametrize("server_env", [{"REDIS_URL": "redis://redis.internal:6390/2"}])
+def test_redis_url_from_env_file_reaches_celery(server_manager):
+    # analysis.celery is built at import, before the .env file is read
+    assert celery.conf.broker_url == "redis://redis.internal:6390/2"
+    assert celery.conf.result_backend == "redis://redis.internal:6390/2"
+    command = server_manager.CELERY_CMD
+    assert command[command.index("-b") + 1] == "redis://redis.internal:6390/2"
+
+@pytest.mark.parametrize("server_env", [{"BCRYPT_ROUNDS": "4"}])
+def test_bcrypt_rounds_from_env_file_reach_the_hasher(client, server_manager):
+    response = client.post('/register', json={"username": "inspector", "password": "correct horse"})
+    assert response.status_code == 201
+    session = server_manager.get_database_session()()
+    try:
+        assert session.query(User).filter_by(username="inspector").one().password_hash.startswith("$2b$04$")
+    finally:
+        session.close()
+
+@pytest.mark.parametrize("server_env", [{"TOKEN_CACHE_SIZE": "2", "AUTH_SYNC_INTERVAL": "0.5"}])
+def test_auth_cache_settings_from_env_file_reach_the_cache(client, headers):
+    assert client.get('/missions/get_missions', headers=headers).status_code == 200
+    auth_cache = authcache.get_auth_cache(None)
+    assert auth_cache.tokens.max_size == 2
+    assert auth_cache.sync_interval == 0.5
+
+@pytest.mark.parametrize("server_env", [{"HEALTH_RETRY_AFTER": "17"}])
+def test_retry_after_from_env_file_reaches_readiness(client, monkeypatch):
+    monkeypatch.setattr(health.HealthMonitor, "check_database", lambda self: {"status": health.DOWN})
+    monkeypatch.setattr(health.HealthMonitor, "check_celery", lambda self: {"status": health.DOWN})
+    monkeypatch.setattr(health, "_health_monitor", None)
+    response = client.get('/health/ready')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == "17"
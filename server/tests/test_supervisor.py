@@ -0,0 +1,215 @@
+import signal
+import itertools
+import pytest
+
+import supervisor
+from supervisor import Supervisor, ChildProcess
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+class FakeProcess:
+    """Stands in for subprocess.Popen: runs until killed or told to exit."""
+    pids = itertools.count(100)
+
+    def __init__(self, cmd, env=None, preexec_fn=None):
+        self.cmd = cmd
+        self.pid = next(self.pids)
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+class RecordingLog:
+    def __init__(self):
+        self.entries = []
+
+    def record(self, event, process=None, **fields):
+        self.entries.append({"event": event, "process": process, **fields})
+
+    def events(self, process=None):
+        return [e["event"] for e in self.entries if process is None or e["process"] == process]
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(supervisor.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(supervisor.time, "sleep", clock.sleep)
+    return clock
+
+@pytest.fixture
+def signals(monkeypatch):
+    """Signals sent, as (pid, signal); a SIGTERM or SIGKILL to a process group ends its process."""
+    sent = []
+    processes = {}
+
+    def popen(cmd, env=None, preexec_fn=None):
+        process = FakeProcess(cmd, env, preexec_fn)
+        processes[process.pid] = process
+        return process
+
+    def killpg(pgid, sig):
+        sent.append((pgid, sig))
+        processes[pgid].returncode = -sig
+
+    monkeypatch.setattr(supervisor.subprocess, "Popen", popen)
+    monkeypatch.setattr(supervisor.os, "getpgid", lambda pid: pid)
+    monkeypatch.setattr(supervisor.os, "killpg", killpg)
+    monkeypatch.setattr(supervisor.os, "kill", lambda pid, sig: sent.append((pid, sig)))
+    return sent
+
+def make_supervisor(*children, **options):
+    options = {"backoff_base": 1.0, "backoff_max": 8.0, "crash_loop_restarts": 5, "crash_loop_window": 120.0,
+               "crash_loop_cooldown": 300.0, "stable_after": 60.0, "probe_interval": 10.0, "probe_failures": 3,
+               "probe_grace": 30.0, **options}
+    sup = Supervisor(RecordingLog(), **options)
+    for child in children:
+        sup.add(child)
+    sup.start_all()
+    return sup
+
+def test_restart_backoff_doubles_up_to_the_maximum(clock, signals):
+    child = ChildProcess("Celery", ["celery"], critical=False)
+    sup = make_supervisor(child, crash_loop_restarts=100)
+    delays = []
+    for _ in range(6):
+        clock.now += 1
+        sup.schedule_restart(child, clock.now)
+        delays.append(child.restart_at - clock.now)
+    assert delays == [1, 2, 4, 8, 8, 8]
+
+def test_restart_backoff_resets_once_the_child_stayed_up(clock, signals):
+    child = ChildProcess("Celery", ["celery"], critical=False)
+    sup = make_supervisor(child)
+    for _ in range(3):
+        sup.schedule_restart(child, clock.now)
+    assert child.restart_at - clock.now == 4
+
+    clock.now += 500
+    sup.start(child)
+    clock.now += 61
+    sup.schedule_restart(child, clock.now)
+    assert child.failures == 1
+    assert child.restart_at - clock.now == 1
+
+def test_exited_child_is_restarted_when_its_backoff_ends(clock, signals):
+    child = ChildProcess("Celery", ["celery"], critical=False)
+    sup = make_supervisor(child)
+    first_pid = child.pid
+    child.proc.returncode = 1
+
+    sup.check(child, clock.now)
+    assert child.proc is None
+    assert child.restart_at == clock.now + 1
+    sup.check(child, clock.now + 0.5)
+    assert child.proc is None
+    sup.check(child, clock.now + 1)
+    assert child.running() and child.pid != first_pid
+
+def test_crash_looping_critical_child_shuts_the_server_down(clock, signals):
+    api = ChildProcess("Gunicorn", ["gunicorn"], critical=True)
+    worker = ChildProcess("Celery", ["celery"], critical=False)
+    sup = make_supervisor(api, worker)
+    for _ in range(5):
+        clock.now += 1
+        sup.schedule_restart(api, clock.now)
+
+    assert sup._exit_code == 1
+    assert "crash_loop" in sup.events.events("Gunicorn")
+    assert not worker.running()
+
+def test_crash_looping_optional_child_cools_down(clock, signals):
+    api = ChildProcess("Gunicorn", ["gunicorn"], critical=True)
+    worker = ChildProcess("Celery", ["celery"], critical=False)
+    sup = make_supervisor(api, worker)
+    for _ in range(5):
+        clock.now += 1
+        sup.schedule_restart(worker, clock.now)
+
+    assert sup._exit_code is None
+    assert worker.restart_at == clock.now + 300
+    assert not worker.failure_times
+    assert api.running()
+
+def test_failures_outside_the_window_are_not_a_crash_loop(clock, signals):
+    worker = ChildProcess("Celery", ["celery"], critical=True)
+    sup = make_supervisor(worker, stable_after=10_000)
+    for _ in range(10):
+        clock.now += 50
+        sup.schedule_restart(worker, clock.now)
+    assert sup._exit_code is None
+    assert len(worker.failure_times) == 3
+
+def test_unhealthy_child_is_reloaded_once_then_restarted(clock, signals):
+    healthy = [False]
+    api = ChildProcess("Gunicorn", ["gunicorn"], probe=lambda: healthy[0], reload_signal=signal.SIGHUP)
+    sup = make_supervisor(api)
+    pid = api.pid
+
+    for _ in range(3):
+        clock.now += 10
+        sup.run_probe(api, clock.now)
+    assert signals == [(pid, signal.SIGHUP)]
+    assert api.reloaded
+    assert api.probe_after == clock.now + 30
+
+    for _ in range(3):
+        clock.now += 10
+        sup.run_probe(api, clock.now)
+    assert signals[-1] == (pid, signal.SIGTERM)
+    assert api.proc is None
+    assert api.restart_at == clock.now + 1
+    assert sup.events.events("Gunicorn")[-3:] == ["probe_failed", "stopped", "restart_scheduled"]
+
+def test_healthy_probe_clears_failures_and_the_reload(clock, signals):
+    healthy = [False]
+    api = ChildProcess("Gunicorn", ["gunicorn"], probe=lambda: healthy[0], reload_signal=signal.SIGHUP)
+    sup = make_supervisor(api)
+
+    for _ in range(3):
+        sup.run_probe(api, clock.now)
+    healthy[0] = True
+    sup.run_probe(api, clock.now)
+    assert api.probe_failures == 0 and not api.reloaded
+
+    healthy[0] = False
+    for _ in range(3):
+        sup.run_probe(api, clock.now)
+    # Reloaded again rather than restarted: the earlier reload had fixed it
+    assert [sig for _, sig in signals] == [signal.SIGHUP, signal.SIGHUP]
+    assert api.running()
+
+def test_probe_that_raises_counts_as_a_failure(clock, signals):
+    def probe():
+        raise ConnectionError("refused")
+    worker = ChildProcess("Celery", ["celery"], critical=False, probe=probe)
+    sup = make_supervisor(worker, probe_failures=1)
+
+    sup.run_probe(worker, clock.now)
+    assert worker.proc is None
+    failed = [e for e in sup.events.entries if e["event"] == "probe_failed"]
+    assert failed[0]["error"] == "refused"
+
+def test_reload_request_is_carried_out_by_the_loop(clock, signals):
+    api = ChildProcess("Gunicorn", ["gunicorn"], reload_signal=signal.SIGHUP)
+    gui = ChildProcess("Server GUI", ["gui"], stops_all_on_exit=True)
+    sup = make_supervisor(api, gui)
+    api_pid = api.pid
+
+    # As from the SIGHUP handler: nothing is signalled or restarted until run() picks it up
+    sup.request_reload()
+    assert signals == []
+
+    gui.proc.returncode = 0
+    assert sup.run() == 0
+    assert signals[0] == (api_pid, signal.SIGHUP)
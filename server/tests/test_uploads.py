@@ -0,0 +1,179 @@
+import io
+import os
+import sys
+import time
+import hashlib
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+import uploads
+
+# The client's modules import each other by name, as they do when client.py runs
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'client'))
+from gui.resumable_upload import upload_file_resumable, load_upload_state, ResumableUploadError
+
+CHUNK_SIZE = 64 * 1024
+
+def put_chunk(client, headers, upload_id, index, chunk, checksum=None):
+    return client.put(f"/missions/survey/uploads/{upload_id}/chunks/{index}", data=chunk,
+                      headers={**headers, 'X-Chunk-SHA256': checksum or hashlib.sha256(chunk).hexdigest()})
+
+def wait_until_complete(client, headers, upload_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f"/missions/survey/uploads/{upload_id}", headers=headers).get_json()
+        if status['state'] != 'completing':
+            return status
+        time.sleep(0.05)
+    pytest.fail(f"upload {upload_id} still completing after {timeout}s")
+
+def test_resume_after_interrupted_chunk(client, headers, server_manager):
+    data = os.urandom(3 * CHUNK_SIZE + 1000)
+    response = client.post("/missions/survey/uploads", headers=headers,
+                           json={"filename": "IMG_0001.jpg", "size": len(data), "chunk_size": CHUNK_SIZE})
+    assert response.status_code == 201
+    upload_id = response.get_json()['upload_id']
+    assert response.get_json()['total_chunks'] == 4
+
+    assert put_chunk(client, headers, upload_id, 0, data[:CHUNK_SIZE]).status_code == 200
+    # The connection drops halfway through the second chunk
+    chunk = data[CHUNK_SIZE:2 * CHUNK_SIZE]
+    response = client.put(f"/missions/survey/uploads/{upload_id}/chunks/1",
+                          input_stream=io.BytesIO(chunk[:CHUNK_SIZE // 2]),
+                          headers={**headers, 'Content-Length': str(CHUNK_SIZE),
+                                   'X-Chunk-SHA256': hashlib.sha256(chunk).hexdigest()})
+    assert response.status_code == 400
+
+    status = client.get(f"/missions/survey/uploads/{upload_id}", headers=headers).get_json()
+    assert status['offset'] == CHUNK_SIZE
+    assert status['missing_chunks'] == [1, 2, 3]
+    assert client.post(f"/missions/survey/uploads/{upload_id}/complete", headers=headers).status_code == 409
+
+    for index in range(status['offset'] // CHUNK_SIZE, status['total_chunks']):
+        chunk = data[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]
+        assert put_chunk(client, headers, upload_id, index, chunk).status_code == 200
+
+    response = client.post(f"/missions/survey/uploads/{upload_id}/complete", headers=headers)
+    assert response.status_code in (200, 202)
+    status = wait_until_complete(client, headers, upload_id)
+    assert status['state'] == 'complete'
+    assert status['sha256'] == hashlib.sha256(data).hexdigest()
+    with open(os.path.join(server_manager.UPLOADED_IMAGES_PATH, 'pilot', 'survey', 'IMG_0001.jpg'), 'rb') as f:
+        assert hashlib.sha256(f.read()).hexdigest() == hashlib.sha256(data).hexdigest()
+    assert client.post(f"/missions/survey/uploads/{upload_id}/complete", headers=headers).status_code == 200
+
+def test_chunk_checksum_mismatch_is_rejected(client, headers):
+    data = os.urandom(2 * CHUNK_SIZE)
+    response = client.post("/missions/survey/uploads", headers=headers,
+                           json={"filename": "IMG_0002.jpg", "size": len(data), "chunk_size": CHUNK_SIZE})
+    upload_id = response.get_json()['upload_id']
+
+    corrupted = bytes([data[0] ^ 0xFF]) + data[1:CHUNK_SIZE]
+    response = put_chunk(client, headers, upload_id, 0, corrupted, checksum=hashlib.sha256(data[:CHUNK_SIZE]).hexdigest())
+    assert response.status_code == 422
+    assert response.get_json()['index'] == 0
+
+    status = client.get(f"/missions/survey/uploads/{upload_id}", headers=headers).get_json()
+    assert status['received_chunks'] == []
+    assert status['offset'] == 0
+
+    for index in range(2):
+        assert put_chunk(client, headers, upload_id, index, data[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]).status_code == 200
+    client.post(f"/missions/survey/uploads/{upload_id}/complete", headers=headers)
+    assert wait_until_complete(client, headers, upload_id)['sha256'] == hashlib.sha256(data).hexdigest()
+
+class FlaskAdapter(BaseAdapter):
+    """
+    Transport adapter sending requests to the Flask test client. should_drop(request) picks
+    requests whose connection drops: a chunk upload sends half its body first, like a link
+    that fails mid-transfer.
+    """
+
+    def __init__(self, client, should_drop=lambda request: False):
+        super().__init__()
+        self.client = client
+        self.should_drop = should_drop
+        self.chunk_puts = []
+
+    def send(self, request, **kwargs):
+        path = request.path_url
+        body = request.body or b''
+        if isinstance(body, str):
+            body = body.encode()
+        if self.should_drop(request):
+            if request.method == 'PUT':
+                self.client.open(path, method='PUT', input_stream=io.BytesIO(body[:len(body) // 2]),
+                                 headers={**request.headers, 'Content-Length': str(len(body))})
+            raise requests.ConnectionError(f"connection dropped during {request.method} {path}")
+        if request.method == 'PUT':
+            self.chunk_puts.append(int(path.rsplit('/', 1)[1]))
+        result = self.client.open(path, method=request.method, data=body, headers=dict(request.headers))
+        response = requests.Response()
+        response.status_code = result.status_code
+        response.headers = CaseInsensitiveDict(result.headers)
+        response._content = result.get_data()
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+def http_session(adapter):
+    session = requests.Session()
+    session.mount('http://', adapter)
+    return session
+
+def test_client_upload_resumes_after_dropped_chunk(client, headers, tmp_path):
+    data = os.urandom(4 * CHUNK_SIZE + 10)
+    file_path = tmp_path / "IMG_0003.jpg"
+    file_path.write_bytes(data)
+    dropped = []
+
+    def drop_chunk_two_once(request):
+        if request.method == 'PUT' and request.path_url.endswith('/chunks/2') and not dropped:
+            dropped.append(request.path_url)
+            return True
+        return False
+
+    adapter = FlaskAdapter(client, drop_chunk_two_once)
+    filename = upload_file_resumable(http_session(adapter), "http://skysync.test", headers['x-access-token'], 'survey',
+                                     str(file_path), chunk_size=CHUNK_SIZE, state_file=str(tmp_path / "state.json"),
+                                     backoff=0, poll_interval=0.05)
+    assert filename == "IMG_0003.jpg"
+    assert dropped
+    # The dropped chunk was sent again; no other chunk was
+    assert sorted(adapter.chunk_puts) == [0, 1, 2, 3, 4]
+    assert load_upload_state(str(tmp_path / "state.json")) == {}
+
+    with open(os.path.join(uploads.get_server_manager().UPLOADED_IMAGES_PATH, 'pilot', 'survey', filename), 'rb') as f:
+        assert f.read() == data
+
+def test_client_upload_resumes_from_state_file_after_restart(client, headers, tmp_path):
+    data = os.urandom(3 * CHUNK_SIZE)
+    file_path = tmp_path / "IMG_0004.jpg"
+    file_path.write_bytes(data)
+    state_file = str(tmp_path / "state.json")
+
+    # The link goes down for good during the second chunk; the client retries once, then gives up
+    adapter = FlaskAdapter(client, lambda request: request.method == 'PUT' and request.path_url.endswith('/chunks/1'))
+    with pytest.raises(ResumableUploadError):
+        upload_file_resumable(http_session(adapter), "http://skysync.test", headers['x-access-token'], 'survey',
+                              str(file_path), chunk_size=CHUNK_SIZE, state_file=state_file, max_retries=1, backoff=0)
+    (upload_id,) = load_upload_state(state_file).values()
+    status = client.get(f"/missions/survey/uploads/{upload_id}", headers=headers).get_json()
+    assert status['received_chunks'] == [0]
+
+    # A fresh client (as after a restart) continues the recorded session with only the missing chunks
+    adapter = FlaskAdapter(client)
+    filename = upload_file_resumable(http_session(adapter), "http://skysync.test", headers['x-access-token'], 'survey',
+                                     str(file_path), chunk_size=CHUNK_SIZE, state_file=state_file,
+                                     backoff=0, poll_interval=0.05)
+    assert adapter.chunk_puts == [1, 2]
+    assert load_upload_state(state_file) == {}
+    # The finished session was discarded
+    assert client.get(f"/missions/survey/uploads/{upload_id}", headers=headers).status_code == 404
+    with open(os.path.join(uploads.get_server_manager().UPLOADED_IMAGES_PATH, 'pilot', 'survey', filename), 'rb') as f:
+        assert hashlib.sha256(f.read()).hexdigest() == hashlib.sha256(data).hexdigest()
@@ -0,0 +1,97 @@
+import os
+import logging
+from PIL import Image
+
+# Thumbnails live next to their original in <folder>/.thumbs/<size>/<filename>
+THUMBNAIL_DIR = ".thumbs"
+DEFAULT_THUMBNAIL_SIZES = (200, 800)
+JPEG_QUALITY = 85
+
+def parse_sizes(value):
+    """Parse a comma-separated list of edge lengths such as "200,800"."""
+    sizes = sorted({int(size) for size in value.split(',') if size.strip()})
+    if not sizes or sizes[0] <= 0:
+        raise ValueError(f"Invalid thumbnail sizes: {value!r}")
+    return tuple(sizes)
+
+def thumbnail_path(folder, filename, size):
+    """Location of the size px thumbnail of folder/filename."""
+    return os.path.join(folder, THUMBNAIL_DIR, str(size), filename)
+
+def is_stale(source_path, thumb_path):
+    """
+    True if the thumbnail is missing or older than its original. A re-upload can place a blob
+    stored earlier, with its old mtime, so replacing an original also removes its thumbnails
+    (remove_thumbnails) rather than relying on this comparison.
+    """
+    try:
+        return os.path.getmtime(thumb_path) < os.path.getmtime(source_path)
+    except OSError:
+        return True
+
+def remove_thumbnails(folder, filename):
+    """Delete the thumbnails of folder/filename at every size, e.g. once the original is replaced."""
+    thumbs_root = os.path.join(folder, THUMBNAIL_DIR)
+    try:
+        sizes = os.listdir(thumbs_root)
+    except FileNotFoundError:
+        return
+    for size in sizes:
+        try:
+            os.remove(os.path.join(thumbs_root, size, filename))
+        except FileNotFoundError:
+            pass
+
+def save_thumbnails(image, folder, filename, sizes=DEFAULT_THUMBNAIL_SIZES):
+    """
+    Write thumbnails of an already decoded image, largest first so every resize starts
+    from the previous, smaller copy. Returns the paths written.
+    """
+    image_format = Image.registered_extensions().get(os.path.splitext(filename)[1].lower(), "PNG")
+    current = image
+    written = []
+    for size in sorted(sizes, reverse=True):
+        current = current.copy()
+        current.thumbnail((size, size), Image.LANCZOS)
+        path = thumbnail_path(folder, filename, size)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        out = current
+        options = {}
+        if image_format == "JPEG":
+            options = {"quality": JPEG_QUALITY, "optimize": True}
+            if out.mode not in ("RGB", "L"):
+                out = out.convert("RGB")
+
+        # Readers never see a half-written file
+        tmp_path = os.path.join(os.path.dirname(path), f".{filename}.tmp")
+        out.save(tmp_path, format=image_format, **options)
+        os.replace(tmp_path, path)
+        written.append(path)
+    return written
+
+def generate_thumbnails(source_path, sizes=DEFAULT_THUMBNAIL_SIZES):
+    """Decode an image on disk and write its thumbnails next to it."""
+    folder, filename = os.path.split(source_path)
+    with Image.open(source_path) as image:
+        # Let the JPEG decoder downscale while decoding; the largest thumbnail still has full quality
+        largest = max(sizes)
+        image.draft("RGB", (largest, largest))
+        image.load()
+        return save_thumbnails(image, folder, filename, sizes)
+
+def ensure_thumbnail(folder, filename, size, sizes=DEFAULT_THUMBNAIL_SIZES):
+    """
+    Return the path of an up-to-date size px thumbnail of folder/filename, generating the
+    whole set on demand for photos ingested before thumbnails existed. Returns None on failure.
+    """
+    source_path = os.path.join(folder, filename)
+    path = thumbnail_path(folder, filename, size)
+    if not is_stale(source_path, path):
+        return path
+    try:
+        generate_thumbnails(source_path, sizes)
+        return path
+    except (OSError, ValueError) as e:
+        logging.error(f"Failed to generate thumbnails for {source_path}: {e}")
+        return None
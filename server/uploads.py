@@ -0,0 +1,343 @@
+from flask import Blueprint, request, jsonify
+from werkzeug.utils import secure_filename
+from auth import token_required
+from models import Mission
+from analysis import queue_thumbnails
+from photos import store_original, record_uploaded_photos
+from executors import create_executor
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+
+uploads_blueprint = Blueprint('uploads', __name__)
+
+# Chunk sizes accepted for resumable uploads
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+# A completion still unfinished after this long is presumed lost with its worker and may be retried
+UPLOAD_COMPLETION_TIMEOUT = 600
+
+def get_server_manager():
+    """Retrieve the server manager instance attached to the blueprint."""
+    server_manager = getattr(uploads_blueprint, 'server_manager', None)
+    if not server_manager:
+        raise RuntimeError("ServerManager not passed to uploads_blueprint.")
+    return server_manager
+
+def get_database_session():
+    """Retrieve a database session from the server manager."""
+    server_manager = get_server_manager()
+    Session = server_manager.get_database_session()
+    return Session()
+
+def get_mission_folder(username, mission_name):
+    """Folder that completed uploads for a mission are placed in."""
+    server_manager = get_server_manager()
+    return os.path.join(server_manager.UPLOADED_IMAGES_PATH, username, mission_name)
+
+def get_upload_dir(username, mission_name, upload_id):
+    """Staging folder holding an upload session's metadata, data file and chunk markers."""
+    return os.path.join(get_mission_folder(username, mission_name), '.uploads', upload_id)
+
+def load_upload_meta(upload_dir):
+    """Load an upload session's metadata, or None if the session does not exist."""
+    meta_path = os.path.join(upload_dir, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r') as f:
+        return json.load(f)
+
+def get_received_chunks(upload_dir):
+    """Indexes of chunks that have been written and verified."""
+    chunks_dir = os.path.join(upload_dir, 'chunks')
+    if not os.path.isdir(chunks_dir):
+        return []
+    return sorted(int(name) for name in os.listdir(chunks_dir) if name.isdigit())
+
+def load_upload_result(upload_dir):
+    """Outcome of a finished completion ({"state": "complete", "sha256"} or {"state": "failed", "error"}), or None."""
+    result_path = os.path.join(upload_dir, 'result.json')
+    if not os.path.exists(result_path):
+        return None
+    with open(result_path, 'r') as f:
+        return json.load(f)
+
+def save_upload_result(upload_dir, result):
+    tmp_path = os.path.join(upload_dir, 'result.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(result, f)
+    os.replace(tmp_path, os.path.join(upload_dir, 'result.json'))
+
+def completion_started_at(upload_dir):
+    """When the running completion of an upload was claimed, or None if none is running."""
+    try:
+        return os.path.getmtime(os.path.join(upload_dir, 'completing'))
+    except FileNotFoundError:
+        return None
+
+def claim_completion(upload_dir):
+    """
+    Mark an upload as completing; False if another request already did and its completion is
+    not presumed lost. A failed earlier attempt is cleared so the upload can be retried.
+    """
+    marker = os.path.join(upload_dir, 'completing')
+    started_at = completion_started_at(upload_dir)
+    if started_at is not None and time.time() - started_at > UPLOAD_COMPLETION_TIMEOUT:
+        os.remove(marker)
+    result = load_upload_result(upload_dir)
+    if result and result['state'] == 'failed':
+        os.remove(os.path.join(upload_dir, 'result.json'))
+    try:
+        os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except FileExistsError:
+        return False
+
+def upload_status(upload_id, upload_dir, meta):
+    """Status payload of an upload session, including where its completion stands."""
+    result = load_upload_result(upload_dir)
+    if result and result['state'] == 'complete':
+        return {**describe_upload(upload_id, meta, list(range(meta['total_chunks']))), **result}
+    status = describe_upload(upload_id, meta, get_received_chunks(upload_dir))
+    if completion_started_at(upload_dir) is not None:
+        return {**status, "state": "completing"}
+    if result:
+        return {**status, **result}
+    return status
+
+def describe_upload(upload_id, meta, received):
+    """Build the status payload returned to clients."""
+    # Contiguous bytes from the start of the file, so a client can resume from there
+    contiguous = 0
+    for index in received:
+        if index != contiguous:
+            break
+        contiguous += 1
+    offset = min(contiguous * meta['chunk_size'], meta['size'])
+    missing = sorted(set(range(meta['total_chunks'])) - set(received))
+    return {
+        "upload_id": upload_id,
+        "filename": meta['filename'],
+        "size": meta['size'],
+        "chunk_size": meta['chunk_size'],
+        "total_chunks": meta['total_chunks'],
+        "received_chunks": received,
+        "missing_chunks": missing,
+        "offset": offset,
+        "state": "receiving"
+    }
+
+def valid_upload_id(upload_id):
+    """Upload ids are uuid4 hex strings; reject anything else before touching the filesystem."""
+    return len(upload_id) == 32 and all(c in '0123456789abcdef' for c in upload_id)
+
+@uploads_blueprint.route('/missions/<mission_name>/uploads', methods=['POST'])
+@token_required
+def create_upload(current_user, mission_name):
+    """Start a resumable upload session for one file."""
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename', ''))
+    size = data.get('size')
+    chunk_size = data.get('chunk_size', DEFAULT_CHUNK_SIZE)
+
+    if not filename:
+        return jsonify({"error": "Filename is required"}), 400
+    if not isinstance(size, int) or size < 0:
+        return jsonify({"error": "File size is required"}), 400
+    if not isinstance(chunk_size, int) or not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        return jsonify({"error": f"Chunk size must be between 1 and {MAX_CHUNK_SIZE} bytes"}), 400
+
+    session = get_database_session()
+    try:
+        mission = session.query(Mission).filter_by(username=current_user, mission_name=mission_name).first()
+        if not mission:
+            return jsonify({"error": "Mission not found"}), 404
+    finally:
+        session.close()
+
+    upload_id = uuid.uuid4().hex
+    upload_dir = get_upload_dir(current_user, mission_name, upload_id)
+    try:
+        os.makedirs(os.path.join(upload_dir, 'chunks'))
+        # Preallocate the data file so chunks can be written in place at their offsets
+        with open(os.path.join(upload_dir, 'data.part'), 'wb') as f:
+            f.truncate(size)
+        meta = {
+            "filename": filename,
+            "size": size,
+            "chunk_size": chunk_size,
+            "total_chunks": max(1, -(-size // chunk_size))
+        }
+        with open(os.path.join(upload_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+    except OSError as e:
+        logging.error(f"Error creating upload session for {filename}: {e}")
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        return jsonify({"error": "Failed to create upload session"}), 500
+
+    logging.info(f"Created upload session {upload_id} for {current_user}/{mission_name}/{filename}")
+    return jsonify(describe_upload(upload_id, meta, [])), 201
+
+@uploads_blueprint.route('/missions/<mission_name>/uploads/<upload_id>', methods=['GET'])
+@token_required
+def get_upload(current_user, mission_name, upload_id):
+    """Report which chunks of an upload session have been received."""
+    if not valid_upload_id(upload_id):
+        return jsonify({"error": "Upload not found"}), 404
+    upload_dir = get_upload_dir(current_user, mission_name, upload_id)
+    meta = load_upload_meta(upload_dir)
+    if not meta:
+        return jsonify({"error": "Upload not found"}), 404
+    return jsonify(upload_status(upload_id, upload_dir, meta)), 200
+
+@uploads_blueprint.route('/missions/<mission_name>/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+@token_required
+def put_chunk(current_user, mission_name, upload_id, index):
+    """Write one chunk at its offset after verifying its SHA-256 checksum."""
+    if not valid_upload_id(upload_id):
+        return jsonify({"error": "Upload not found"}), 404
+    upload_dir = get_upload_dir(current_user, mission_name, upload_id)
+    meta = load_upload_meta(upload_dir)
+    if not meta:
+        return jsonify({"error": "Upload not found"}), 404
+    if index >= meta['total_chunks']:
+        return jsonify({"error": "Chunk index out of range"}), 400
+    if completion_started_at(upload_dir) is not None or (load_upload_result(upload_dir) or {}).get('state') == 'complete':
+        # The data file is being hashed or is already stored
+        return jsonify({"error": "Upload is already being completed"}), 409
+
+    offset = index * meta['chunk_size']
+    expected_length = min(meta['chunk_size'], meta['size'] - offset)
+    if request.content_length is not None and request.content_length != expected_length:
+        return jsonify({"error": f"Chunk {index} must be {expected_length} bytes"}), 400
+
+    expected_checksum = request.headers.get('X-Chunk-SHA256', '').lower()
+    if not expected_checksum:
+        return jsonify({"error": "X-Chunk-SHA256 header is required"}), 400
+
+    chunk = request.stream.read(expected_length + 1)
+    if len(chunk) != expected_length:
+        return jsonify({"error": f"Chunk {index} must be {expected_length} bytes"}), 400
+    checksum = hashlib.sha256(chunk).hexdigest()
+    if checksum != expected_checksum:
+        return jsonify({"error": "Chunk checksum mismatch", "index": index}), 422
+
+    try:
+        fd = os.open(os.path.join(upload_dir, 'data.part'), os.O_WRONLY)
+        try:
+            os.pwrite(fd, chunk, offset)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        # Marker is written last so a chunk only counts once its data is on disk
+        with open(os.path.join(upload_dir, 'chunks', str(index)), 'w') as f:
+            f.write(checksum)
+    except OSError as e:
+        logging.error(f"Error writing chunk {index} of upload {upload_id}: {e}")
+        return jsonify({"error": "Failed to store chunk"}), 500
+
+    return jsonify({"index": index, "checksum": checksum}), 200
+
+@uploads_blueprint.route('/missions/<mission_name>/uploads/<upload_id>/complete', methods=['POST'])
+@token_required
+def complete_upload(current_user, mission_name, upload_id):
+    """
+    Finish a fully received upload. Storing it by content means hashing the whole file, which
+    cannot be done while the chunks arrive (they may come in any order, through any worker
+    process), so it happens on a background pool: the answer is 202 and the client polls the
+    session until its state is "complete" (200 here once it is) or "failed".
+    """
+    if not valid_upload_id(upload_id):
+        return jsonify({"error": "Upload not found"}), 404
+    upload_dir = get_upload_dir(current_user, mission_name, upload_id)
+    meta = load_upload_meta(upload_dir)
+    if not meta:
+        return jsonify({"error": "Upload not found"}), 404
+
+    status = upload_status(upload_id, upload_dir, meta)
+    if status['state'] == 'complete':
+        return jsonify({"message": "Upload complete", **status}), 200
+    if status['state'] == 'completing':
+        return jsonify(status), 202
+    if status['missing_chunks']:
+        return jsonify({"error": "Upload is incomplete", **status}), 409
+
+    session = get_database_session()
+    try:
+        if not session.query(Mission.id).filter_by(username=current_user, mission_name=mission_name).first():
+            return jsonify({"error": "Mission not found"}), 404
+    finally:
+        session.close()
+
+    try:
+        if claim_completion(upload_dir):
+            server_manager = get_server_manager()
+            get_completion_executor(server_manager).submit(finish_upload, server_manager, current_user, mission_name, upload_dir, meta)
+    except (OSError, RuntimeError) as e:
+        logging.error(f"Error starting completion of upload {upload_id}: {e}")
+        return jsonify({"error": "Failed to complete upload"}), 500
+    status = upload_status(upload_id, upload_dir, meta)
+    return jsonify(status), 200 if status['state'] == 'complete' else 202
+
+def finish_upload(server_manager, username, mission_name, upload_dir, meta):
+    """Store an assembled upload by content and record its photo; runs on the completion pool."""
+    session = server_manager.get_database_session()()
+    changed = []
+    try:
+        mission = session.query(Mission).filter_by(username=username, mission_name=mission_name).first()
+        if not mission:
+            raise LookupError(f"Mission {mission_name} no longer exists")
+        # Chunks were written in place, so the data file is already the assembled image
+        mission_folder = get_mission_folder(username, mission_name)
+        final_path = os.path.join(mission_folder, meta['filename'])
+        stored = store_original(server_manager.get_blob_store(), os.path.join(upload_dir, 'data.part'), final_path)
+        changed = record_uploaded_photos(session, mission, username, mission_name, {meta['filename']: stored}, mission_folder)
+        session.commit()
+        result = {"state": "complete", "sha256": stored[0]}
+    except Exception as e:
+        logging.error(f"Error completing upload {os.path.basename(upload_dir)}: {e}")
+        session.rollback()
+        result = {"state": "failed", "error": "Failed to complete upload"}
+    finally:
+        session.close()
+        server_manager.remove_database_session()
+
+    try:
+        save_upload_result(upload_dir, result)
+        if result['state'] == 'complete':
+            # Only the small status files stay, until the client discards the session
+            shutil.rmtree(os.path.join(upload_dir, 'chunks'), ignore_errors=True)
+        os.remove(os.path.join(upload_dir, 'completing'))
+    except OSError as e:
+        logging.error(f"Error recording the outcome of upload {os.path.basename(upload_dir)}: {e}")
+    if changed:
+        queue_thumbnails(username, mission_name, changed)
+
+_completion_executor = None
+_completion_executor_pid = None
+
+def get_completion_executor(server_manager):
+    """Return this worker's upload completion pool, creating a fresh one after fork."""
+    global _completion_executor, _completion_executor_pid
+    if _completion_executor is None or _completion_executor_pid != os.getpid():
+        _completion_executor = create_executor(server_manager.UPLOAD_COMPLETION_WORKERS, "upload-complete")
+        _completion_executor_pid = os.getpid()
+    return _completion_executor
+
+@uploads_blueprint.route('/missions/<mission_name>/uploads/<upload_id>', methods=['DELETE'])
+@token_required
+def abort_upload(current_user, mission_name, upload_id):
+    """Discard an upload session: its partial data, or once complete its leftover status."""
+    if not valid_upload_id(upload_id):
+        return jsonify({"error": "Upload not found"}), 404
+    upload_dir = get_upload_dir(current_user, mission_name, upload_id)
+    if not os.path.isdir(upload_dir):
+        return jsonify({"error": "Upload not found"}), 404
+    if completion_started_at(upload_dir) is not None:
+        return jsonify({"error": "Upload is being completed"}), 409
+    shutil.rmtree(upload_dir, ignore_errors=True)
+    return jsonify({"message": "Upload aborted"}), 200